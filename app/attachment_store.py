@@ -0,0 +1,157 @@
+"""Content-addressed attachment index: one entry per unique attachment (by SHA-256), shared across emails."""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+from app.config import config
+
+
+BLOB_INDEX_FILE = "data/.blob_index.json"
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Ingestion workers store attachments concurrently
+_lock = threading.Lock()
+
+
+def load_blob_index() -> Dict[str, Dict[str, Any]]:
+    """Load the blob index (sha256 -> blob entry)."""
+    if not os.path.exists(BLOB_INDEX_FILE):
+        return {}
+
+    try:
+        with open(BLOB_INDEX_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def save_blob_index(index: Dict[str, Dict[str, Any]]) -> None:
+    """Save the blob index."""
+    os.makedirs(os.path.dirname(BLOB_INDEX_FILE), exist_ok=True)
+    tmp_path = BLOB_INDEX_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, BLOB_INDEX_FILE)
+
+
+def hash_attachment(attachment) -> str:
+    """SHA-256 of an attachment's bytes (spooled attachments are hashed in chunks)."""
+    digest = hashlib.sha256()
+    if attachment.data is not None:
+        digest.update(attachment.data)
+    else:
+        with open(attachment.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(sha256: str) -> str:
+    """Path of a saved blob, sharded by the first two hex digits."""
+    return os.path.join(config.BLOBS_DIR, sha256[:2], sha256)
+
+
+def save_blob(sha256: str, attachment) -> str:
+    """
+    Write an attachment's bytes to its blob path, unless a copy is already there.
+
+    Only for callers that need the file on disk (save_attachment); ingestion
+    never copies attachment bytes.
+
+    Returns:
+        Path to the blob
+    """
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        if attachment.data is not None:
+            f.write(attachment.data)
+        else:
+            with open(attachment.path, 'rb') as src:
+                for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+                    f.write(chunk)
+    os.replace(tmp_path, path)
+    return path
+
+
+def store_attachment(attachment, email_id: str) -> str:
+    """
+    Record an attachment by content hash and add a reference from an email.
+
+    No bytes are copied: the transcription cache links the text to the
+    hash, so a duplicate attachment costs one hash computation.
+
+    Args:
+        attachment: EmailAttachment (in memory or spooled)
+        email_id: Gmail message ID referencing the attachment
+
+    Returns:
+        SHA-256 hex digest of the attachment
+    """
+    sha256 = hash_attachment(attachment)
+
+    with _lock:
+        index = load_blob_index()
+        entry = index.get(sha256)
+        if entry is None:
+            entry = {
+                'size': attachment.size,
+                'mime_type': attachment.mime_type,
+                'filenames': [],
+                'refs': [],
+                'created_at': datetime.now().isoformat()
+            }
+            index[sha256] = entry
+
+        changed = False
+        if attachment.filename not in entry['filenames']:
+            entry['filenames'].append(attachment.filename)
+            changed = True
+        if email_id not in entry['refs']:
+            entry['refs'].append(email_id)
+            changed = True
+
+        if changed:
+            save_blob_index(index)
+
+    return sha256
+
+
+def prune_blob_files() -> int:
+    """
+    Delete blob files written by save_attachment (and by older versions,
+    which copied every attachment). The index is kept.
+
+    Returns:
+        Number of blob files deleted
+    """
+    deleted = 0
+    if not os.path.exists(config.BLOBS_DIR):
+        return 0
+    for root, _, files in os.walk(config.BLOBS_DIR):
+        for name in files:
+            try:
+                os.remove(os.path.join(root, name))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+    return deleted
+
+
+def get_store_stats() -> Dict[str, int]:
+    """Unique attachments, their total size, total references and duplicates avoided."""
+    with _lock:
+        index = load_blob_index()
+    refs = sum(len(e['refs']) for e in index.values())
+    return {
+        'blobs': len(index),
+        'unique_bytes': sum(e['size'] for e in index.values()),
+        'references': refs,
+        'duplicates_avoided': refs - sum(1 for e in index.values() if e['refs'])
+    }
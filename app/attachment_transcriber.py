@@ -1,62 +1,90 @@
-"""Transcribe attachments (PDFs, images) to text for RAG."""
+"""Transcribe attachments (PDFs, images, documents) to text for RAG."""
 import os
-import time
 from pathlib import Path
 from typing import Optional
-from google.genai import types
-from google.genai.types import FileState
 
 from app.config import config
-from app.gemini_file_search import initialize_client
-from app.image_processor import extract_text_from_image
+from app.gemini_file_search import (
+    UploadSource,
+    generate_from_media,
+    guess_mime_type,
+    initialize_client,
+    open_upload_source,
+)
+from app.image_processor import extract_text_from_image, extract_text_from_image_data
+from app.text_extractors import (
+    DOCX_MIME_TYPE,
+    Transcription,
+    extract_csv_text,
+    extract_docx_text,
+    extract_html_text,
+    extract_pdf_page,
+    extract_pdf_pages,
+    page_needs_vision,
+    read_all,
+)
+from app.transcription_cache import transcribe_with_cache
 
 
-def transcribe_pdf(pdf_path: str) -> str:
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
+TEXT_EXTENSIONS = ['.txt', '.md']
+HTML_EXTENSIONS = ['.html', '.htm']
+
+# Bump when the PDF prompt changes so cached transcriptions are regenerated
+PDF_PROMPT_VERSION = "pdf-v1"
+
+
+def transcribe_pdf(pdf_path: str, content_hash: Optional[str] = None) -> str:
     """
     Extract text from PDF using Gemini Vision API.
     
     Args:
         pdf_path: Path to the PDF file
+        content_hash: Optional precomputed SHA-256 of the file (skips hashing)
         
     Returns:
         Extracted text from the PDF
     """
-    if not config.GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not set in environment variables")
-    
     if not Path(pdf_path).exists():
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
     
+    with open_upload_source(pdf_path) as source:
+        return transcribe_pdf_data(source, filename=os.path.basename(pdf_path), content_hash=content_hash)
+
+
+def transcribe_pdf_data(data: UploadSource, filename: str = "document.pdf",
+                        content_hash: Optional[str] = None) -> str:
+    """
+    Extract text from an in-memory PDF using Gemini Vision API.
+    
+    Results are cached by content hash, model and prompt version, so a PDF
+    that was already transcribed (in any run) costs no upload or model call.
+    
+    Args:
+        data: PDF bytes or a seekable binary stream
+        filename: Original filename (for logging and display name)
+        content_hash: Optional precomputed SHA-256 of data (skips hashing)
+        
+    Returns:
+        Extracted text from the PDF
+    """
+    return transcribe_with_cache(
+        data,
+        PDF_PROMPT_VERSION,
+        lambda: _transcribe_pdf_uncached(data, filename),
+        content_hash=content_hash
+    )
+
+
+def _transcribe_pdf_uncached(data: UploadSource, filename: str) -> str:
+    """Extract a PDF's text with Gemini (inline or via the Files API)."""
+    if not config.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set in environment variables")
+    
     client = initialize_client()
     
     try:
-        # Upload PDF to Gemini Files API
-        print(f"  📄 Processing PDF: {os.path.basename(pdf_path)}")
-        file = client.files.upload(path=pdf_path)
-        
-        # Wait for file to be processed
-        max_wait = 60  # PDFs may take longer to process
-        wait_time = 0
-        
-        # Get state - handle both string and object types
-        def get_state_string(state):
-            if isinstance(state, str):
-                return state.upper()
-            elif hasattr(state, 'name'):
-                return state.name.upper()
-            else:
-                return str(state).upper()
-        
-        state = get_state_string(file.state)
-        while "PROCESSING" in state and wait_time < max_wait:
-            time.sleep(2)
-            wait_time += 2
-            file = client.files.get(name=file.name)
-            state = get_state_string(file.state)
-        
-        state = get_state_string(file.state)
-        if "ACTIVE" not in state:
-            raise Exception(f"PDF upload failed. State: {state}")
+        print(f"  📄 Processing PDF: {filename}")
         
         # Use Gemini to extract text from PDF
         prompt = """Extract ALL text from this PDF document with high accuracy.
@@ -71,15 +99,9 @@ CRITICAL INSTRUCTIONS:
 
 Extract the text EXACTLY as it appears in the document."""
         
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=[
-                types.Part.from_text(text=prompt),
-                types.Part(file_data=types.FileData(file_uri=file.uri))
-            ],
-            config=types.GenerateContentConfig(
-                temperature=0.1
-            )
+        # Small PDFs go inline in the request; large ones through the Files API
+        response = generate_from_media(
+            prompt, data, "application/pdf", display_name=filename, client=client, max_wait=60, poll_interval=2
         )
         
         extracted_text = None
@@ -104,56 +126,147 @@ Extract the text EXACTLY as it appears in the document."""
         return extracted_text
     
     except Exception as e:
-        raise Exception(f"Error processing PDF {pdf_path}: {e}")
+        raise Exception(f"Error processing PDF {filename}: {e}")
 
 
-def transcribe_image(image_path: str) -> str:
+def transcribe_image(image_path: str, content_hash: Optional[str] = None) -> str:
     """
     Extract text from image using existing OCR functionality.
     
     Args:
         image_path: Path to the image file
+        content_hash: Optional precomputed SHA-256 of the file (skips hashing)
         
     Returns:
         Extracted text from the image
     """
-    return extract_text_from_image(image_path)
+    return extract_text_from_image(image_path, content_hash=content_hash)
 
 
-def transcribe_attachment(attachment_path: str, mime_type: Optional[str] = None) -> str:
+def transcribe_pdf_tiered(data: UploadSource, filename: str, content_hash: Optional[str] = None) -> Transcription:
     """
-    Transcribe an attachment based on its file type.
+    Transcribe a PDF from its embedded text layer, using Gemini vision only
+    for pages that are scanned images.
     
     Args:
-        attachment_path: Path to the attachment file
-        mime_type: Optional MIME type of the attachment
+        data: PDF bytes or a seekable binary stream
+        filename: Original filename (for logging and display name)
+        content_hash: Optional precomputed SHA-256 of data (skips hashing)
         
     Returns:
-        Extracted text from the attachment
+        Transcription whose method says which path was taken
     """
-    if not Path(attachment_path).exists():
-        raise FileNotFoundError(f"Attachment not found: {attachment_path}")
+    pages = extract_pdf_pages(data)
+    if pages is None:
+        return Transcription(transcribe_pdf_data(data, filename, content_hash=content_hash), "pdf-vision")
+    
+    scanned = [i for i, text in enumerate(pages) if page_needs_vision(text)]
+    if not scanned:
+        print(f"  📄 Extracted text layer locally: {filename} ({len(pages)} pages)")
+        return Transcription("\n\n".join(text.strip() for text in pages), "pdf-text-layer")
     
-    # Determine file type from extension or MIME type
-    ext = Path(attachment_path).suffix.lower()
+    if len(scanned) == len(pages):
+        return Transcription(transcribe_pdf_data(data, filename, content_hash=content_hash), "pdf-vision")
+    
+    # Mixed document: only the scanned pages go to the vision model, one page each
+    print(f"  📄 {filename}: {len(pages) - len(scanned)} pages from text layer, {len(scanned)} scanned")
+    for i in scanned:
+        pages[i] = transcribe_pdf_data(extract_pdf_page(data, i), f"{filename} (page {i + 1})")
+    return Transcription(
+        "\n\n".join(text.strip() for text in pages),
+        f"pdf-text-layer+vision (pages {', '.join(str(i + 1) for i in scanned)})"
+    )
+
+
+def extract_attachment(data: UploadSource, filename: str, mime_type: Optional[str] = None,
+                       content_hash: Optional[str] = None) -> Transcription:
+    """
+    Extract text from an attachment, locally when the format allows it.
+    
+    PDF text layers, DOCX, HTML, CSV and plain text are extracted on the CPU
+    with no API call. Images and scanned PDF pages go to Gemini vision.
+    
+    Args:
+        data: Attachment bytes or a seekable binary stream
+        filename: Original attachment filename
+        mime_type: Optional MIME type of the attachment
+        content_hash: Optional precomputed SHA-256 of data (skips hashing)
+        
+    Returns:
+        Transcription (text and extraction method)
+    """
+    ext = Path(filename).suffix.lower()
+    mime_type = mime_type or ''
     
     # Image types
-    if ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-        print(f"  🖼️  Processing image: {os.path.basename(attachment_path)}")
-        return transcribe_image(attachment_path)
+    if ext in IMAGE_EXTENSIONS or mime_type.startswith('image/'):
+        print(f"  🖼️  Processing image: {filename}")
+        text = extract_text_from_image_data(
+            data, mime_type or guess_mime_type(filename, 'image/png'), filename, content_hash=content_hash
+        )
+        return Transcription(text, "image-vision")
     
     # PDF
-    elif ext == '.pdf':
-        return transcribe_pdf(attachment_path)
+    elif ext == '.pdf' or mime_type == 'application/pdf':
+        return transcribe_pdf_tiered(data, filename, content_hash=content_hash)
+    
+    # Word documents
+    elif ext == '.docx' or mime_type == DOCX_MIME_TYPE:
+        print(f"  📝 Extracting Word document: {filename}")
+        return Transcription(extract_docx_text(data), "docx-xml")
+    
+    # HTML
+    elif ext in HTML_EXTENSIONS or mime_type == 'text/html':
+        print(f"  📝 Converting HTML: {filename}")
+        return Transcription(extract_html_text(data), "html")
+    
+    # CSV
+    elif ext == '.csv' or mime_type == 'text/csv':
+        print(f"  📝 Reading CSV: {filename}")
+        return Transcription(extract_csv_text(data), "csv")
     
     # Text files
-    elif ext in ['.txt', '.md', '.csv']:
-        print(f"  📝 Reading text file: {os.path.basename(attachment_path)}")
-        with open(attachment_path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+    elif ext in TEXT_EXTENSIONS or mime_type.startswith('text/'):
+        print(f"  📝 Reading text file: {filename}")
+        return Transcription(read_all(data).decode('utf-8', errors='ignore'), "text")
     
     # Unsupported type
     else:
-        print(f"  ⚠️  Unsupported file type: {ext} ({attachment_path})")
-        return f"[Attachment: {os.path.basename(attachment_path)} - File type not supported for transcription]"
+        print(f"  ⚠️  Unsupported file type: {ext or mime_type} ({filename})")
+        return Transcription(f"[Attachment: {filename} - File type not supported for transcription]", "unsupported")
+
 
+def extract_attachment_file(attachment_path: str, mime_type: Optional[str] = None,
+                            content_hash: Optional[str] = None) -> Transcription:
+    """
+    Extract text from an attachment on disk (memory-mapped if large).
+    
+    Args:
+        attachment_path: Path to the attachment file
+        mime_type: Optional MIME type of the attachment
+        content_hash: Optional precomputed SHA-256 of the file (skips hashing)
+        
+    Returns:
+        Transcription (text and extraction method)
+    """
+    if not Path(attachment_path).exists():
+        raise FileNotFoundError(f"Attachment not found: {attachment_path}")
+    
+    with open_upload_source(attachment_path) as source:
+        return extract_attachment(source, os.path.basename(attachment_path), mime_type, content_hash)
+
+
+def transcribe_attachment(attachment_path: str, mime_type: Optional[str] = None,
+                          content_hash: Optional[str] = None) -> str:
+    """
+    Transcribe an attachment based on its file type.
+    
+    Args:
+        attachment_path: Path to the attachment file
+        mime_type: Optional MIME type of the attachment
+        content_hash: Optional precomputed SHA-256 of the file (skips hashing)
+        
+    Returns:
+        Extracted text from the attachment
+    """
+    return extract_attachment_file(attachment_path, mime_type, content_hash).text
@@ -5,10 +5,10 @@ from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from app.config import config
+from app.google_services import get_credentials, get_service
 
 
 # Google Calendar API scopes
@@ -16,6 +16,7 @@ CALENDAR_SCOPES = [
     'https://www.googleapis.com/auth/calendar',
     'https://www.googleapis.com/auth/calendar.events'
 ]
+CALENDAR_TOKEN_FILE = "calendar_token.json"
 
 
 class CalendarClient:
@@ -26,9 +27,19 @@ class CalendarClient:
         self.credentials = None
     
     def authenticate(self) -> None:
-        """Authenticate with Google Calendar API."""
+        """
+        Authenticate with Google Calendar API.
+        
+        Credentials are loaded once per process and shared; the service object
+        is built once per thread from the bundled discovery document.
+        """
+        self.credentials = get_credentials(CALENDAR_TOKEN_FILE, self._load_credentials)
+        self.service = get_service('calendar', 'v3', self.credentials)
+    
+    def _load_credentials(self):
+        """Load, refresh or authorize credentials (slow path, first use only)."""
         creds = None
-        token_file = "calendar_token.json"
+        token_file = CALENDAR_TOKEN_FILE
         
         if os.path.exists(token_file):
             try:
@@ -83,8 +94,7 @@ class CalendarClient:
             except Exception as e:
                 print(f"Warning: Could not save calendar token: {e}")
         
-        self.credentials = creds
-        self.service = build('calendar', 'v3', credentials=creds)
+        return creds
     
     def create_event(
         self,
@@ -125,11 +135,11 @@ class CalendarClient:
             'location': location,
             'start': {
                 'dateTime': start_datetime.isoformat(),
-                'timeZone': 'America/Denver',  # Adjust to your timezone
+                'timeZone': config.CALENDAR_TIMEZONE,
             },
             'end': {
                 'dateTime': end_datetime.isoformat(),
-                'timeZone': 'America/Denver',
+                'timeZone': config.CALENDAR_TIMEZONE,
             },
             'reminders': {
                 'useDefault': False,
@@ -29,12 +29,67 @@ class Config:
         self.TOKEN_FILE = "token.json"
         self.RAW_EMAILS_DIR = "data/raw_emails"
         self.ATTACHMENTS_DIR = "data/attachments"
+        self.BLOBS_DIR = "data/blobs"  # Attachments saved to disk by content hash (SHA-256)
         self.CONSOLIDATED_DIR = "data/consolidated"
         
         # Calendar settings
         self.CALENDAR_ID = os.getenv("CALENDAR_ID", "primary")
         self.DEFAULT_CALENDAR_ATTENDEES = self._parse_list(os.getenv("DEFAULT_CALENDAR_ATTENDEES", ""))
         self.EMAIL_INGESTION_TIME = os.getenv("EMAIL_INGESTION_TIME", "18:00")  # 6pm default
+        self.CALENDAR_TIMEZONE = os.getenv("CALENDAR_TIMEZONE", "America/Denver")
+        # false: /process-conversation-image adds events to the /calendar.ics feed instead of the Calendar API
+        self.CALENDAR_API_WRITES = os.getenv("CALENDAR_API_WRITES", "true").lower() == "true"
+        
+        # Transcription (PDF/image text extraction) model and persistent cache size bound
+        self.TRANSCRIPTION_MODEL = os.getenv("TRANSCRIPTION_MODEL", "gemini-2.0-flash-exp")
+        self.TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", "50")) * 1024 * 1024
+        
+        # Gemini quota shared by every thread in the process (transcription fan-out, ingestion workers)
+        self.GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+        self.GEMINI_MAX_CONCURRENT = int(os.getenv("GEMINI_MAX_CONCURRENT", "4"))
+        # Attachments of one email transcribed in parallel
+        self.ATTACHMENT_TRANSCRIPTION_WORKERS = int(os.getenv("ATTACHMENT_TRANSCRIPTION_WORKERS", "4"))
+        
+        # Image preprocessing before vision calls (orientation fix, downscale, re-encode)
+        self.IMAGE_PREPROCESSING = os.getenv("IMAGE_PREPROCESSING", "true").lower() == "true"
+        self.IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+        self.IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+        self.IMAGE_GRAYSCALE_SCREENSHOTS = os.getenv("IMAGE_GRAYSCALE_SCREENSHOTS", "false").lower() == "true"
+        self.IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+        # Images/PDFs up to this size are sent inline with the model call instead of via the Files API
+        self.INLINE_MEDIA_MAX_BYTES = int(float(os.getenv("INLINE_MEDIA_MAX_MB", "4")) * 1024 * 1024)
+        # /upload-image: extract events from the image in one call instead of OCR + a text extraction call
+        self.FUSED_IMAGE_EXTRACTION = os.getenv("FUSED_IMAGE_EXTRACTION", "true").lower() == "true"
+        # Date extraction: use the local rule-based parser's events when its confidence is at least this
+        self.LOCAL_DATE_PARSER_MIN_CONFIDENCE = float(os.getenv("LOCAL_DATE_PARSER_MIN_CONFIDENCE", "0.8"))
+        # Model for schema-constrained text-to-events extraction
+        self.EXTRACTION_MODEL = os.getenv("EXTRACTION_MODEL", "gemini-2.0-flash")
+        # Date extraction results are cached for this long
+        self.EXTRACTION_CACHE_TTL_HOURS = int(os.getenv("EXTRACTION_CACHE_TTL_HOURS", "24"))
+        # Texts longer than this are split and extracted in parallel chunks
+        self.EXTRACTION_CHUNK_CHARS = int(os.getenv("EXTRACTION_CHUNK_CHARS", "6000"))
+        self.EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))
+        
+        # Events index: extract events from each new email at ingestion and answer date questions from it
+        self.INDEX_EVENTS_AT_INGESTION = os.getenv("INDEX_EVENTS_AT_INGESTION", "true").lower() == "true"
+        self.EVENTS_INDEX_ANSWERS = os.getenv("EVENTS_INDEX_ANSWERS", "true").lower() == "true"
+        
+        # Gmail sync: "incremental" (historyId-based after the first run) or "full" (newer_than:30d every time)
+        self.GMAIL_SYNC_MODE = os.getenv("GMAIL_SYNC_MODE", "incremental")
+        # Gmail fetch format: "full" (parsed payload + attachments().get calls) or "raw" (one call, parsed locally)
+        self.GMAIL_FETCH_FORMAT = os.getenv("GMAIL_FETCH_FORMAT", "full")
+        
+        # Ingestion pipeline: bounded queue size between stages and per-stage worker counts
+        self.INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+        self.INGEST_ATTACHMENT_WORKERS = int(os.getenv("INGEST_ATTACHMENT_WORKERS", "4"))
+        self.INGEST_TRANSCRIPTION_WORKERS = int(os.getenv("INGEST_TRANSCRIPTION_WORKERS", "4"))
+        
+        # Delete superseded remote uploads after ingestion (false = only report them)
+        self.REMOTE_GC_DELETE = os.getenv("REMOTE_GC_DELETE", "false").lower() == "true"
+        
+        # Retrieval settings: whole_file, file_search_store, or lexical
+        self.RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "whole_file")
+        self.RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "8"))
     
     @staticmethod
     def _parse_list(value: str) -> List[str]:
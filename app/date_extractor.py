@@ -1,19 +1,128 @@
-"""Extract dates and events from text using Gemini API."""
+"""Extract dates and events from text (or straight from images) using Gemini API."""
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
 
 from app.config import config
-from app.gemini_file_search import initialize_client
+from app.gemini_file_search import UploadSource, generate_from_media, initialize_client
+from app.image_processor import prepare_image_for_vision
+from app.extraction_cache import (
+    cache_extraction, cache_image_extraction, get_cached_extraction, get_cached_image_extraction
+)
+from app.local_date_parser import apply_time, parse_events_locally, parse_time, to_local_naive
+from app.rate_limiter import gemini_rate_limiter
+from app.transcription_cache import compute_content_hash
 from google.genai import types
 
 
-def extract_dates_from_text(text: str) -> List[Dict[str, Any]]:
+# Bump when a prompt changes so cached results are regenerated
+TEXT_EVENTS_PROMPT_VERSION = "text-events-v1"
+IMAGE_EVENTS_PROMPT_VERSION = "image-events-v1"
+
+
+_CLOCK_TIME = re.compile(r'^([01]?\d|2[0-3]):[0-5]\d(?:-([01]?\d|2[0-3]):[0-5]\d)?$')
+
+
+class ExtractedEvent(BaseModel):
+    """One event as returned by the model (also the response schema sent to Gemini)."""
+    title: str
+    date: str  # YYYY-MM-DD
+    time: Optional[str] = None  # HH:MM or HH:MM-HH:MM
+    description: str = ""
+    confidence: float = 0.5
+    
+    @field_validator('date')
+    @classmethod
+    def _check_date(cls, value: str) -> str:
+        datetime.strptime(value, '%Y-%m-%d')
+        return value
+    
+    @field_validator('time')
+    @classmethod
+    def _normalize_time(cls, value: Optional[str]) -> Optional[str]:
+        """Keep HH:MM[-HH:MM]; convert anything else ("3:45 PM") or drop it."""
+        if not value:
+            return None
+        value = value.replace(' ', '')
+        if _CLOCK_TIME.match(value):
+            return '-'.join(f"{int(t.split(':')[0]):02d}:{t.split(':')[1]}" for t in value.split('-'))
+        return parse_time(value)
+    
+    def to_event(self) -> Dict[str, Any]:
+        """Event dict with the date (and start time, if any) as a datetime."""
+        return {
+            'title': self.title or 'Untitled Event',
+            'date': apply_time(datetime.strptime(self.date, '%Y-%m-%d'), self.time),
+            'time': self.time,
+            'description': self.description,
+            'confidence': self.confidence
+        }
+
+
+# Parses the text-extraction response in one validated step
+_EVENT_LIST = TypeAdapter(List[ExtractedEvent])
+
+
+class ImageEvents(BaseModel):
+    """Response schema for fused image-to-events extraction."""
+    events: List[ExtractedEvent]
+
+
+class ImageEventsWithText(BaseModel):
+    """Response schema for fused extraction that also returns the image text (debug mode)."""
+    text: str
+    events: List[ExtractedEvent]
+
+
+def _extraction_instructions(current_date: datetime) -> str:
+    """Event extraction rules shared by the text and image prompts."""
+    current_year = current_date.year
+    current_date_str = current_date.strftime("%B %d, %Y")
+    return f"""IMPORTANT: Today is {current_date_str}. Use {current_year} as the year for dates unless explicitly stated otherwise.
+
+CRITICAL INSTRUCTIONS:
+1. If multiple dates are listed (e.g., "Nov 18,20, Dec 2,4,9,11"), create SEPARATE events for EACH date
+2. Parse time formats like "345-445" as "15:45-16:45" (3:45 PM - 4:45 PM)
+3. Parse time formats like "530-630" as "17:30-18:30" (5:30 PM - 6:30 PM)
+4. Parse time formats like "4:00 p.m." or "4:00 PM" as "16:00" (4:00 PM)
+5. Parse time formats like "4pm" or "4 PM" as "16:00" (4:00 PM)
+6. Parse time formats like "10am" or "10 AM" as "10:00" (10:00 AM)
+7. Extract event titles from context (e.g., "Martial arts classes", "Music concert")
+8. Include location if mentioned (e.g., "school gym", "main school")
+9. ALWAYS extract times when mentioned, even if in different formats
+
+Each event should have:
+- "title": A clear, concise event title (e.g., "Martial Arts Class", "Music Concert")
+- "date": ISO format date string (YYYY-MM-DD) - use {current_year} if year not specified
+- "time": Optional time string (HH:MM or HH:MM-HH:MM for ranges) if mentioned
+- "description": Full description from the text including location, dress code, etc.
+- "confidence": A number between 0 and 1 indicating how certain you are"""
+
+
+def extract_dates_from_text(text: str, reference: Optional[datetime] = None) -> List[Dict[str, Any]]:
     """
     Extract dates and events from text using Gemini API.
     
+    Common inputs ("Nov 18,20 - 345-445 Martial arts", "Concert Dec 15th at
+    4pm") are handled by the local rule-based parser with no API call. The
+    model is only called when the parser's confidence is below
+    LOCAL_DATE_PARSER_MIN_CONFIDENCE.
+    
+    The model is constrained to a JSON array of ExtractedEvent, so the
+    response parses and validates in one step. If the call fails or the
+    response does not validate, the local parser's events are used.
+    
+    Model results are cached by normalized text, today's date and prompt
+    version (see app.extraction_cache). Texts longer than
+    EXTRACTION_CHUNK_CHARS are split and the chunks extracted in parallel.
+    
     Args:
         text: Text to extract dates from
+        reference: "Today" for relative dates (defaults to now; ingestion
+            passes the email's date)
         
     Returns:
         List of dictionaries with date information:
@@ -27,177 +136,252 @@ def extract_dates_from_text(text: str) -> List[Dict[str, Any]]:
             }
         ]
     """
+    current_date = to_local_naive(reference or datetime.now())
+    local = parse_events_locally(text, current_date)
+    if local.events and local.confidence >= config.LOCAL_DATE_PARSER_MIN_CONFIDENCE:
+        print(f"⚡ Local date parser: {len(local.events)} event(s), confidence {local.confidence:.2f}")
+        return local.events
+    
     if not config.GOOGLE_API_KEY:
         raise ValueError("GOOGLE_API_KEY not set in environment variables")
     
-    client = initialize_client()
+    # The prompt embeds today's date, so cached results are only reused on the same day
+    reference_date = current_date.date().isoformat()
+    prompt_version = f"{TEXT_EVENTS_PROMPT_VERSION}:{config.EXTRACTION_MODEL}"
+    cached = get_cached_extraction(text, reference_date, prompt_version)
+    if cached is not None:
+        print(f"♻️  Extraction cache hit: {len(cached)} event(s)")
+        return cached
     
-    # Get current date for context
-    current_date = datetime.now()
-    current_year = current_date.year
-    current_date_str = current_date.strftime("%B %d, %Y")
+    complete = True
+    try:
+        if len(text) > config.EXTRACTION_CHUNK_CHARS:
+            events, complete = _extract_dates_chunked(text, current_date)
+        else:
+            events = _extract_dates_with_model(text, current_date)
+    except ValidationError as e:
+        print(f"❌ Date extraction response failed validation: {e.error_count()} error(s) - using local parser")
+        return local.events
+    except Exception as e:
+        print(f"Error extracting dates: {e} - using local parser")
+        return local.events
     
-    prompt = f"""Extract ALL dates, events, and reminders from the following text.
-IMPORTANT: Today is {current_date_str}. Use {current_year} as the year for dates unless explicitly stated otherwise.
+    # Local fallback results (even for one chunk) are not cached, so the next call retries the model
+    if complete:
+        cache_extraction(text, reference_date, prompt_version, events)
+    return events
 
-CRITICAL INSTRUCTIONS:
-1. If multiple dates are listed (e.g., "Nov 18,20, Dec 2,4,9,11"), create SEPARATE events for EACH date
-2. Parse time formats like "345-445" as "15:45-16:45" (3:45 PM - 4:45 PM)
-3. Parse time formats like "530-630" as "17:30-18:30" (5:30 PM - 6:30 PM)
-4. Parse time formats like "4:00 p.m." or "4:00 PM" as "16:00" (4:00 PM)
-5. Parse time formats like "4pm" or "4 PM" as "16:00" (4:00 PM)
-6. Parse time formats like "10am" or "10 AM" as "10:00" (10:00 AM)
-7. Extract event titles from context (e.g., "Martial arts classes", "Music concert")
-8. Include location if mentioned (e.g., "school gym", "main school")
-9. ALWAYS extract times when mentioned, even if in different formats
 
-Return a JSON array of events. Each event should have:
-- "title": A clear, concise event title (e.g., "Martial Arts Class", "Music Concert")
-- "date": ISO format date string (YYYY-MM-DD) - use {current_year} if year not specified
-- "time": Optional time string (HH:MM or HH:MM-HH:MM for ranges) if mentioned
-- "description": Full description from the text including location, dress code, etc.
-- "confidence": A number between 0 and 1 indicating how certain you are
+def split_text_into_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Split text on section and paragraph boundaries into chunks of at most max_chars.
+    
+    Markdown headings start a new section. Paragraphs are packed greedily;
+    a paragraph that is too long on its own is split by lines, and a line
+    that is too long by characters.
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum chunk length
+        
+    Returns:
+        Non-empty chunks in text order
+    """
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n|\n(?=#)', text):
+        paragraph = paragraph.strip()
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        starts_section = piece.startswith('#')
+        if current and (starts_section or len(current) + len(piece) + 2 > max_chars):
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def merge_events(event_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Concatenate event lists, dropping duplicates on (title, date, time).
+    
+    Chunks of one document often repeat an event (e.g., a reminder in two
+    sections); the copy with the higher confidence is kept, in first-seen order.
+    """
+    merged: Dict[Tuple[str, Any, Optional[str]], Dict[str, Any]] = {}
+    for events in event_lists:
+        for event in events:
+            key = (
+                re.sub(r'\s+', ' ', str(event.get('title', ''))).strip().lower(),
+                event['date'].date(),
+                event.get('time')
+            )
+            if key not in merged or event.get('confidence', 0) > merged[key].get('confidence', 0):
+                merged[key] = event
+    return list(merged.values())
+
+
+def _extract_dates_chunked(text: str, current_date: datetime) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Extract events from a long text chunk by chunk, in parallel.
+    
+    Chunks share the process-wide Gemini rate limiter, so latency is bounded
+    by the slowest chunk rather than the document length. A chunk whose call
+    fails falls back to the local parser for that chunk only.
+    
+    Returns:
+        (merged events, True if every chunk was extracted by the model)
+    """
+    chunks = split_text_into_chunks(text, config.EXTRACTION_CHUNK_CHARS)
+    print(f"✂️  Extracting dates from {len(chunks)} chunks ({len(text):,} chars)")
+    
+    def _extract_chunk(chunk: str) -> Tuple[List[Dict[str, Any]], bool]:
+        try:
+            return _extract_dates_with_model(chunk, current_date), True
+        except Exception as e:
+            print(f"  ⚠️  Chunk extraction failed ({e}) - using local parser for this chunk")
+            return parse_events_locally(chunk, current_date).events, False
+    
+    workers = max(1, min(len(chunks), config.EXTRACTION_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_extract_chunk, chunks))
+    
+    events = merge_events([chunk_events for chunk_events, _ in results])
+    print(f"  ✓ {sum(len(r) for r, _ in results)} events from chunks, {len(events)} after dedupe")
+    return events, all(from_model for _, from_model in results)
+
+
+def _extract_dates_with_model(text: str, current_date: datetime) -> List[Dict[str, Any]]:
+    """
+    One schema-constrained Gemini call over text.
+    
+    Raises:
+        ValidationError: If the response does not match the schema
+    """
+    client = initialize_client()
+    
+    prompt = f"""Extract ALL dates, events, and reminders from the following text.
+{_extraction_instructions(current_date)}
 
 Text to analyze:
 {text}
 
-Return ONLY valid JSON array, no other text. 
-
-Example for "Nov 18,20, Dec 2,4,9,11 - 345-445 Denali Martial arts classes":
+Example for "Nov 18,20 - 345-445 Denali Martial arts classes":
 [
   {{"title": "Martial Arts Class", "date": "2025-11-18", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}},
-  {{"title": "Martial Arts Class", "date": "2025-11-20", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}},
-  {{"title": "Martial Arts Class", "date": "2025-12-02", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}},
-  {{"title": "Martinal Arts Class", "date": "2025-12-04", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}},
-  {{"title": "Martial Arts Class", "date": "2025-12-09", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}},
-  {{"title": "Martial Arts Class", "date": "2025-12-11", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}}
+  {{"title": "Martial Arts Class", "date": "2025-11-20", "time": "15:45-16:45", "description": "Denali Martial arts classes at school gym", "confidence": 0.95}}
 ]"""
     
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=[types.Part.from_text(text=prompt)],
-            config=types.GenerateContentConfig(
-                temperature=0.1,
-                response_mime_type="application/json"
-            )
+    # The response schema makes the model return a JSON array of ExtractedEvent
+    response = gemini_rate_limiter.call(
+        client.models.generate_content,
+        model=config.EXTRACTION_MODEL,
+        contents=[types.Part.from_text(text=prompt)],
+        config=types.GenerateContentConfig(
+            temperature=0.1,
+            response_mime_type="application/json",
+            response_schema=list[ExtractedEvent]
         )
-        
-        if hasattr(response, 'text') and response.text:
-            import json
-            response_text = response.text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith('```'):
-                # Extract JSON from code block
-                lines = response_text.split('\n')
-                json_lines = []
-                in_code_block = False
-                for line in lines:
-                    if line.strip().startswith('```'):
-                        in_code_block = not in_code_block
-                        continue
-                    if in_code_block or (not response_text.startswith('```json') and not response_text.startswith('```')):
-                        json_lines.append(line)
-                response_text = '\n'.join(json_lines)
-            
-            try:
-                events = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing error: {e}")
-                print(f"Response text (first 500 chars): {response_text[:500]}")
-                # Try to extract JSON from response if it's wrapped in text
-                import re
-                json_match = re.search(r'\[.*\]', response_text, re.DOTALL)
-                if json_match:
-                    try:
-                        events = json.loads(json_match.group(0))
-                        print("✅ Recovered JSON from response")
-                    except:
-                        print("❌ Could not recover JSON")
-                        return []
-                else:
-                    return []
-            
-            # Parse dates and convert to datetime objects
-            parsed_events = []
-            for event in events:
-                try:
-                    date_str = event.get('date')
-                    if date_str:
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-                        
-                        # If time is provided, combine with date
-                        # Handle time ranges (e.g., "15:45-16:45" or "3:45 PM - 4:45 PM")
-                        time_str = event.get('time')
-                        if time_str:
-                            try:
-                                # Handle time ranges - use start time
-                                if '-' in time_str and ':' in time_str:
-                                    # Format like "15:45-16:45"
-                                    start_time = time_str.split('-')[0].strip()
-                                    time_parts = start_time.split(':')
-                                    date_obj = date_obj.replace(
-                                        hour=int(time_parts[0]),
-                                        minute=int(time_parts[1]) if len(time_parts) > 1 else 0
-                                    )
-                                elif ':' in time_str:
-                                    # Single time like "15:45"
-                                    time_parts = time_str.split(':')
-                                    date_obj = date_obj.replace(
-                                        hour=int(time_parts[0]),
-                                        minute=int(time_parts[1]) if len(time_parts) > 1 else 0
-                                    )
-                            except Exception as e:
-                                print(f"Error parsing time {time_str}: {e}")
-                                pass
-                        
-                        parsed_events.append({
-                            'title': event.get('title', 'Untitled Event'),
-                            'date': date_obj,
-                            'time': time_str,
-                            'description': event.get('description', ''),
-                            'confidence': event.get('confidence', 0.5)
-                        })
-                except Exception as e:
-                    print(f"Error parsing event date: {e}")
-                    continue
-            
-            return parsed_events
-        
+    )
+    
+    if not getattr(response, 'text', None):
         return []
-    except Exception as e:
-        print(f"Error extracting dates: {e}")
-        # Fallback to simple regex-based extraction
-        return _extract_dates_regex(text)
-
-
-def _extract_dates_regex(text: str) -> List[Dict[str, Any]]:
-    """Fallback regex-based date extraction."""
-    events = []
-    
-    # Common date patterns
-    patterns = [
-        r'(\d{1,2})(?:st|nd|rd|th)?\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{4})',
-        r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})',
-        r'(\d{1,2})/(\d{1,2})/(\d{4})',
-    ]
-    
-    month_map = {
-        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
-        'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-    }
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            try:
-                groups = match.groups()
-                # Simple extraction - would need more logic for full parsing
-                # This is just a fallback
-                pass
-            except:
-                continue
+    return [event.to_event() for event in _EVENT_LIST.validate_json(response.text)]
+
+
+def extract_events_from_image(
+    data: UploadSource,
+    mime_type: str,
+    filename: Optional[str] = None,
+    include_text: bool = False,
+    content_hash: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Extract events straight from an image in one schema-constrained model call.
     
-    return events
+    Replaces OCR followed by a second text-to-events call. Results go in the
+    extraction cache (with its TTL), keyed by image hash, prompt version and
+    today's date (relative dates like "this Friday" depend on it).
+    
+    Args:
+        data: Image bytes or a seekable binary stream
+        mime_type: MIME type of the image
+        filename: Optional original filename
+        include_text: Also ask for the image's text (for debug mode)
+        content_hash: Optional precomputed SHA-256 of data (skips hashing)
+        
+    Returns:
+        (events in the same shape as extract_dates_from_text, image text or None)
+    """
+    if not config.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set in environment variables")
+    
+    schema = ImageEventsWithText if include_text else ImageEvents
+    current_date = datetime.now()
+    reference_date = current_date.date().isoformat()
+    prompt_version = f"{IMAGE_EVENTS_PROMPT_VERSION}{'+text' if include_text else ''}:{config.TRANSCRIPTION_MODEL}"
+    content_hash = content_hash or compute_content_hash(data)
+    
+    cached = get_cached_image_extraction(content_hash, reference_date, prompt_version)
+    if cached is not None:
+        print(f"  ♻️  Image extraction cache hit ({content_hash[:12]})")
+        return cached
+    
+    raw = _extract_events_from_image_uncached(data, mime_type, filename, schema, current_date)
+    result = schema.model_validate_json(raw)
+    events = [event.to_event() for event in result.events]
+    text = getattr(result, 'text', None)
+    cache_image_extraction(content_hash, reference_date, prompt_version, events, text)
+    return events, text
 
+
+def _extract_events_from_image_uncached(
+    data: UploadSource,
+    mime_type: str,
+    filename: Optional[str],
+    schema: type,
+    current_date: datetime
+) -> str:
+    """Run the fused image-to-events call and return the validated JSON response."""
+    data, mime_type = prepare_image_for_vision(data, mime_type)
+    
+    text_instruction = ""
+    if schema is ImageEventsWithText:
+        text_instruction = '\nAlso return "text": ALL text in the image, exactly as it appears.\n'
+    
+    prompt = f"""This image is usually a screenshot of a conversation (SMS, WhatsApp, iMessage) or a school flyer.
+Extract ALL dates, events, and reminders shown in it.
+{_extraction_instructions(current_date)}
+{text_instruction}"""
+    
+    response = generate_from_media(
+        prompt,
+        data,
+        mime_type,
+        display_name=filename,
+        max_wait=30,
+        poll_interval=2,
+        generation_config=types.GenerateContentConfig(
+            temperature=0.1,
+            response_mime_type="application/json",
+            response_schema=schema
+        )
+    )
+    
+    if not getattr(response, 'text', None):
+        raise Exception("Could not extract events from image. The image may be unclear or contain no readable text.")
+    
+    # Validate before caching so a malformed response is never stored
+    schema.model_validate_json(response.text)
+    print(f"📸 Extracted events from image in one call ({len(response.text)} chars of JSON)")
+    return response.text
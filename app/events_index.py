@@ -0,0 +1,460 @@
+"""On-disk index of events extracted from ingested emails, sorted by start time."""
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.date_extractor import extract_dates_from_text
+from app.local_date_parser import to_local_naive
+
+
+EVENTS_INDEX_FILE = "data/.events_index.json"
+
+# Event descriptions are trimmed; the source section has the full text
+MAX_DESCRIPTION_CHARS = 300
+
+# How far ahead "when is the next ..." looks
+UPCOMING_DAYS = 120
+
+# Range of /events when no "to" is given
+DEFAULT_RANGE_DAYS = 7
+
+# Words that carry no keyword signal in a date question
+QUESTION_WORDS = {
+    "a", "an", "and", "any", "are", "at", "coming", "date", "day", "do", "does", "for", "have",
+    "i", "in", "is", "it", "me", "my", "next", "of", "on", "our", "schedule", "scheduled",
+    "the", "there", "this", "time", "today", "tomorrow", "upcoming", "was", "we", "week",
+    "what", "whats", "when", "which", "will", "events", "event", "happening", "going"
+}
+
+# The ingestion writer updates the index while the API reads it
+_lock = threading.Lock()
+
+# In-memory copy of the index served by /events. add_email_events swaps in the
+# updated list; writes from another process (CLI ingestion, the backfill
+# script) are picked up by comparing the file's mtime.
+_view: Dict[str, Any] = {
+    'events': [], 'starts': [], 'emails': {}, 'uploads': {}, 'version': 0, 'updated_at': None, 'mtime': None
+}
+
+
+def _event_id(email_id: str, event: Dict[str, Any]) -> str:
+    """Stable ID of an event within its source email."""
+    key = f"{email_id}|{event['title']}|{event['date'].isoformat()}|{event.get('time')}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def _empty_index() -> Dict[str, Any]:
+    return {'events': [], 'emails': {}, 'uploads': {}, 'updated_at': None, 'version': 0}
+
+
+def load_events_index() -> Dict[str, Any]:
+    """Load the index from disk."""
+    if not os.path.exists(EVENTS_INDEX_FILE):
+        return _empty_index()
+
+    try:
+        with open(EVENTS_INDEX_FILE, 'r') as f:
+            index = json.load(f)
+        index.setdefault('events', [])
+        index.setdefault('emails', {})
+        index.setdefault('uploads', {})
+        index.setdefault('version', 0)
+        return index
+    except (json.JSONDecodeError, IOError):
+        return _empty_index()
+
+
+def save_events_index(index: Dict[str, Any]) -> None:
+    """Save the index to disk."""
+    os.makedirs(os.path.dirname(EVENTS_INDEX_FILE), exist_ok=True)
+    tmp_path = EVENTS_INDEX_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, EVENTS_INDEX_FILE)
+
+
+def extract_email_events(email_date: datetime, email_body: str, transcribed_attachments: List[tuple] = None) -> List[Dict[str, Any]]:
+    """
+    Extract events from an email and its transcribed attachments.
+
+    Relative dates ("this Friday") are resolved against the email's date,
+    converted to naive local time (Gmail dates carry a UTC offset).
+
+    Returns:
+        Events in the shape returned by extract_dates_from_text
+    """
+    parts = [email_body or ""]
+    for _, transcribed_text, *_ in transcribed_attachments or []:
+        if transcribed_text and not transcribed_text.startswith("["):
+            parts.append(transcribed_text)
+    text = "\n\n".join(part for part in parts if part.strip())
+    if not text:
+        return []
+    return extract_dates_from_text(text, reference=to_local_naive(email_date))
+
+
+def add_email_events(
+    email_id: str,
+    subject: str,
+    sender: str,
+    email_date: datetime,
+    events: List[Dict[str, Any]],
+    source_file: str
+) -> int:
+    """
+    Add (or replace) one email's events in the index, keeping it sorted by start.
+
+    Args:
+        email_id: Gmail message ID
+        subject: Email subject
+        sender: Sender address
+        email_date: Date of the email
+        events: Extracted events (dates as datetimes)
+        source_file: Consolidated markdown file holding the email's section
+
+    Returns:
+        Number of events indexed for the email
+    """
+    # Matches the consolidated heading, which uses the email's own date
+    section = f"## Email: {email_date.strftime('%Y-%m-%d')} - {subject}"
+    # Starts are compared as ISO strings, so every one must be naive local time
+    entries = []
+    for event in events:
+        event = {**event, 'date': to_local_naive(event['date'])}
+        entries.append({
+            'id': _event_id(email_id, event),
+            'title': event['title'],
+            'start': event['date'].isoformat(),
+            'time': event.get('time'),
+            'description': (event.get('description') or '')[:MAX_DESCRIPTION_CHARS],
+            'confidence': event.get('confidence'),
+            'email_id': email_id,
+            'subject': subject,
+            'sender': sender,
+            'source_file': os.path.basename(source_file),
+            'section': section
+        })
+
+    return _store_events('emails', 'email_id', email_id, entries)
+
+
+def add_upload_events(upload_id: str, filename: str, events: List[Dict[str, Any]]) -> int:
+    """
+    Add (or replace) the events of an uploaded image, for the /calendar.ics feed.
+
+    Uploads are tracked under index['uploads'] and their events carry an
+    'upload_id' instead of an 'email_id', so they never count as emails.
+
+    Args:
+        upload_id: Stable ID of the upload (derived from its events)
+        filename: Uploaded file name, shown as the event's source
+        events: Extracted events (dates as datetimes)
+
+    Returns:
+        Number of events indexed for the upload
+    """
+    entries = []
+    for event in events:
+        event = {**event, 'date': to_local_naive(event['date'])}
+        entries.append({
+            'id': _event_id(upload_id, event),
+            'title': event['title'],
+            'start': event['date'].isoformat(),
+            'time': event.get('time'),
+            'description': (event.get('description') or '')[:MAX_DESCRIPTION_CHARS],
+            'confidence': event.get('confidence'),
+            'upload_id': upload_id,
+            'subject': filename,
+            'sender': ''
+        })
+    return _store_events('uploads', 'upload_id', upload_id, entries)
+
+
+def _store_events(namespace: str, id_field: str, source_id: str, entries: List[Dict[str, Any]]) -> int:
+    """Replace one source's events (an email or an upload) in the index, keeping it sorted."""
+    with _lock:
+        index = load_events_index()
+        # Re-indexing a source replaces its previous events
+        events_list = [e for e in index['events'] if e.get(id_field) != source_id]
+        seen = set()
+        for entry in entries:
+            if entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            bisect.insort(events_list, entry, key=lambda e: (e['start'], e['id']))
+        index['events'] = events_list
+        index[namespace][source_id] = {'events': len(seen), 'indexed_at': datetime.now().isoformat()}
+        index['updated_at'] = datetime.now().isoformat()
+        index['version'] += 1
+        save_events_index(index)
+        _set_view(index)
+    return len(seen)
+
+
+def _index_mtime() -> Optional[float]:
+    try:
+        return os.path.getmtime(EVENTS_INDEX_FILE)
+    except OSError:
+        return None
+
+
+def _set_view(index: Dict[str, Any]) -> None:
+    """Replace the in-memory view (readers keep the snapshot they already hold)."""
+    global _view
+    events = index['events']
+    _view = {
+        'events': events,
+        'starts': [e['start'] for e in events],
+        'emails': index['emails'],
+        'uploads': index['uploads'],
+        'version': index['version'],
+        'updated_at': index.get('updated_at'),
+        'mtime': _index_mtime()
+    }
+
+
+def load_events_view() -> None:
+    """Load the index from disk into memory (called at startup)."""
+    with _lock:
+        _set_view(load_events_index())
+    print(f"📅 Loaded events index: {len(_view['events'])} events")
+
+
+def get_events_view() -> Dict[str, Any]:
+    """
+    The in-memory index, reloaded first if another process has rewritten the file.
+
+    Returns:
+        Dict with 'events' (sorted by start), 'starts', 'emails', 'uploads', 'version' and 'updated_at'
+    """
+    view = _view
+    if view['mtime'] != _index_mtime():
+        with _lock:
+            _set_view(load_events_index())
+        view = _view
+    return view
+
+
+def find_events(
+    start: datetime,
+    end: datetime,
+    keywords: Optional[List[str]] = None,
+    sender: Optional[str] = None,
+    view: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Events starting in [start, end), optionally matching every keyword.
+
+    A binary search over the sorted start times finds the range, so the cost
+    is O(log n) plus the number of events in range.
+
+    Args:
+        start: Range start (inclusive)
+        end: Range end (exclusive)
+        keywords: Lowercase words that must all appear in the title or description
+        sender: Case-insensitive substring of the sender address
+        view: Index view to search (defaults to the in-memory view)
+
+    Returns:
+        Matching events in start order
+    """
+    view = view or get_events_view()
+    lo = bisect.bisect_left(view['starts'], start.isoformat())
+    hi = bisect.bisect_left(view['starts'], end.isoformat())
+    found = view['events'][lo:hi]
+    if keywords:
+        found = [e for e in found if _matches_keywords(e, keywords)]
+    if sender:
+        sender = sender.lower()
+        found = [e for e in found if sender in (e.get('sender') or '').lower()]
+    return found
+
+
+def parse_range_bound(value: Optional[str], default: datetime, end: bool = False) -> datetime:
+    """
+    Parse a /events "from" or "to" value (ISO date or datetime).
+
+    A bare date used as "to" includes that whole day.
+
+    Raises:
+        ValueError: If the value is not an ISO date or datetime
+    """
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.replace(tzinfo=None)
+
+
+def query_events(
+    from_value: Optional[str] = None,
+    to_value: Optional[str] = None,
+    sender: Optional[str] = None,
+    keyword: Optional[str] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Events in a date range, filtered by sender and keyword, from the in-memory index.
+
+    Args:
+        from_value: Range start (ISO date/datetime, default today)
+        to_value: Range end (ISO date/datetime, default DEFAULT_RANGE_DAYS after the start)
+        sender: Case-insensitive substring of the sender address
+        keyword: Words that must all appear in the event title or description
+        now: Current time (for tests)
+
+    Returns:
+        Dict with the resolved range, index version and matching events
+
+    Raises:
+        ValueError: If a range bound is not an ISO date or datetime
+    """
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = parse_range_bound(from_value, today)
+    end = parse_range_bound(to_value, start + timedelta(days=DEFAULT_RANGE_DAYS), end=True)
+    keywords = re.findall(r"[a-z0-9']+", keyword.lower()) if keyword else None
+
+    view = get_events_view()
+    events = find_events(start, end, keywords, sender, view)
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'version': view['version'],
+        'updated_at': view['updated_at'],
+        'count': len(events),
+        'events': events
+    }
+
+
+def _matches_keywords(event: Dict[str, Any], keywords: List[str]) -> bool:
+    """All keywords (or their singular forms) appear in the event's title or description."""
+    haystack = f"{event['title']} {event['description']}".lower()
+    return all(word in haystack or word.rstrip('s') in haystack for word in keywords)
+
+
+def _question_keywords(question: str) -> List[str]:
+    """Content words of a question, e.g. "when is the next martial arts class" -> martial, arts, class."""
+    words = re.findall(r"[a-z0-9']+", question.lower().replace("'s", ""))
+    return [w for w in words if w not in QUESTION_WORDS and len(w) > 1]
+
+
+def get_question_range(question: str, now: Optional[datetime] = None) -> Optional[Tuple[datetime, datetime, str]]:
+    """
+    Map a date question to a time range.
+
+    Returns:
+        (start, end, label), or None if the question is not about dates
+    """
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    q = question.lower()
+
+    if 'tomorrow' in q:
+        return today + timedelta(days=1), today + timedelta(days=2), "tomorrow"
+    if re.search(r'\btoday\b|\btonight\b', q):
+        return today, today + timedelta(days=1), "today"
+    if 'next week' in q:
+        start = today + timedelta(days=7 - today.weekday())
+        return start, start + timedelta(days=7), "next week"
+    if 'this week' in q:
+        return today, today + timedelta(days=7 - today.weekday()), "this week"
+    if re.search(r'\b(when|upcoming|next|coming up)\b', q):
+        return now, today + timedelta(days=UPCOMING_DAYS), "upcoming"
+    return None
+
+
+def _format_event(event: Dict[str, Any]) -> str:
+    start = datetime.fromisoformat(event['start'])
+    when = start.strftime("%A, %B %d, %Y")
+    if event.get('time'):
+        when += " at " + start.strftime("%I:%M %p").lstrip('0')
+    return f"• **📅 {when}** — {event['title']}\n  _From: {event['subject']}_"
+
+
+def _in_title(event: Dict[str, Any], keywords: List[str]) -> bool:
+    """All keywords (or their singular forms) appear in the event's title."""
+    title = event['title'].lower()
+    return all(word in title or word.rstrip('s') in title for word in keywords)
+
+
+def answer_from_events_index(question: str, now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Answer a pure date/schedule question from the events index, without the model.
+
+    A question is only answered here when every content word names the
+    event ("when is the next martial arts class?"). A question about
+    anything else ("what's the dress code for the concert next week?") is
+    left to RAG, which gets the events from get_question_events_context().
+
+    Returns:
+        A formatted answer, or None if the question isn't a pure date question
+        or the index has nothing in range (the caller then falls back to RAG)
+    """
+    question_range = get_question_range(question, now)
+    if question_range is None:
+        return None
+
+    start, end, label = question_range
+    keywords = _question_keywords(question)
+    events = find_events(start, end, keywords)
+    if not events or not all(_in_title(e, keywords) for e in events):
+        return None
+
+    if label == "upcoming" and keywords:
+        # "When is the next martial arts class?" - the next occurrence, plus a few after it
+        events = events[:4]
+        heading = f"**Next: {events[0]['title']}**"
+    else:
+        events = events[:20]
+        heading = f"**Events {label}**" if label != "upcoming" else "**Upcoming events**"
+
+    lines = [heading, ""] + [_format_event(e) for e in events]
+    return "\n".join(lines)
+
+
+def get_question_events_context(question: str, now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Indexed events in a date question's range, as plain-text context for RAG.
+
+    Events matching the question's keywords are used if there are any,
+    otherwise every event in range.
+
+    Returns:
+        One line per event (at most 20), or None if the question isn't a date
+        question or the index has nothing in range
+    """
+    question_range = get_question_range(question, now)
+    if question_range is None:
+        return None
+
+    start, end, _ = question_range
+    events = find_events(start, end, _question_keywords(question)) or find_events(start, end)
+    if not events:
+        return None
+
+    lines = []
+    for event in events[:20]:
+        when = datetime.fromisoformat(event['start']).strftime("%A, %B %d, %Y")
+        if event.get('time'):
+            when += f" {event['time']}"
+        lines.append(f"- {when}: {event['title']} (from email \"{event['subject']}\")")
+    return "\n".join(lines)
+
+
+def get_events_index_stats() -> Dict[str, Any]:
+    """Event, email and upload counts of the index."""
+    index = load_events_index()
+    return {
+        'events': len(index['events']),
+        'emails': len(index['emails']),
+        'uploads': len(index['uploads']),
+        'version': index['version'],
+        'updated_at': index.get('updated_at'),
+        'index_file': EVENTS_INDEX_FILE
+    }
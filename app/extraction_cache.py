@@ -0,0 +1,158 @@
+"""Persistent cache of text-to-events and image-to-events extraction results."""
+import hashlib
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.persistent_cache import PersistentJsonCache
+
+
+EXTRACTION_CACHE_FILE = "data/.extraction_cache.json"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different copies of an announcement share a cache entry."""
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def get_extraction_cache_key(text: str, reference_date: str, prompt_version: str) -> str:
+    """
+    Cache key: normalized text hash, reference date and prompt version.
+
+    The prompt embeds "today", so the same text extracted on another day
+    (where "this Friday" resolves differently) is a different entry.
+    """
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{digest}:{reference_date}:{prompt_version}"
+
+
+def get_image_extraction_cache_key(content_hash: str, reference_date: str, prompt_version: str) -> str:
+    """Cache key of an image: its SHA-256, reference date and prompt version."""
+    return f"image:{content_hash}:{reference_date}:{prompt_version}"
+
+
+def _empty_cache() -> Dict[str, Any]:
+    return {'entries': {}, 'stats': {'hits': 0, 'misses': 0, 'expired': 0}}
+
+
+# Kept in memory; /extract-dates, /voice-calendar and ingestion share it.
+# Lookups don't rewrite the file - only new results (and periodic counter flushes) do.
+_cache = PersistentJsonCache(EXTRACTION_CACHE_FILE, _empty_cache)
+
+
+def flush_extraction_cache() -> None:
+    """Save pending hit counters (call at shutdown and after ingestion)."""
+    _cache.flush(force=True)
+
+
+def _is_expired(entry: Dict[str, Any], now: datetime) -> bool:
+    return now - datetime.fromisoformat(entry['created_at']) > timedelta(hours=config.EXTRACTION_CACHE_TTL_HOURS)
+
+
+def _evict_expired(cache: Dict[str, Any], now: datetime) -> None:
+    """Drop entries older than the TTL."""
+    expired = [key for key, entry in cache['entries'].items() if _is_expired(entry, now)]
+    for key in expired:
+        del cache['entries'][key]
+    cache['stats']['expired'] += len(expired)
+
+
+def _serialize_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**event, 'date': event['date'].isoformat()} for event in events]
+
+
+def _deserialize_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**event, 'date': datetime.fromisoformat(event['date'])} for event in events]
+
+
+def _lookup(key: str) -> Optional[Dict[str, Any]]:
+    """Get an unexpired entry and record a hit or miss."""
+    now = datetime.now()
+    with _cache.touch() as cache:
+        entry = cache['entries'].get(key)
+        if entry is not None and _is_expired(entry, now):
+            # Dropped from memory now; from the file with the next write
+            del cache['entries'][key]
+            cache['stats']['expired'] += 1
+            entry = None
+        if entry is None:
+            cache['stats']['misses'] += 1
+        else:
+            cache['stats']['hits'] += 1
+            entry['hits'] = entry.get('hits', 0) + 1
+    return entry
+
+
+def _store(key: str, events: List[Dict[str, Any]], **extra: Any) -> None:
+    """Store extracted events under a key, dropping expired entries."""
+    now = datetime.now()
+    with _cache.write() as cache:
+        _evict_expired(cache, now)
+        cache['entries'][key] = {
+            'events': _serialize_events(events),
+            **extra,
+            'created_at': now.isoformat(),
+            'hits': 0
+        }
+
+
+def get_cached_extraction(text: str, reference_date: str, prompt_version: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Look up extracted events and record a hit or miss.
+
+    Returns:
+        Cached events (dates as datetimes), or None
+    """
+    entry = _lookup(get_extraction_cache_key(text, reference_date, prompt_version))
+    return _deserialize_events(entry['events']) if entry else None
+
+
+def cache_extraction(text: str, reference_date: str, prompt_version: str, events: List[Dict[str, Any]]) -> None:
+    """Store extracted events, dropping expired entries."""
+    _store(get_extraction_cache_key(text, reference_date, prompt_version), events)
+
+
+def get_cached_image_extraction(
+    content_hash: str,
+    reference_date: str,
+    prompt_version: str
+) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+    """
+    Look up events extracted from an image and record a hit or miss.
+
+    Returns:
+        (events with dates as datetimes, image text or None), or None on a miss
+    """
+    entry = _lookup(get_image_extraction_cache_key(content_hash, reference_date, prompt_version))
+    return (_deserialize_events(entry['events']), entry.get('text')) if entry else None
+
+
+def cache_image_extraction(
+    content_hash: str,
+    reference_date: str,
+    prompt_version: str,
+    events: List[Dict[str, Any]],
+    text: Optional[str] = None
+) -> None:
+    """Store events extracted from an image (and its text, in debug mode)."""
+    _store(get_image_extraction_cache_key(content_hash, reference_date, prompt_version), events, text=text)
+
+
+def get_extraction_cache_stats() -> Dict[str, Any]:
+    """Entry count and hit rate of the extraction cache."""
+    with _cache.read() as cache:
+        stats = dict(cache['stats'])
+        entries = len(cache['entries'])
+    lookups = stats['hits'] + stats['misses']
+    return {
+        'entries': entries,
+        'ttl_hours': config.EXTRACTION_CACHE_TTL_HOURS,
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'expired': stats['expired'],
+        'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+        'cache_file': EXTRACTION_CACHE_FILE
+    }
@@ -1,16 +1,47 @@
 """Gemini File Search operations for uploading and managing files."""
+import io
 import os
+import mmap
 import time
 import json
+import mimetypes
 import requests
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Set
+from typing import Any, Dict, Iterator, Optional, Set, Union
 
 import google.genai as genai
 from google.genai import types
 
 from app.config import config
-from app.upload_tracker import is_file_uploaded, mark_file_uploaded
+from app.attachment_store import prune_blob_files
+from app.rate_limiter import gemini_rate_limiter
+from app.upload_tracker import is_file_uploaded, mark_file_uploaded, record_remote_upload
+
+
+# Files larger than this are memory-mapped for upload instead of read through a buffer
+MMAP_THRESHOLD = 8 * 1024 * 1024  # 8MB
+
+# Upload MIME types by extension. Markdown goes up as text/plain since
+# Gemini handles plain text better than text/markdown.
+UPLOAD_MIME_TYPES = {
+    '.md': 'text/plain',
+    '.txt': 'text/plain',
+    '.csv': 'text/csv',
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+}
+
+UploadSource = Union[bytes, bytearray, memoryview, mmap.mmap, io.IOBase]
+
+# Latency of vision calls per media path ("inline" or "files_api")
+_vision_stats: Dict[str, Dict[str, float]] = {}
+_vision_stats_lock = threading.Lock()
 
 
 def initialize_client() -> genai.Client:
@@ -21,6 +52,280 @@ def initialize_client() -> genai.Client:
     return genai.Client(api_key=config.GOOGLE_API_KEY)
 
 
+class MemoryViewReader(io.RawIOBase):
+    """
+    Seekable read-only stream over a buffer.
+    
+    Reads are served from memoryview slices, so wrapping bytes or an mmap
+    never copies the whole payload - only the chunk the SDK asks for.
+    """
+    
+    def __init__(self, buffer):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        size = len(chunk)
+        b[:size] = chunk
+        self._pos += size
+        return size
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def guess_mime_type(filename: str, default: str = 'application/octet-stream') -> str:
+    """Get the MIME type to upload a file as, based on its extension."""
+    ext = Path(filename).suffix.lower()
+    if ext in UPLOAD_MIME_TYPES:
+        return UPLOAD_MIME_TYPES[ext]
+    return mimetypes.guess_type(filename)[0] or default
+
+
+@contextmanager
+def open_upload_source(filepath: str) -> Iterator[io.IOBase]:
+    """
+    Open a file as a binary stream suitable for upload.
+    
+    Large files are memory-mapped so the upload reads pages straight from
+    the page cache; smaller files use a regular buffered file handle.
+    
+    Args:
+        filepath: Path to the file
+        
+    Yields:
+        Seekable binary stream over the file contents
+    """
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            yield f
+            return
+        
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        reader = MemoryViewReader(mapped)
+        try:
+            yield reader
+        finally:
+            reader.close()
+            mapped.close()
+
+
+def get_file_state(file) -> str:
+    """Get a Files API file state as an upper-case string (handles str and enum states)."""
+    state = file.state
+    if isinstance(state, str):
+        return state.upper()
+    elif hasattr(state, 'name'):
+        return state.name.upper()
+    else:
+        return str(state).upper()
+
+
+def wait_for_file_active(client: genai.Client, file, max_wait: int = 120, poll_interval: int = 5):
+    """
+    Poll the Files API until a file has finished processing.
+    
+    Args:
+        client: Gemini client
+        file: File returned by files.upload
+        max_wait: Maximum seconds to wait
+        poll_interval: Seconds between polls
+        
+    Returns:
+        Latest File object (may still be PROCESSING if max_wait was reached)
+    """
+    wait_time = 0
+    while "PROCESSING" in get_file_state(file) and wait_time < max_wait:
+        time.sleep(poll_interval)
+        wait_time += poll_interval
+        file = client.files.get(name=file.name)
+        if wait_time % 15 == 0:
+            print(f"  ⏳ Still processing... ({wait_time}s/{max_wait}s)")
+    return file
+
+
+def upload_bytes_to_files_api(
+    data: UploadSource,
+    mime_type: str,
+    display_name: Optional[str] = None,
+    client: Optional[genai.Client] = None,
+    max_wait: int = 120,
+    poll_interval: int = 5
+):
+    """
+    Upload an in-memory payload or binary stream to the Gemini Files API.
+    
+    Nothing is written to disk: bytes, memoryviews and mmaps are wrapped in
+    a zero-copy reader, and file-like objects are streamed from the start
+    (so a retried upload re-sends the whole stream).
+    
+    Args:
+        data: bytes-like object, mmap, or seekable binary stream
+        mime_type: MIME type of the payload (required - there is no filename to sniff)
+        display_name: Optional display name for the uploaded file
+        client: Optional Gemini client to reuse
+        max_wait: Maximum seconds to wait for processing
+        poll_interval: Seconds between processing polls
+        
+    Returns:
+        Uploaded File object (ACTIVE, or PROCESSING if max_wait was reached)
+    """
+    if not mime_type:
+        raise ValueError("mime_type is required for in-memory uploads")
+    
+    client = client or initialize_client()
+    
+    stream = data if isinstance(data, io.IOBase) else MemoryViewReader(data)
+    stream.seek(0)
+    try:
+        file = client.files.upload(
+            file=stream,
+            config=types.UploadFileConfig(mime_type=mime_type, display_name=display_name)
+        )
+    finally:
+        if stream is not data:
+            stream.close()
+    
+    file = wait_for_file_active(client, file, max_wait=max_wait, poll_interval=poll_interval)
+    
+    state = get_file_state(file)
+    if "PROCESSING" not in state and "ACTIVE" not in state:
+        raise Exception(f"File upload failed. State: {state}")
+    
+    return file
+
+
+def _payload_size(data: UploadSource) -> int:
+    """Size in bytes of a buffer or seekable stream."""
+    if isinstance(data, io.IOBase):
+        data.seek(0, io.SEEK_END)
+        size = data.tell()
+        data.seek(0)
+        return size
+    return len(data)
+
+
+def _payload_bytes(data: UploadSource) -> bytes:
+    """Copy a buffer or seekable stream into bytes (only used for small payloads)."""
+    if isinstance(data, io.IOBase):
+        data.seek(0)
+        return data.read()
+    return bytes(data)
+
+
+def generate_from_media(
+    prompt: str,
+    data: UploadSource,
+    mime_type: str,
+    display_name: Optional[str] = None,
+    client: Optional[genai.Client] = None,
+    max_wait: int = 120,
+    poll_interval: int = 5,
+    generation_config: Optional[types.GenerateContentConfig] = None
+):
+    """
+    Run a one-shot generate_content call over an image or PDF.
+    
+    Payloads up to INLINE_MEDIA_MAX_MB are sent inline in the request itself
+    (one round trip). Larger ones are uploaded to the Files API, polled until
+    ACTIVE, and referenced by URI. Both paths go through the Gemini rate
+    limiter and their latency is recorded per path.
+    
+    Args:
+        prompt: Instruction text
+        data: bytes-like object, mmap, or seekable binary stream
+        mime_type: MIME type of the payload
+        display_name: Optional display name (Files API path only)
+        client: Optional Gemini client to reuse
+        max_wait: Maximum seconds to wait for Files API processing
+        poll_interval: Seconds between processing polls
+        generation_config: Optional config (e.g., a response schema); defaults to temperature 0.1
+        
+    Returns:
+        generate_content response
+    """
+    client = client or initialize_client()
+    start = time.perf_counter()
+    size = _payload_size(data)
+    
+    if size <= config.INLINE_MEDIA_MAX_BYTES:
+        path = "inline"
+        media = types.Part.from_bytes(data=_payload_bytes(data), mime_type=mime_type)
+    else:
+        path = "files_api"
+        file = gemini_rate_limiter.call(
+            upload_bytes_to_files_api,
+            data,
+            mime_type=mime_type,
+            display_name=display_name,
+            client=client,
+            max_wait=max_wait,
+            poll_interval=poll_interval
+        )
+        state = get_file_state(file)
+        if "ACTIVE" not in state:
+            raise Exception(f"Upload of {display_name or 'file'} failed. State: {state}")
+        media = types.Part(file_data=types.FileData(file_uri=file.uri, mime_type=mime_type))
+    
+    response = gemini_rate_limiter.call(
+        client.models.generate_content,
+        model=config.TRANSCRIPTION_MODEL,
+        contents=[types.Part.from_text(text=prompt), media],
+        config=generation_config or types.GenerateContentConfig(temperature=0.1)
+    )
+    
+    record_vision_call(path, time.perf_counter() - start, size)
+    return response
+
+
+def record_vision_call(path: str, seconds: float, size: int) -> None:
+    """Add one vision call to the per-path latency counters."""
+    with _vision_stats_lock:
+        entry = _vision_stats.setdefault(path, {'calls': 0, 'total_seconds': 0.0, 'total_bytes': 0})
+        entry['calls'] += 1
+        entry['total_seconds'] += seconds
+        entry['total_bytes'] += size
+
+
+def get_vision_call_stats() -> Dict[str, Any]:
+    """Call count, average latency and average payload size per media path."""
+    with _vision_stats_lock:
+        return {
+            path: {
+                'calls': entry['calls'],
+                'avg_seconds': round(entry['total_seconds'] / entry['calls'], 3),
+                'avg_bytes': int(entry['total_bytes'] / entry['calls'])
+            }
+            for path, entry in _vision_stats.items()
+        }
+
+
 def create_file_search_store(display_name: str) -> str:
     """
     Create a new File Search Store using REST API.
@@ -67,7 +372,8 @@ def upload_file_to_store(filepath: str, store_name: str, skip_if_exists: bool =
     
     Args:
         filepath: Path to the file to upload
-        store_name: Name of the File Search Store (kept for compatibility, but not used)
+        store_name: Name of the File Search Store (the file is also imported into it
+            when the file_search_store retrieval backend is configured)
         skip_if_exists: If True, skip files that have already been uploaded
         
     Returns:
@@ -84,64 +390,37 @@ def upload_file_to_store(filepath: str, store_name: str, skip_if_exists: bool =
     client = initialize_client()
     
     try:
-        # Upload file - for markdown files, temporarily rename to .txt
-        # since Gemini SDK handles .txt files better
+        # Stream the file straight from disk with an explicit MIME type
+        # (markdown is sent as text/plain - no temporary .txt copy needed)
         print(f"Uploading {filepath}...")
-        
-        file_ext = Path(filepath).suffix.lower()
-        temp_filepath = filepath
-        
-        # If markdown file, create temporary .txt copy for upload
-        if file_ext == '.md':
-            temp_filepath = filepath.replace('.md', '.txt')
-            import shutil
-            shutil.copy2(filepath, temp_filepath)
-            print(f"  📝 Created temporary .txt copy for upload: {os.path.basename(temp_filepath)}")
-        
-        # Upload using SDK (it will auto-detect text/plain for .txt files)
-        file = client.files.upload(path=temp_filepath)
-        
-        # Clean up temporary file if we created one
-        if temp_filepath != filepath and os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-            print(f"  🧹 Cleaned up temporary file")
-        
-        # Wait for file to be processed
         max_wait = 120  # 2 minutes max
-        wait_time = 0
-        print(f"  ⏳ Waiting for file to process... (max {max_wait}s)")
-        
-        # Get state - handle both string and object types
-        def get_state_string(state):
-            if isinstance(state, str):
-                return state.upper()
-            elif hasattr(state, 'name'):
-                return state.name.upper()
-            else:
-                return str(state).upper()
+        print(f"  ⏳ Uploading and waiting for file to process... (max {max_wait}s)")
         
-        state = get_state_string(file.state)
-        while "PROCESSING" in state and wait_time < max_wait:
-            time.sleep(5)
-            wait_time += 5
-            file = client.files.get(name=file.name)
-            state = get_state_string(file.state)
-            if wait_time % 15 == 0:
-                print(f"  ⏳ Still processing... ({wait_time}s/{max_wait}s)")
+        with open_upload_source(filepath) as source:
+            file = upload_bytes_to_files_api(
+                source,
+                mime_type=guess_mime_type(filepath),
+                display_name=os.path.basename(filepath),
+                client=client,
+                max_wait=max_wait
+            )
         
-        state = get_state_string(file.state)
-        if "PROCESSING" in state:
+        if "PROCESSING" in get_file_state(file):
             print(f"  ⚠️  File still processing after {max_wait}s. It will continue in background.")
             print(f"  ✓ File uploaded (still processing): {os.path.basename(filepath)} (name: {file.name})")
             mark_file_uploaded(filepath)
+            record_remote_upload(filepath, file.name, file.uri, file.size_bytes, file.expiration_time)
             return file.name
-        elif "ACTIVE" not in state:
-            raise Exception(f"File upload failed. State: {state}")
         
         print(f"  ✓ Uploaded: {os.path.basename(filepath)} (name: {file.name})")
         
-        # Mark as uploaded
+        # Index the file in the store when retrieval goes through the File Search tool
+        if store_name and config.RETRIEVAL_BACKEND == "file_search_store":
+            import_file_to_store(file.name, store_name, client=client)
+        
+        # Mark as uploaded and make this the current remote copy
         mark_file_uploaded(filepath)
+        record_remote_upload(filepath, file.name, file.uri, file.size_bytes, file.expiration_time)
         
         return file.name
         
@@ -201,21 +480,53 @@ def bulk_upload_directory(dir_path: str, store_name: str) -> int:
     return uploaded_count
 
 
+def import_file_to_store(file_name: str, store_name: str, client: Optional[genai.Client] = None,
+                         max_wait: int = 120) -> None:
+    """
+    Import an uploaded Files API file into a File Search Store and wait for indexing.
+    
+    Args:
+        file_name: Files API name (e.g., "files/abc123")
+        store_name: Name of the File Search Store
+        client: Optional Gemini client to reuse
+        max_wait: Maximum seconds to wait for the import operation
+    """
+    client = client or initialize_client()
+    
+    print(f"  📚 Importing {file_name} into {store_name}...")
+    operation = client.file_search_stores.import_file(
+        file_search_store_name=store_name,
+        file_name=file_name
+    )
+    
+    wait_time = 0
+    while not operation.done and wait_time < max_wait:
+        time.sleep(5)
+        wait_time += 5
+        operation = client.operations.get(operation)
+    
+    if not operation.done:
+        print(f"  ⚠️  Store import still running after {max_wait}s. It will continue in background.")
+    elif operation.error:
+        raise Exception(f"Store import failed: {operation.error}")
+    else:
+        print(f"  ✓ Indexed in File Search Store")
+
+
 def list_files_in_store(store_name: str) -> list:
     """
-    List all files in a File Search Store.
+    List all documents in a File Search Store.
     
     Args:
         store_name: Name of the File Search Store
         
     Returns:
-        List of file URIs
+        List of document names
     """
     client = initialize_client()
     
     try:
-        store = client.file_search_stores.get(name=store_name)
-        return store.file_uris if hasattr(store, 'file_uris') else []
+        return [doc.name for doc in client.file_search_stores.documents.list(parent=store_name)]
     except Exception as e:
         print(f"Error listing files in store: {e}")
         return []
@@ -270,6 +581,7 @@ def cleanup_old_files(keep_markdown: bool = True) -> dict:
     stats = {
         'emails_deleted': 0,
         'attachments_deleted': 0,
+        'blobs_deleted': 0,
         'errors': 0
     }
     
@@ -295,5 +607,12 @@ def cleanup_old_files(keep_markdown: bool = True) -> dict:
                     print(f"  ⚠️  Could not delete {file_path}: {e}")
                     stats['errors'] += 1
     
+    # Drop saved attachment copies; the transcription cache keeps their text
+    try:
+        stats['blobs_deleted'] = prune_blob_files()
+    except Exception as e:
+        print(f"  ⚠️  Could not prune attachment blobs: {e}")
+        stats['errors'] += 1
+    
     return stats
 
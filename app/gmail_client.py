@@ -1,27 +1,101 @@
 """Gmail client for fetching school-related emails."""
 import os
+import re
+import json
+import time
 import base64
 import pickle
 from datetime import datetime
-from dataclasses import dataclass
-from typing import List, Optional
-from email.utils import parsedate_to_datetime
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from email.utils import parsedate_to_datetime, parseaddr
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from app.config import config
+from app.google_services import get_credentials, get_service
+from app.mime_parser import decode_raw_message, html_to_text, parse_raw_message
+
+
+# Gmail accepts up to 100 calls per batch request but recommends no more than 50
+BATCH_SIZE = 50
+MAX_BATCH_RETRIES = 3
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Attachment batches are smaller: a batch response is parsed into memory as a whole
+ATTACHMENT_BATCH_SIZE = 10
+
+# Decoded attachments larger than this are spooled to disk instead of held in memory
+ATTACHMENT_SPOOL_THRESHOLD = 1 * 1024 * 1024  # 1MB
+
+# messages.list page size (Gmail maximum is 500)
+LIST_PAGE_SIZE = 100
+
+SYNC_STATE_FILE = "data/.gmail_sync.json"
+
+# Labels whose new messages are never school mail we want to ingest
+SKIPPED_HISTORY_LABELS = {'DRAFT', 'SENT', 'SPAM', 'TRASH'}
+
+
+class HistoryExpiredError(Exception):
+    """Raised when a stored Gmail historyId is too old for the history API."""
+
+
+def load_sync_state() -> Dict[str, dict]:
+    """Load stored Gmail sync cursors (historyId per sync key)."""
+    if not os.path.exists(SYNC_STATE_FILE):
+        return {}
+    
+    try:
+        with open(SYNC_STATE_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def save_sync_cursor(sync_key: str, history_id: str) -> None:
+    """Store the Gmail historyId a sync key has caught up to."""
+    state = load_sync_state()
+    state[sync_key] = {
+        'history_id': str(history_id),
+        'updated_at': datetime.now().isoformat()
+    }
+    
+    os.makedirs(os.path.dirname(SYNC_STATE_FILE), exist_ok=True)
+    with open(SYNC_STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2)
 
 
 @dataclass
 class EmailAttachment:
-    """Represents an email attachment."""
+    """
+    Represents an email attachment.
+    
+    Small attachments are held in memory (data). Large ones are spooled to
+    disk as soon as they are downloaded (path), so memory stays flat no
+    matter how big they are.
+    """
     filename: str
     mime_type: str
-    data: bytes
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    size: int = 0
+    
+    def read(self) -> bytes:
+        """Get the attachment bytes (loads spooled attachments from disk)."""
+        if self.data is not None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+    
+    def discard(self) -> None:
+        """Delete the spooled copy of the attachment, if any."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
 
 
 @dataclass
@@ -33,6 +107,8 @@ class Email:
     date: datetime
     body_text: str
     attachments: List[EmailAttachment]
+    # Attachment parts not downloaded yet (see GmailClient.download_attachments)
+    pending_attachments: List[tuple] = field(default_factory=list)
 
 
 class GmailClient:
@@ -41,9 +117,27 @@ class GmailClient:
     def __init__(self):
         self.service = None
         self.credentials = None
+        # historyId reached by the last incremental fetch, not yet committed
+        self.pending_history_id = None
+        # Counts from the last fetch: listed, skipped_known, fetched
+        self.last_fetch_stats = {'listed': 0, 'skipped_known': 0, 'fetched': 0}
+        # Message IDs the last fetch could not retrieve; commit_sync won't advance past them
+        self.failed_message_ids: List[str] = []
+        # Set when listing stopped early, so some messages were never even seen
+        self.listing_incomplete = False
     
     def authenticate(self) -> None:
-        """Authenticate with Gmail API using OAuth2."""
+        """
+        Authenticate with Gmail API using OAuth2.
+        
+        Credentials are loaded once per process and shared; the service object
+        is built once per thread from the bundled discovery document.
+        """
+        self.credentials = get_credentials(config.TOKEN_FILE, self._load_credentials)
+        self.service = get_service('gmail', 'v1', self.credentials)
+    
+    def _load_credentials(self):
+        """Load, refresh or authorize credentials (slow path, first use only)."""
         creds = None
         
         # Load existing token if available
@@ -102,8 +196,7 @@ class GmailClient:
             except Exception as e:
                 print(f"Warning: Could not save token: {e}")
         
-        self.credentials = creds
-        self.service = build('gmail', 'v1', credentials=creds)
+        return creds
     
     def _build_query(self) -> str:
         """Build Gmail search query for school emails."""
@@ -132,6 +225,18 @@ class GmailClient:
             return f"{base_query} newer_than:30d"
         return "newer_than:30d"
     
+    def _matches_filters(self, sender: str) -> bool:
+        """Check a From header against SCHOOL_DOMAINS / SCHOOL_SENDERS (mirrors _build_query)."""
+        if not config.SCHOOL_DOMAINS and not config.SCHOOL_SENDERS:
+            return True
+        
+        address = (parseaddr(sender)[1] or sender).lower()
+        for domain in config.SCHOOL_DOMAINS:
+            domain = domain.lower().lstrip('@')
+            if address.endswith('@' + domain) or address.endswith('.' + domain):
+                return True
+        return any(address == s.lower() for s in config.SCHOOL_SENDERS)
+    
     def _extract_email_body(self, message) -> str:
         """Extract plain text body from email message."""
         body = ""
@@ -152,9 +257,7 @@ class GmailClient:
                     data = payload.get('body', {}).get('data', '')
                     if data and not text:
                         html = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-                        # Simple HTML stripping (basic implementation)
-                        import re
-                        text = re.sub('<[^<]+?>', '', html)
+                        text = html_to_text(html)
             return text
         
         if 'payload' in message:
@@ -162,116 +265,643 @@ class GmailClient:
         
         return body.strip()
     
-    def _extract_attachments(self, message) -> List[EmailAttachment]:
-        """Extract attachments from email message."""
-        attachments = []
+    def _execute_batched(
+        self,
+        request_factories: Dict[str, Callable],
+        batch_size: int = BATCH_SIZE,
+        on_result: Optional[Callable[[str, dict], None]] = None
+    ) -> Tuple[Dict[str, dict], List[str]]:
+        """
+        Execute many API calls through the Gmail batch endpoint.
+        
+        Each sub-request succeeds or fails on its own: a failed message never
+        takes the rest of its batch down. Sub-requests that fail with a
+        retryable status (rate limit, server error) are re-sent in a new batch
+        with exponential backoff. A 404 means the message was deleted after it
+        was listed; it is neither a result nor a failure.
+        
+        Args:
+            request_factories: Dict of request_id -> callable returning a fresh HttpRequest
+            batch_size: Maximum sub-requests per batch call
+            on_result: Optional callback(request_id, response). When given, responses
+                are handed over as they arrive instead of being collected.
+            
+        Returns:
+            (dict of request_id -> response for the calls that succeeded (empty
+            when on_result is used), request_ids that still failed)
+        """
+        results = {}
+        done = set()
+        failed = []
+        pending = dict(request_factories)
         
-        def _extract_from_payload(payload, message_id):
-            """Recursively extract attachments from message payload."""
+        for attempt in range(MAX_BATCH_RETRIES + 1):
+            if not pending:
+                break
+            
+            retry = {}
+            
+            def _callback(request_id, response, exception):
+                if exception is None:
+                    done.add(request_id)
+                    if on_result:
+                        on_result(request_id, response)
+                    else:
+                        results[request_id] = response
+                elif isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_STATUS_CODES:
+                    retry[request_id] = pending[request_id]
+                elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                    print(f"Batched request {request_id} not found (deleted?) - skipping")
+                else:
+                    print(f"Error in batched request {request_id}: {exception}")
+                    failed.append(request_id)
+            
+            items = list(pending.items())
+            for start in range(0, len(items), batch_size):
+                chunk = items[start:start + batch_size]
+                batch = self.service.new_batch_http_request(callback=_callback)
+                for request_id, factory in chunk:
+                    batch.add(factory(), request_id=request_id)
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # The whole batch call failed (network, auth) - retry what didn't complete
+                    print(f"Batch request failed, will retry {len(chunk)} calls: {e}")
+                    retry.update((k, v) for k, v in chunk if k not in done)
+            
+            pending = retry
+            if pending and attempt < MAX_BATCH_RETRIES:
+                time.sleep(2 ** attempt)
+        
+        for request_id in pending:
+            print(f"Giving up on batched request {request_id} after {MAX_BATCH_RETRIES} retries")
+        failed.extend(pending)
+        
+        return results, failed
+    
+    def _find_attachment_parts(self, message) -> List[Tuple[str, str, Optional[str], Optional[str]]]:
+        """
+        Find attachment parts in an email message.
+        
+        Returns:
+            List of (filename, mime_type, attachment_id, inline_data) tuples.
+            Small attachments may carry their data inline instead of an attachment ID.
+        """
+        parts = []
+        
+        def _walk(payload):
+            """Recursively collect attachment parts from message payload."""
             if 'parts' in payload:
                 for part in payload['parts']:
-                    _extract_from_payload(part, message_id)
+                    _walk(part)
             else:
                 filename = payload.get('filename', '')
-                if filename and 'body' in payload and 'attachmentId' in payload['body']:
-                    attachment_id = payload['body']['attachmentId']
-                    mime_type = payload.get('mimeType', 'application/octet-stream')
-                    
-                    try:
-                        attachment = self.service.users().messages().attachments().get(
-                            userId='me',
-                            messageId=message_id,
-                            id=attachment_id
-                        ).execute()
-                        
-                        data = base64.urlsafe_b64decode(attachment['data'])
-                        attachments.append(EmailAttachment(
-                            filename=filename,
-                            mime_type=mime_type,
-                            data=data
-                        ))
-                    except HttpError as e:
-                        print(f"Error downloading attachment {filename}: {e}")
+                body = payload.get('body', {})
+                if filename and ('attachmentId' in body or body.get('data')):
+                    parts.append((
+                        filename,
+                        payload.get('mimeType', 'application/octet-stream'),
+                        body.get('attachmentId'),
+                        body.get('data')
+                    ))
         
         if 'payload' in message:
-            _extract_from_payload(message['payload'], message['id'])
+            _walk(message['payload'])
+        
+        return parts
+    
+    def _make_attachment(self, message_id: str, index: int, filename: str,
+                         mime_type: str, encoded_data: str) -> EmailAttachment:
+        """Decode attachment data, spooling it to disk if it is large."""
+        return self._store_attachment(message_id, index, filename, mime_type,
+                                      base64.urlsafe_b64decode(encoded_data))
+    
+    def _store_attachment(self, message_id: str, index: int, filename: str,
+                          mime_type: str, data: bytes) -> EmailAttachment:
+        """Wrap decoded attachment bytes, spooling them to disk if they are large."""
+        size = len(data)
+        
+        if size <= ATTACHMENT_SPOOL_THRESHOLD:
+            return EmailAttachment(filename=filename, mime_type=mime_type, data=data, size=size)
+        
+        os.makedirs(config.ATTACHMENTS_DIR, exist_ok=True)
+        safe_name = re.sub(r'[<>:"/\\|?*]', '_', filename)[:150]
+        path = os.path.join(config.ATTACHMENTS_DIR, f"{message_id}_{index}_{safe_name}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        
+        return EmailAttachment(filename=filename, mime_type=mime_type, path=path, size=size)
+    
+    def _download_attachments(self, messages: List[dict]) -> Dict[str, List[EmailAttachment]]:
+        """
+        Download the attachments of many messages with batched requests.
+        
+        Args:
+            messages: Full-format Gmail message resources
+            
+        Returns:
+            Dict of message ID -> list of EmailAttachment (in payload order)
+        """
+        return self._download_attachment_parts({
+            message['id']: self._find_attachment_parts(message) for message in messages
+        })
+    
+    def _download_attachment_parts(self, attachment_parts: Dict[str, list]) -> Dict[str, List[EmailAttachment]]:
+        """
+        Download attachment parts (from _find_attachment_parts) with batched requests.
+        
+        Each attachment is decoded (and spooled to disk if large) as soon as its
+        response arrives, so raw payloads are never accumulated.
+        
+        Args:
+            attachment_parts: Dict of message ID -> attachment part tuples
+            
+        Returns:
+            Dict of message ID -> list of EmailAttachment (in payload order)
+        """
+        request_factories = {}
+        downloaded = {}
+        
+        for message_id in attachment_parts:
+            for index, (filename, mime_type, attachment_id, inline_data) in enumerate(attachment_parts[message_id]):
+                if inline_data:
+                    downloaded[f"{message_id}:{index}"] = self._make_attachment(
+                        message_id, index, filename, mime_type, inline_data
+                    )
+                elif attachment_id:
+                    request_factories[f"{message_id}:{index}"] = (
+                        lambda m=message_id, a=attachment_id: self.service.users().messages().attachments().get(
+                            userId='me', messageId=m, id=a
+                        )
+                    )
+        
+        def _store(request_id, response):
+            message_id, index = request_id.rsplit(':', 1)
+            filename, mime_type, _, _ = attachment_parts[message_id][int(index)]
+            downloaded[request_id] = self._make_attachment(
+                message_id, int(index), filename, mime_type, response['data']
+            )
+        
+        if request_factories:
+            # A failed download is reported below and leaves the attachment out of the email
+            self._execute_batched(request_factories, batch_size=ATTACHMENT_BATCH_SIZE, on_result=_store)
+        
+        attachments = {}
+        for message_id, parts in attachment_parts.items():
+            attachments[message_id] = []
+            for index, (filename, _, _, _) in enumerate(parts):
+                attachment = downloaded.get(f"{message_id}:{index}")
+                if attachment is None:
+                    print(f"Error downloading attachment {filename}")
+                    continue
+                attachments[message_id].append(attachment)
         
         return attachments
     
-    def fetch_school_emails(self, max_results: int = 50) -> List[Email]:
+    def download_attachments(self, emails: List[Email]) -> None:
         """
-        Fetch school-related emails from Gmail.
+        Download the pending attachments of emails fetched with download_attachments=False.
         
         Args:
-            max_results: Maximum number of emails to fetch
+            emails: Emails whose pending_attachments should be downloaded (updated in place)
+        """
+        if not self.service:
+            self.authenticate()
+        
+        pending = {email.id: email.pending_attachments for email in emails if email.pending_attachments}
+        if not pending:
+            return
+        
+        downloaded = self._download_attachment_parts(pending)
+        for email in emails:
+            if email.id in downloaded:
+                email.attachments = downloaded[email.id]
+                email.pending_attachments = []
+    
+    def _extract_attachments(self, message) -> List[EmailAttachment]:
+        """Extract attachments from email message."""
+        return self._download_attachments([message]).get(message['id'], [])
+    
+    @staticmethod
+    def _parse_date(date_str: str) -> datetime:
+        """Parse a Date header, falling back to now."""
+        try:
+            return parsedate_to_datetime(date_str) if date_str else datetime.now()
+        except (ValueError, TypeError):
+            return datetime.now()
+    
+    def _parse_message(self, message: dict, attachments: List[EmailAttachment]) -> Email:
+        """Build an Email from a full-format Gmail message resource."""
+        # Extract headers
+        headers = {h['name']: h['value'] for h in message['payload'].get('headers', [])}
+        
+        return Email(
+            id=message['id'],
+            subject=headers.get('Subject', '(No Subject)'),
+            sender=headers.get('From', 'Unknown'),
+            date=self._parse_date(headers.get('Date', '')),
+            body_text=self._extract_email_body(message),
+            attachments=attachments
+        )
+    
+    def _parse_raw_message(self, message: dict) -> Email:
+        """
+        Build an Email from a raw-format Gmail message resource.
+        
+        Headers, body and attachment bytes all come from the one payload,
+        so no attachments().get calls are needed.
+        """
+        parsed = parse_raw_message(decode_raw_message(message))
+        attachments = [
+            self._store_attachment(message['id'], index, filename, mime_type, data)
+            for index, (filename, mime_type, data) in enumerate(parsed.attachments)
+        ]
+        
+        return Email(
+            id=message['id'],
+            subject=parsed.subject,
+            sender=parsed.sender,
+            date=self._parse_date(parsed.date),
+            body_text=parsed.body_text,
+            attachments=attachments
+        )
+    
+    def fetch_messages(self, message_ids: List[str], download_attachments: bool = True) -> List[Email]:
+        """
+        Fetch full messages and their attachments using batched requests.
+        
+        With GMAIL_FETCH_FORMAT=raw each message is one format='raw' call that
+        already contains its attachments, so download_attachments has no effect.
+        
+        Args:
+            message_ids: Gmail message IDs, in the order results should be returned
+            download_attachments: If False, attachments are left in each email's
+                pending_attachments for a later download_attachments() call
             
         Returns:
-            List of Email objects
+            List of Email objects. Messages that failed to download are skipped
+            and added to failed_message_ids.
+        """
+        if not self.service:
+            self.authenticate()
+        
+        if config.GMAIL_FETCH_FORMAT == "raw":
+            responses, failed = self._execute_batched({
+                message_id: (
+                    lambda m=message_id: self.service.users().messages().get(userId='me', id=m, format='raw')
+                )
+                for message_id in message_ids
+            # Raw messages carry their attachments, so batch them like attachment downloads
+            }, batch_size=ATTACHMENT_BATCH_SIZE)
+            self.failed_message_ids.extend(failed)
+            emails = []
+            for message_id in message_ids:
+                if message_id not in responses:
+                    continue
+                try:
+                    emails.append(self._parse_raw_message(responses[message_id]))
+                except Exception as e:
+                    print(f"Error parsing message {message_id}: {e}")
+            return emails
+        
+        responses, failed = self._execute_batched({
+            message_id: (
+                lambda m=message_id: self.service.users().messages().get(userId='me', id=m, format='full')
+            )
+            for message_id in message_ids
+        })
+        self.failed_message_ids.extend(failed)
+        
+        messages = [responses[m] for m in message_ids if m in responses]
+        if not download_attachments:
+            emails = []
+            for message in messages:
+                email = self._parse_message(message, [])
+                email.pending_attachments = self._find_attachment_parts(message)
+                emails.append(email)
+            return emails
+        
+        attachments = self._download_attachments(messages)
+        
+        return [self._parse_message(message, attachments.get(message['id'], [])) for message in messages]
+    
+    def _iter_unseen(self, message_ids: Iterable[str], exclude_ids: Optional[Set[str]],
+                     download_attachments: bool = True) -> Iterator[Email]:
+        """
+        Drop already-known IDs (one set lookup each), then fetch the rest in
+        full one batch at a time, yielding emails as each batch completes.
+        """
+        ids = iter(message_ids)
+        while True:
+            page = list(islice(ids, BATCH_SIZE))
+            if not page:
+                break
+            
+            unseen = [m for m in page if m not in exclude_ids] if exclude_ids else page
+            self.last_fetch_stats['listed'] += len(page)
+            self.last_fetch_stats['skipped_known'] += len(page) - len(unseen)
+            
+            if unseen:
+                for email in self.fetch_messages(unseen, download_attachments=download_attachments):
+                    self.last_fetch_stats['fetched'] += 1
+                    yield email
+    
+    def iter_school_message_ids(self, max_results: Optional[int] = None) -> Iterator[str]:
+        """
+        Iterate over IDs of school-related messages, following pagination.
+        
+        Args:
+            max_results: Optional maximum number of IDs (None = every matching message)
+            
+        Yields:
+            Gmail message IDs (newest first)
         """
         if not self.service:
             self.authenticate()
         
         query = self._build_query()
+        page_token = None
+        returned = 0
         
-        try:
-            # Search for messages
+        while max_results is None or returned < max_results:
+            page_size = LIST_PAGE_SIZE if max_results is None else min(LIST_PAGE_SIZE, max_results - returned)
             results = self.service.users().messages().list(
                 userId='me',
                 q=query,
-                maxResults=max_results
+                maxResults=page_size,
+                pageToken=page_token
             ).execute()
             
-            messages = results.get('messages', [])
-            emails = []
+            for msg in results.get('messages', []):
+                returned += 1
+                yield msg['id']
             
-            for msg in messages:
-                try:
-                    # Get full message
-                    message = self.service.users().messages().get(
-                        userId='me',
-                        id=msg['id'],
-                        format='full'
-                    ).execute()
-                    
-                    # Extract headers
-                    headers = {h['name']: h['value'] for h in message['payload'].get('headers', [])}
-                    subject = headers.get('Subject', '(No Subject)')
-                    sender = headers.get('From', 'Unknown')
-                    date_str = headers.get('Date', '')
-                    
-                    # Parse date
-                    try:
-                        date = parsedate_to_datetime(date_str) if date_str else datetime.now()
-                    except (ValueError, TypeError):
-                        date = datetime.now()
-                    
-                    # Extract body and attachments
-                    body_text = self._extract_email_body(message)
-                    attachments = self._extract_attachments(message)
-                    
-                    emails.append(Email(
-                        id=message['id'],
-                        subject=subject,
-                        sender=sender,
-                        date=date,
-                        body_text=body_text,
-                        attachments=attachments
-                    ))
-                    
-                except HttpError as e:
-                    print(f"Error fetching message {msg['id']}: {e}")
-                    continue
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+    
+    def list_school_message_ids(self, max_results: int = 50) -> List[str]:
+        """
+        List IDs of school-related messages without downloading them.
+        
+        Args:
+            max_results: Maximum number of IDs to return
             
-            return emails
+        Returns:
+            List of Gmail message IDs (newest first)
+        """
+        return list(self.iter_school_message_ids(max_results=max_results))
+    
+    def iter_school_emails(self, max_results: Optional[int] = None,
+                           exclude_ids: Optional[Set[str]] = None,
+                           download_attachments: bool = True) -> Iterator[Email]:
+        """
+        Stream school-related emails, one at a time, across all result pages.
+        
+        Only one batch of messages is in memory at once and large attachments
+        are spooled to disk, so memory stays flat for any volume of mail.
+        
+        Args:
+            max_results: Optional maximum number of messages to list (None = all)
+            exclude_ids: Message IDs already processed - skipped before download
+            download_attachments: If False, leave attachments pending (see fetch_messages)
+            
+        Yields:
+            Email objects
             
+        Raises:
+            HttpError: If listing fails part way (listing_incomplete is set)
+        """
+        self.last_fetch_stats = {'listed': 0, 'skipped_known': 0, 'fetched': 0}
+        self.failed_message_ids = []
+        self.listing_incomplete = False
+        try:
+            yield from self._iter_unseen(
+                self.iter_school_message_ids(max_results), exclude_ids, download_attachments
+            )
         except HttpError as e:
+            # A truncated listing must not let commit_sync store the fresh historyId
             print(f"Error searching messages: {e}")
-            return []
+            self.listing_incomplete = True
+            raise
+    
+    def fetch_school_emails(self, max_results: int = 50, exclude_ids: Optional[Set[str]] = None,
+                            download_attachments: bool = True) -> List[Email]:
+        """
+        Fetch school-related emails from Gmail.
+        
+        Args:
+            max_results: Maximum number of emails to fetch
+            exclude_ids: Message IDs already processed - these are skipped before
+                any message body or attachment is downloaded
+            download_attachments: If False, leave attachments pending (see fetch_messages).
+                Large downloaded attachments are spooled to disk; the caller must discard() them
+            
+        Returns:
+            List of Email objects
+        """
+        return list(self.iter_school_emails(
+            max_results=max_results, exclude_ids=exclude_ids, download_attachments=download_attachments
+        ))
+    
+    def _get_current_history_id(self) -> str:
+        """Get the mailbox's current historyId."""
+        return self.service.users().getProfile(userId='me').execute()['historyId']
+    
+    def _list_history_message_ids(self, start_history_id: str) -> Tuple[List[str], str]:
+        """
+        List messages added to the mailbox since a historyId.
+        
+        Returns:
+            (message IDs in arrival order, latest historyId)
+            
+        Raises:
+            HistoryExpiredError: If start_history_id is no longer available
+        """
+        message_ids = []
+        seen = set()
+        latest_history_id = start_history_id
+        page_token = None
+        
+        while True:
+            try:
+                response = self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpiredError(f"historyId {start_history_id} has expired")
+                raise
+            
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    if SKIPPED_HISTORY_LABELS.intersection(message.get('labelIds', [])):
+                        continue
+                    if message['id'] not in seen:
+                        seen.add(message['id'])
+                        message_ids.append(message['id'])
+            
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return message_ids, latest_history_id
+    
+    def _filter_school_message_ids(self, message_ids: List[str]) -> List[str]:
+        """
+        Keep only messages whose sender matches the school filters (headers-only fetch).
+        
+        Messages whose headers could not be fetched are unknown, not "not school
+        mail": they go to failed_message_ids so the sync cursor stays behind them.
+        """
+        if not config.SCHOOL_DOMAINS and not config.SCHOOL_SENDERS:
+            return message_ids
+        
+        responses, failed = self._execute_batched({
+            message_id: (
+                lambda m=message_id: self.service.users().messages().get(
+                    userId='me', id=m, format='metadata', metadataHeaders=['From']
+                )
+            )
+            for message_id in message_ids
+        })
+        self.failed_message_ids.extend(failed)
+        
+        matching = []
+        for message_id in message_ids:
+            message = responses.get(message_id)
+            if not message:
+                continue
+            headers = {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
+            if self._matches_filters(headers.get('From', '')):
+                matching.append(message_id)
+        return matching
+    
+    def iter_new_school_emails(self, sync_key: str = 'default', max_results: Optional[int] = None,
+                               exclude_ids: Optional[Set[str]] = None,
+                               download_attachments: bool = True) -> Iterator[Email]:
+        """
+        Stream only school emails that arrived since the last sync.
+        
+        The first run (or a run whose stored historyId has expired) does a full
+        resync with the usual search query. Later runs use the history API, so
+        the number of calls is proportional to new mail, not to a month of it.
+        The new historyId is left in pending_history_id; call commit_sync()
+        once the emails have been processed.
+        
+        Args:
+            sync_key: Independent cursor name (e.g., "ingestion", "notifications")
+            max_results: Optional maximum number of emails for a full resync (None = all)
+            exclude_ids: Message IDs already processed - skipped before download
+            download_attachments: If False, leave attachments pending (see fetch_messages)
+            
+        Yields:
+            New Email objects
+        """
+        if not self.service:
+            self.authenticate()
+        
+        self.last_fetch_stats = {'listed': 0, 'skipped_known': 0, 'fetched': 0}
+        self.failed_message_ids = []
+        self.listing_incomplete = False
+        self.pending_history_id = None
+        stored = load_sync_state().get(sync_key, {}).get('history_id')
+        
+        if stored:
+            try:
+                message_ids, history_id = self._list_history_message_ids(stored)
+            except HistoryExpiredError as e:
+                print(f"⚠️  {e}; falling back to full resync")
+            else:
+                print(f"Incremental sync ({sync_key}): {len(message_ids)} new messages")
+                self.pending_history_id = history_id
+                # Drop known IDs before even the headers-only sender check
+                unseen_ids = [m for m in message_ids if m not in exclude_ids] if exclude_ids else message_ids
+                yield from self._iter_unseen(
+                    self._filter_school_message_ids(unseen_ids), None, download_attachments
+                )
+                self.last_fetch_stats.update(
+                    listed=len(message_ids),
+                    skipped_known=len(message_ids) - len(unseen_ids)
+                )
+                return
+        
+        # Capture the cursor before listing so nothing arriving mid-sync is missed
+        self.pending_history_id = self._get_current_history_id()
+        print(f"Full resync ({sync_key})")
+        yield from self.iter_school_emails(
+            max_results=max_results, exclude_ids=exclude_ids, download_attachments=download_attachments
+        )
+    
+    def fetch_new_school_emails(self, sync_key: str = 'default', max_results: Optional[int] = 50,
+                                commit: bool = True, exclude_ids: Optional[Set[str]] = None,
+                                download_attachments: bool = True) -> List[Email]:
+        """
+        Fetch only school emails that arrived since the last sync.
+        
+        Args:
+            sync_key: Independent cursor name (e.g., "ingestion", "notifications")
+            max_results: Maximum number of emails for a full resync
+            commit: If True, store the new historyId immediately. If False, the
+                caller must call commit_sync() after processing the emails.
+            exclude_ids: Message IDs already processed - skipped before download
+            download_attachments: If False, leave attachments pending (see fetch_messages).
+                Large downloaded attachments are spooled to disk; the caller must discard() them
+            
+        Returns:
+            List of new Email objects
+        """
+        emails = list(self.iter_new_school_emails(
+            sync_key, max_results=max_results, exclude_ids=exclude_ids, download_attachments=download_attachments
+        ))
+        if commit:
+            self.commit_sync(sync_key)
+        return emails
+    
+    def commit_sync(self, sync_key: str = 'default') -> bool:
+        """
+        Store the historyId reached by the last fetch_new_school_emails call.
+        
+        Nothing is stored if listing was cut short or any message could not be
+        fetched: the next sync starts from the old cursor and retries them
+        (emails already processed are skipped by exclude_ids).
+        
+        Returns:
+            True if the cursor was advanced
+        """
+        if self.listing_incomplete:
+            print(f"⚠️  Message listing was cut short - keeping the {sync_key} sync cursor")
+            self.pending_history_id = None
+            return False
+        if self.failed_message_ids:
+            print(f"⚠️  {len(self.failed_message_ids)} message(s) could not be fetched - "
+                  f"keeping the {sync_key} sync cursor so they are retried")
+            self.pending_history_id = None
+            return False
+        if self.pending_history_id:
+            save_sync_cursor(sync_key, self.pending_history_id)
+            self.pending_history_id = None
+            return True
+        return False
 
 
 # Convenience function
-def fetch_school_emails(max_results: int = 50) -> List[Email]:
+def fetch_school_emails(max_results: int = 50, download_attachments: bool = True) -> List[Email]:
     """Fetch school emails using default Gmail client."""
     client = GmailClient()
-    return client.fetch_school_emails(max_results=max_results)
+    return client.fetch_school_emails(max_results=max_results, download_attachments=download_attachments)
 
+
+
+def fetch_new_school_emails(sync_key: str = 'default', max_results: int = 50,
+                            download_attachments: bool = True) -> List[Email]:
+    """Fetch school emails that arrived since the last sync for sync_key."""
+    client = GmailClient()
+    return client.fetch_new_school_emails(
+        sync_key=sync_key, max_results=max_results, download_attachments=download_attachments
+    )
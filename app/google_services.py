@@ -0,0 +1,139 @@
+"""Process-wide cache of Google API credentials and service objects (Gmail, Calendar)."""
+import pickle
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, Optional
+
+from google.auth.transport.requests import Request
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+
+
+# Refresh access tokens this long before they expire, in the background
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+TOKEN_REFRESH_CHECK_SECONDS = 60
+
+# token_file -> shared credentials object
+_credentials: Dict[str, object] = {}
+_credentials_lock = threading.Lock()
+# Service objects wrap a (non thread-safe) httplib2 connection, so each thread gets its own
+_thread_services = threading.local()
+_refresher: Optional[threading.Thread] = None
+
+
+@lru_cache(maxsize=None)
+def get_discovery_document(api: str, version: str) -> str:
+    """
+    Load an API's discovery document from the copy bundled with
+    google-api-python-client (read from disk once per process).
+
+    Raises:
+        ValueError: If no bundled document exists for the API
+    """
+    document = discovery_cache.get_static_doc(api, version)
+    if document is None:
+        raise ValueError(f"No bundled discovery document for {api} {version}")
+    return document
+
+
+def save_credentials(token_file: str, creds) -> None:
+    """Persist credentials to their token file."""
+    try:
+        with open(token_file, 'wb') as token:
+            pickle.dump(creds, token)
+    except Exception as e:
+        print(f"Warning: Could not save token {token_file}: {e}")
+
+
+def _needs_refresh(creds) -> bool:
+    """True if the credentials are expired or will expire within the refresh margin."""
+    if not getattr(creds, 'refresh_token', None):
+        return False
+    if not creds.valid:
+        return True
+    expiry = getattr(creds, 'expiry', None)
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return bool(expiry) and expiry - now < TOKEN_REFRESH_MARGIN
+
+
+def _refresh(token_file: str, creds) -> None:
+    """Refresh credentials and persist them. Caller holds _credentials_lock."""
+    creds.refresh(Request())
+    save_credentials(token_file, creds)
+
+
+def _refresh_loop() -> None:
+    """Background loop that refreshes cached tokens before they expire."""
+    while True:
+        time.sleep(TOKEN_REFRESH_CHECK_SECONDS)
+        with _credentials_lock:
+            for token_file, creds in list(_credentials.items()):
+                if _needs_refresh(creds):
+                    try:
+                        _refresh(token_file, creds)
+                        print(f"🔑 Refreshed token {token_file}")
+                    except Exception as e:
+                        # Leave it cached; the next get_credentials() call retries or re-authenticates
+                        print(f"⚠️  Background token refresh failed for {token_file}: {e}")
+
+
+def _start_refresher() -> None:
+    """Start the background token refresher once per process."""
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="google-token-refresh", daemon=True)
+        _refresher.start()
+
+
+def get_credentials(token_file: str, loader: Callable[[], object]):
+    """
+    Get shared credentials for a token file, loading them at most once per process.
+
+    Args:
+        token_file: Token file the credentials are stored in (cache key)
+        loader: Called to load/refresh/authorize credentials when none are cached
+
+    Returns:
+        Valid credentials shared by every client and thread
+    """
+    with _credentials_lock:
+        creds = _credentials.get(token_file)
+        if creds is not None and not creds.valid:
+            try:
+                _refresh(token_file, creds)
+            except Exception as e:
+                print(f"Token refresh failed for {token_file}: {e}")
+                creds = None
+
+        if creds is None:
+            creds = loader()
+            # Services are keyed by credentials identity, so new credentials get new services
+            _credentials[token_file] = creds
+
+    _start_refresher()
+    return creds
+
+
+def get_service(api: str, version: str, credentials):
+    """
+    Get this thread's service object for an API, building it once per thread
+    from the bundled discovery document.
+
+    Args:
+        api: API name (e.g., "gmail", "calendar")
+        version: API version (e.g., "v1", "v3")
+        credentials: Credentials from get_credentials()
+
+    Returns:
+        googleapiclient Resource
+    """
+    key = (api, version, id(credentials))
+    services = _thread_services.__dict__
+    service = services.get(key)
+    if service is None:
+        service = build_from_document(get_discovery_document(api, version), credentials=credentials)
+        services[key] = service
+    return service
@@ -0,0 +1,173 @@
+"""iCalendar (RFC 5545) feed of the events index, for calendar apps to subscribe to."""
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+
+from app.config import config
+from app.events_index import get_events_view
+
+
+PRODID = "-//Denali School Copilot//Events Feed//EN"
+CALENDAR_NAME = "School Events"
+
+# Timed events without an end time ("HH:MM" rather than "HH:MM-HH:MM") get this length
+EVENT_DURATION = timedelta(hours=1)
+
+# Rendered VEVENT blocks by event ID, so a rebuild only renders new events
+_blocks: Dict[str, str] = {}
+_feed: Dict[str, Any] = {'key': None, 'body': '', 'etag': None, 'last_modified': None}
+_lock = threading.Lock()
+
+
+def _escape(text: str) -> str:
+    """Escape a TEXT value."""
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold(line: str) -> str:
+    """Fold a content line at 75 octets, continuation lines starting with a space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = 74
+    return "\r\n ".join(parts)
+
+
+def _utc_stamp(value: Optional[str]) -> str:
+    """Local ISO timestamp -> UTC DATE-TIME (e.g. 20261019T180000Z)."""
+    moment = datetime.fromisoformat(value) if value else datetime(2000, 1, 1)
+    return moment.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event_end(start: datetime, time_str: str) -> datetime:
+    """End of a timed event: the end of an "HH:MM-HH:MM" range, else start + EVENT_DURATION."""
+    if '-' not in time_str:
+        return start + EVENT_DURATION
+    hour, minute = time_str.split('-')[1].split(':')
+    end = start.replace(hour=int(hour), minute=int(minute))
+    if end <= start:
+        # Runs past midnight
+        end += timedelta(days=1)
+    return end
+
+
+def _local_to_utc(value: datetime) -> str:
+    """School-local wall-clock time -> UTC DATE-TIME."""
+    local = value.replace(tzinfo=ZoneInfo(config.CALENDAR_TIMEZONE))
+    return local.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def render_event(event: Dict[str, Any], indexed_at: Optional[str]) -> str:
+    """
+    Render one index event as a VEVENT block.
+
+    Events without a time become all-day events. Timed events are written
+    in UTC (converted from CALENDAR_TIMEZONE), so no VTIMEZONE is needed.
+
+    Args:
+        event: Events index entry
+        indexed_at: When the event's email was indexed (used as DTSTAMP)
+
+    Returns:
+        VEVENT lines joined with CRLF, ending in CRLF
+    """
+    start = datetime.fromisoformat(event['start'])
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{event['id']}@school-copilot",
+        f"DTSTAMP:{_utc_stamp(indexed_at)}"
+    ]
+    if event.get('time'):
+        lines.append(f"DTSTART:{_local_to_utc(start)}")
+        lines.append(f"DTEND:{_local_to_utc(_event_end(start, event['time']))}")
+    else:
+        lines.append(f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}")
+        lines.append(f"DTEND;VALUE=DATE:{(start + timedelta(days=1)).strftime('%Y%m%d')}")
+    lines.append(f"SUMMARY:{_escape(event['title'])}")
+
+    description = event.get('description') or ''
+    if event.get('subject'):
+        description = f"{description}\n\nFrom: {event['subject']}".strip()
+    if description:
+        lines.append(f"DESCRIPTION:{_escape(description)}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def get_calendar_feed() -> Dict[str, Any]:
+    """
+    The .ics feed of every indexed event, rebuilt when the index changes.
+
+    The memo is keyed on the index file's mtime and version: the version
+    restarts at 0 when the index file is recreated.
+
+    Only events not rendered before are rendered on a rebuild; events that
+    left the index are dropped from the block cache.
+
+    Returns:
+        Dict with 'body' (the .ics text), 'etag' and 'last_modified' (UTC datetime or None)
+    """
+    global _feed
+    view = get_events_view()
+    key = (view['mtime'], view['version'])
+    feed = _feed
+    if feed['key'] == key:
+        return feed
+
+    with _lock:
+        if _feed['key'] == key:
+            return _feed
+
+        sources = {'email_id': view.get('emails', {}), 'upload_id': view.get('uploads', {})}
+        current_ids = set()
+        rendered = 0
+        for event in view['events']:
+            current_ids.add(event['id'])
+            if event['id'] not in _blocks:
+                field = 'email_id' if 'email_id' in event else 'upload_id'
+                indexed_at = sources[field].get(event[field], {}).get('indexed_at')
+                _blocks[event['id']] = render_event(event, indexed_at)
+                rendered += 1
+        for stale_id in set(_blocks) - current_ids:
+            del _blocks[stale_id]
+
+        header = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{CALENDAR_NAME}",
+            f"X-WR-TIMEZONE:{config.CALENDAR_TIMEZONE}"
+        ]
+        body = (
+            "".join(line + "\r\n" for line in header)
+            + "".join(_blocks[event['id']] for event in view['events'])
+            + "END:VCALENDAR\r\n"
+        )
+        last_modified = None
+        if view['updated_at']:
+            # HTTP dates have whole-second precision
+            last_modified = datetime.fromisoformat(view['updated_at']).astimezone(timezone.utc).replace(microsecond=0)
+
+        # Swapped in whole, so concurrent readers never see a mix of two versions
+        _feed = {
+            'key': key,
+            'body': body,
+            'etag': f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]}"',
+            'last_modified': last_modified
+        }
+        print(f"📆 Rebuilt calendar feed: {len(view['events'])} events ({rendered} newly rendered)")
+        return _feed
@@ -0,0 +1,245 @@
+"""Shrink images before they are sent to Gemini vision (orientation, size, color, encoding)."""
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.config import config
+from app.gemini_file_search import get_vision_call_stats
+
+
+IMAGE_METRICS_FILE = "data/.image_metrics.json"
+
+# Screenshots rarely use more colors than this; photos almost always do
+SCREENSHOT_MAX_COLORS = 4096
+
+# /upload-image configuration that latency changes are measured against
+BASELINE_UPLOAD_MODE = "original+files_api"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+
+
+@dataclass
+class PreprocessedImage:
+    """Result of preprocessing one image."""
+    data: bytes
+    mime_type: str
+    original_bytes: int
+    processed_bytes: int
+    width: int
+    height: int
+    kind: str  # "screenshot", "photo", or "original" (left untouched)
+    seconds: float = 0.0
+
+
+def _is_screenshot(image: Image.Image) -> bool:
+    """Flat-color UI captures have few distinct colors; camera photos have many."""
+    sample = image.copy()
+    sample.thumbnail((256, 256))
+    return sample.convert('RGB').getcolors(maxcolors=SCREENSHOT_MAX_COLORS) is not None
+
+
+def preprocess_image(data: bytes, mime_type: str) -> PreprocessedImage:
+    """
+    Fix EXIF orientation, downscale, reduce color and re-encode an image.
+
+    Screenshots become palette (or grayscale) PNGs, which keep text edges
+    sharp. Photos become JPEGs. If the result would not be smaller and the
+    image needed no rotation or resize, the original bytes are kept.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Args:
+        data: Original image bytes
+        mime_type: Original MIME type
+
+    Returns:
+        PreprocessedImage
+    """
+    start = time.perf_counter()
+    original = PreprocessedImage(data, mime_type, len(data), len(data), 0, 0, "original")
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        original.seconds = time.perf_counter() - start
+        return original
+
+    original.width, original.height = image.size
+    # Phone photos are often stored sideways with an EXIF orientation tag
+    changed = image.getexif().get(0x0112, 1) != 1
+    image = ImageOps.exif_transpose(image)
+
+    if max(image.size) > config.IMAGE_MAX_DIMENSION:
+        image.thumbnail((config.IMAGE_MAX_DIMENSION, config.IMAGE_MAX_DIMENSION), Image.LANCZOS)
+        changed = True
+
+    out = io.BytesIO()
+    if _is_screenshot(image):
+        kind = "screenshot"
+        if config.IMAGE_GRAYSCALE_SCREENSHOTS:
+            image = image.convert('L')
+        else:
+            image = image.convert('RGB').quantize(colors=256)
+        image.save(out, format='PNG', optimize=True)
+        new_mime = 'image/png'
+    else:
+        kind = "photo"
+        image.convert('RGB').save(out, format='JPEG', quality=config.IMAGE_JPEG_QUALITY, optimize=True)
+        new_mime = 'image/jpeg'
+
+    processed = out.getvalue()
+    if len(processed) >= len(data) and not changed:
+        original.seconds = time.perf_counter() - start
+        return original
+
+    return PreprocessedImage(
+        processed, new_mime, len(data), len(processed), image.width, image.height, kind,
+        seconds=time.perf_counter() - start
+    )
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Shared process pool for CPU-bound image work (kept off the event loop and the GIL)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=config.IMAGE_PREPROCESS_WORKERS)
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Stop the process pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def preprocess_in_pool(data: bytes, mime_type: str) -> PreprocessedImage:
+    """
+    Preprocess an image in the process pool and record the byte savings.
+
+    Falls back to preprocessing in the calling thread if the pool is broken.
+
+    Args:
+        data: Original image bytes
+        mime_type: Original MIME type
+
+    Returns:
+        PreprocessedImage
+    """
+    global _executor
+    try:
+        result = get_executor().submit(preprocess_image, data, mime_type).result()
+    except BrokenProcessPool:
+        print("  ⚠️  Image preprocessing pool died - restarting it and preprocessing inline")
+        with _executor_lock:
+            _executor = None
+        result = preprocess_image(data, mime_type)
+
+    record_preprocessing(result)
+    saved = 100 * (1 - result.processed_bytes / result.original_bytes) if result.original_bytes else 0
+    print(f"  🗜️  Preprocessed {result.kind} image: {result.original_bytes:,} → "
+          f"{result.processed_bytes:,} bytes ({saved:.0f}% smaller) in {result.seconds * 1000:.0f}ms")
+    return result
+
+
+def _empty_metrics() -> Dict[str, Any]:
+    return {
+        'preprocessing': {'images': 0, 'original_bytes': 0, 'processed_bytes': 0, 'seconds': 0.0},
+        'upload_image': {}
+    }
+
+
+def load_image_metrics() -> Dict[str, Any]:
+    """Load image metrics from disk."""
+    if not os.path.exists(IMAGE_METRICS_FILE):
+        return _empty_metrics()
+
+    try:
+        with open(IMAGE_METRICS_FILE, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return _empty_metrics()
+
+
+def save_image_metrics(metrics: Dict[str, Any]) -> None:
+    """Save image metrics to disk."""
+    os.makedirs(os.path.dirname(IMAGE_METRICS_FILE), exist_ok=True)
+    tmp_path = IMAGE_METRICS_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, IMAGE_METRICS_FILE)
+
+
+def record_preprocessing(result: PreprocessedImage) -> None:
+    """Add one preprocessed image to the byte counters."""
+    with _metrics_lock:
+        metrics = load_image_metrics()
+        totals = metrics['preprocessing']
+        totals['images'] += 1
+        totals['original_bytes'] += result.original_bytes
+        totals['processed_bytes'] += result.processed_bytes
+        totals['seconds'] += result.seconds
+        save_image_metrics(metrics)
+
+
+def record_upload_latency(seconds: float) -> None:
+    """
+    Record the end-to-end latency of one /upload-image request.
+
+    Latencies are grouped by configuration (preprocessing, inline media,
+    fused extraction), so running with different settings shows the change.
+    """
+    mode = "preprocessed" if config.IMAGE_PREPROCESSING else "original"
+    mode += "+inline" if config.INLINE_MEDIA_MAX_BYTES > 0 else "+files_api"
+    mode += "+fused" if config.FUSED_IMAGE_EXTRACTION else ""
+    with _metrics_lock:
+        metrics = load_image_metrics()
+        entry = metrics['upload_image'].setdefault(mode, {'requests': 0, 'total_seconds': 0.0})
+        entry['requests'] += 1
+        entry['total_seconds'] += seconds
+        save_image_metrics(metrics)
+
+
+def get_image_metrics() -> Dict[str, Any]:
+    """Bytes saved by preprocessing, /upload-image latency per mode, and vision call latency per path."""
+    metrics = load_image_metrics()
+    totals = metrics['preprocessing']
+    latency = {
+        mode: {
+            'requests': entry['requests'],
+            'avg_seconds': round(entry['total_seconds'] / entry['requests'], 3) if entry['requests'] else 0.0
+        }
+        for mode, entry in metrics['upload_image'].items()
+    }
+    # Change relative to the configuration before any of these optimizations
+    baseline = latency.get(BASELINE_UPLOAD_MODE)
+    if baseline:
+        for mode, entry in latency.items():
+            if mode != BASELINE_UPLOAD_MODE:
+                entry['change_seconds'] = round(entry['avg_seconds'] - baseline['avg_seconds'], 3)
+
+    return {
+        'enabled': config.IMAGE_PREPROCESSING,
+        'images': totals['images'],
+        'original_bytes': totals['original_bytes'],
+        'processed_bytes': totals['processed_bytes'],
+        'bytes_saved_pct': round(100 * (1 - totals['processed_bytes'] / totals['original_bytes']), 1)
+        if totals['original_bytes'] else 0.0,
+        'avg_preprocess_ms': round(totals['seconds'] / totals['images'] * 1000, 1) if totals['images'] else 0.0,
+        'upload_image_latency': latency,
+        'vision_calls': get_vision_call_stats()
+    }
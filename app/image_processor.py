@@ -1,64 +1,104 @@
 """Process images to extract text using Gemini Vision API."""
-import base64
-from typing import Optional
+import os
+from typing import Optional, Tuple
 from pathlib import Path
 
 from app.config import config
-from app.gemini_file_search import initialize_client
-from google.genai import types
+from app.gemini_file_search import (
+    UploadSource,
+    generate_from_media,
+    guess_mime_type,
+    initialize_client,
+    open_upload_source,
+)
+from app.image_preprocessing import preprocess_in_pool
+from app.text_extractors import read_all
+from app.transcription_cache import transcribe_with_cache
 
 
-def extract_text_from_image(image_path: str) -> str:
+# Bump when the image prompt changes so cached transcriptions are regenerated
+IMAGE_PROMPT_VERSION = "image-v1"
+
+
+def extract_text_from_image(image_path: str, content_hash: Optional[str] = None) -> str:
     """
     Extract text from an image using Gemini Vision API.
     
     Args:
         image_path: Path to the image file
+        content_hash: Optional precomputed SHA-256 of the file (skips hashing)
         
     Returns:
         Extracted text from the image
     """
-    if not config.GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not set in environment variables")
-    
     if not Path(image_path).exists():
         raise FileNotFoundError(f"Image not found: {image_path}")
     
+    with open_upload_source(image_path) as source:
+        return extract_text_from_image_data(
+            source,
+            mime_type=guess_mime_type(image_path, 'image/png'),
+            filename=os.path.basename(image_path),
+            content_hash=content_hash
+        )
+
+
+def extract_text_from_image_data(
+    data: UploadSource,
+    mime_type: str,
+    filename: Optional[str] = None,
+    content_hash: Optional[str] = None
+) -> str:
+    """
+    Extract text from an in-memory image using Gemini Vision API.
+    
+    Results are cached by content hash, model and prompt version, so the same
+    image (from an email or /upload-image) is only sent to Gemini once. On a
+    miss the image is preprocessed (see app.image_preprocessing) first.
+    
+    Args:
+        data: Image bytes or a seekable binary stream
+        mime_type: MIME type of the image (e.g., "image/png")
+        filename: Optional original filename (used as the upload display name)
+        content_hash: Optional precomputed SHA-256 of data (skips hashing)
+        
+    Returns:
+        Extracted text from the image
+    """
+    return transcribe_with_cache(
+        data,
+        IMAGE_PROMPT_VERSION,
+        lambda: _extract_text_from_image_uncached(data, mime_type, filename),
+        content_hash=content_hash
+    )
+
+
+def prepare_image_for_vision(data: UploadSource, mime_type: str) -> Tuple[UploadSource, str]:
+    """
+    Preprocess an image before a vision call, if IMAGE_PREPROCESSING is on.
+    
+    CPU-bound, so it runs in the process pool. Callers keep using the
+    original's hash as the cache key.
+    
+    Returns:
+        (image data, MIME type) to send to the model
+    """
+    if not config.IMAGE_PREPROCESSING:
+        return data, mime_type
+    preprocessed = preprocess_in_pool(read_all(data), mime_type)
+    return preprocessed.data, preprocessed.mime_type
+
+
+def _extract_text_from_image_uncached(data: UploadSource, mime_type: str, filename: Optional[str]) -> str:
+    """Extract an image's text with Gemini (inline or via the Files API)."""
+    if not config.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set in environment variables")
+    
     client = initialize_client()
     
+    data, mime_type = prepare_image_for_vision(data, mime_type)
+    
     try:
-        # Read and encode image
-        with open(image_path, 'rb') as f:
-            image_data = f.read()
-        
-        # Upload image to Gemini Files API
-        file = client.files.upload(path=image_path)
-        
-        # Wait for file to be processed
-        import time
-        max_wait = 30
-        wait_time = 0
-        
-        # Get state - handle both string and object types
-        def get_state_string(state):
-            if isinstance(state, str):
-                return state.upper()
-            elif hasattr(state, 'name'):
-                return state.name.upper()
-            else:
-                return str(state).upper()
-        
-        state = get_state_string(file.state)
-        while "PROCESSING" in state and wait_time < max_wait:
-            time.sleep(2)
-            wait_time += 2
-            file = client.files.get(name=file.name)
-            state = get_state_string(file.state)
-        
-        state = get_state_string(file.state)
-        if "ACTIVE" not in state:
-            raise Exception(f"Image upload failed. State: {state}")
-        
         # Use Gemini to extract text from image
         prompt = """Extract ALL text from this image with high accuracy. 
 If this is a conversation (SMS, WhatsApp, iMessage, etc.), extract the COMPLETE conversation including:
@@ -72,15 +112,9 @@ If this is a conversation (SMS, WhatsApp, iMessage, etc.), extract the COMPLETE
 CRITICAL: Extract the text EXACTLY as it appears. Do not summarize or skip any information.
 Preserve the conversation structure and include all dates, times, and event names."""
         
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=[
-                types.Part.from_text(text=prompt),
-                types.Part(file_data=types.FileData(file_uri=file.uri))
-            ],
-            config=types.GenerateContentConfig(
-                temperature=0.1
-            )
+        # Small images go inline in the request; large ones through the Files API
+        response = generate_from_media(
+            prompt, data, mime_type, display_name=filename, client=client, max_wait=30, poll_interval=2
         )
         
         extracted_text = None
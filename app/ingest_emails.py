@@ -4,10 +4,9 @@ import re
 from pathlib import Path
 from datetime import datetime
 
-from app.gmail_client import fetch_school_emails
 from app.config import config
-from app.upload_tracker import is_email_processed, mark_email_processed
-from app.markdown_consolidator import consolidate_email_with_attachments
+from app.attachment_store import save_blob, store_attachment
+from app.ingest_pipeline import IngestionPipeline, print_pipeline_metrics
 
 
 def sanitize_filename(filename: str) -> str:
@@ -61,49 +60,21 @@ def save_email(email, output_dir: str) -> str:
     return filepath
 
 
-def save_attachment(attachment, email_id: str, output_dir: str) -> str:
+def save_attachment(attachment, email_id: str) -> str:
     """
-    Save email attachment to disk.
+    Save email attachment to disk under its content hash.
+    
+    Identical attachments (e.g., the same flyer in several emails) share one
+    file instead of being written again with a numbered suffix.
     
     Args:
         attachment: EmailAttachment object
-        email_id: Email ID for organizing attachments
-        output_dir: Directory to save attachments
+        email_id: Email ID referencing the attachment
         
     Returns:
-        Path to saved file
+        Path to the stored blob
     """
-    # Create directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Sanitize filename
-    filename = sanitize_filename(attachment.filename)
-    
-    # If no filename, generate one based on mime type
-    if not filename:
-        ext = {
-            'application/pdf': '.pdf',
-            'image/jpeg': '.jpg',
-            'image/png': '.png',
-            'image/gif': '.gif',
-            'text/plain': '.txt',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
-        }.get(attachment.mime_type, '.bin')
-        filename = f"attachment_{email_id[:8]}{ext}"
-    
-    # Ensure unique filename
-    filepath = os.path.join(output_dir, filename)
-    counter = 1
-    while os.path.exists(filepath):
-        name, ext = os.path.splitext(filename)
-        filepath = os.path.join(output_dir, f"{name}_{counter}{ext}")
-        counter += 1
-    
-    # Write attachment data
-    with open(filepath, 'wb') as f:
-        f.write(attachment.data)
-    
-    return filepath
+    return save_blob(store_attachment(attachment, email_id), attachment)
 
 
 def main():
@@ -111,77 +82,37 @@ def main():
     print("Starting email ingestion...")
     print(f"Looking for emails from: {config.SCHOOL_DOMAINS} or {config.SCHOOL_SENDERS}")
     
-    # Fetch emails
-    emails = fetch_school_emails(max_results=50)
-    print(f"Found {len(emails)} school-related emails")
+    # Fetch, attachment download, transcription and consolidation run as
+    # concurrent stages joined by bounded queues; markdown is still written
+    # by a single writer in fetch order. Already-processed IDs are dropped
+    # after the ID listing, before any download.
+    pipeline = IngestionPipeline()
+    print(f"Pipeline: {pipeline.download_workers} download workers, "
+          f"{pipeline.transcription_workers} transcription workers, queue size {pipeline.queue_size}")
+    result = pipeline.run()
     
-    if not emails:
-        print("No emails found. Check your filters in .env")
-        return
+    fetch_stats = result['fetch_stats']
+    skipped_emails = fetch_stats['skipped_known']
+    print(f"\nListed {fetch_stats['listed']} school-related emails, "
+          f"{skipped_emails} already processed (not downloaded)")
     
-    # Process emails and consolidate (only new ones)
-    processed_emails = 0
-    processed_attachments = 0
-    skipped_emails = 0
-    temp_attachment_paths = []
+    if result['fetch_error']:
+        print(f"⚠️  Fetching stopped early ({result['fetch_error']}); the rest is retried next run")
     
-    try:
-        for email in emails:
-            # Skip if already processed
-            if is_email_processed(email.id):
-                skipped_emails += 1
-                continue
-            
-            print(f"\n📧 Processing email: {email.subject}")
-            
-            # Save attachments temporarily (needed for transcription)
-            attachment_paths = []
-            for attachment in email.attachments:
-                attachment_path = save_attachment(
-                    attachment, email.id, config.ATTACHMENTS_DIR
-                )
-                attachment_paths.append(attachment_path)
-                temp_attachment_paths.append(attachment_path)
-                processed_attachments += 1
-                print(f"  📎 Saved attachment: {os.path.basename(attachment_path)}")
-            
-            # Consolidate email and attachments into markdown
-            try:
-                master_path = consolidate_email_with_attachments(
-                    email_date=email.date,
-                    email_subject=email.subject,
-                    email_sender=email.sender,
-                    email_body=email.body_text,
-                    email_id=email.id,
-                    attachment_paths=attachment_paths
-                )
-                processed_emails += 1
-                mark_email_processed(email.id)
-                print(f"  ✓ Consolidated email into: {master_path.name}")
-            except Exception as e:
-                print(f"  ✗ Error consolidating email: {e}")
-                # Still mark as processed to avoid retrying
-                mark_email_processed(email.id)
-    
-    finally:
-        # Clean up temporary attachment files after consolidation
-        print(f"\n🧹 Cleaning up temporary files...")
-        cleaned = 0
-        for att_path in temp_attachment_paths:
-            try:
-                if os.path.exists(att_path):
-                    os.remove(att_path)
-                    cleaned += 1
-            except Exception as e:
-                print(f"  ⚠️  Could not delete {os.path.basename(att_path)}: {e}")
-        
-        print(f"  ✓ Deleted {cleaned} temporary attachment files")
+    if result['emails'] == 0 and skipped_emails == 0 and not result['fetch_error']:
+        print("No emails found. Check your filters in .env")
+        return
     
     print(f"\n✅ Ingestion complete!")
-    print(f"  - Consolidated {processed_emails} new emails into master markdown")
-    print(f"  - Processed {processed_attachments} attachments (transcribed and cleaned up)")
+    print(f"  - Consolidated {result['emails']} new emails into master markdown")
+    print(f"  - Processed {result['attachments']} attachments (transcribed, spool files removed)")
+    print(f"  - Indexed {result['events']} events")
+    if result['errors']:
+        print(f"  - {result['errors']} emails had errors (recorded in the markdown)")
     if skipped_emails > 0:
         print(f"  - Skipped {skipped_emails} already processed emails")
+    
+    print_pipeline_metrics(result)
 
 
 if __name__ == "__main__":
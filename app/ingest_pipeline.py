@@ -0,0 +1,334 @@
+"""Staged, concurrent email ingestion pipeline joined by bounded queues."""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import config
+from app.events_index import add_email_events, extract_email_events
+from app.extraction_cache import flush_extraction_cache
+from app.gmail_client import Email, GmailClient
+from app.markdown_consolidator import transcribe_email_attachments, write_email_markdown
+from app.rate_limiter import gemini_rate_limiter
+from app.transcription_cache import flush_transcription_cache
+from app.upload_tracker import get_processed_email_ids, mark_email_processed
+
+
+# Sentinel telling a stage worker that its upstream is finished
+_DONE = object()
+
+
+@dataclass
+class WorkItem:
+    """One email moving through the pipeline."""
+    seq: int
+    email: Email
+    transcribed: List[Tuple[str, str, str]] = field(default_factory=list)
+    events: Optional[List[Dict]] = None
+    error: Optional[str] = None
+
+
+class StageMetrics:
+    """Throughput and backpressure counters for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        # Time spent waiting for room in the downstream queue
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, busy: float, error: bool = False) -> None:
+        """Record one processed item."""
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy
+            if error:
+                self.errors += 1
+
+    def record_put(self, blocked: float, depth: int) -> None:
+        """Record a hand-off to the downstream queue."""
+        with self._lock:
+            self.blocked_seconds += blocked
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def as_dict(self, elapsed: float) -> Dict[str, float]:
+        """Summarize the stage for a run that took `elapsed` seconds."""
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 2),
+            'blocked_seconds': round(self.blocked_seconds, 2),
+            'items_per_minute': round(self.items / elapsed * 60, 1) if elapsed else 0.0,
+            # Share of the worker pool's wall time spent doing work
+            'utilization': round(self.busy_seconds / (elapsed * self.workers), 2) if elapsed else 0.0,
+            'max_queue_depth': self.max_queue_depth
+        }
+
+
+class IngestionPipeline:
+    """
+    Run ingestion as four stages: fetch -> attachment download -> transcription
+    -> consolidation. Each stage has its own worker count and stages are joined
+    by bounded queues, so a slow stage applies backpressure instead of letting
+    work pile up in memory. A single writer appends markdown in fetch order.
+    """
+
+    def __init__(
+        self,
+        incremental: Optional[bool] = None,
+        sync_key: str = 'ingestion',
+        queue_size: Optional[int] = None,
+        download_workers: Optional[int] = None,
+        transcription_workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None
+    ):
+        self.incremental = (config.GMAIL_SYNC_MODE == "incremental") if incremental is None else incremental
+        self.sync_key = sync_key
+        self.queue_size = max(1, queue_size or config.INGEST_QUEUE_SIZE)
+        self.download_workers = max(1, download_workers or config.INGEST_ATTACHMENT_WORKERS)
+        self.transcription_workers = max(1, transcription_workers or config.INGEST_TRANSCRIPTION_WORKERS)
+
+        # When set, the fetch stage stops; emails already in flight are still written
+        self.cancel_event = cancel_event or threading.Event()
+        self.gmail = GmailClient()
+        self.metrics = {
+            'fetch': StageMetrics('fetch', 1),
+            'download': StageMetrics('download', self.download_workers),
+            'transcribe': StageMetrics('transcribe', self.transcription_workers),
+            'consolidate': StageMetrics('consolidate', 1)
+        }
+        self.stats = {'emails': 0, 'attachments': 0, 'events': 0, 'errors': 0}
+        # Set when listing or fetching stopped early; the sync cursor is then left alone
+        self.fetch_error: Optional[str] = None
+        self.elapsed = 0.0
+
+    def _put(self, stage: str, out_queue: queue.Queue, item) -> None:
+        """Hand an item downstream, recording how long the stage was blocked."""
+        start = time.time()
+        out_queue.put(item)
+        self.metrics[stage].record_put(time.time() - start, out_queue.qsize())
+
+    def _run_fetch(self, out_queue: queue.Queue) -> None:
+        """Stage 1: list and fetch unseen emails (attachments left pending)."""
+        metrics = self.metrics['fetch']
+        processed_ids = get_processed_email_ids()
+        try:
+            if self.incremental:
+                emails = self.gmail.iter_new_school_emails(
+                    sync_key=self.sync_key, exclude_ids=processed_ids, download_attachments=False
+                )
+            else:
+                emails = self.gmail.iter_school_emails(exclude_ids=processed_ids, download_attachments=False)
+
+            seq = 0
+            start = time.time()
+            for email in emails:
+                if self.cancel_event.is_set():
+                    print("  ⏹️  Ingestion cancelled - finishing emails already in flight")
+                    break
+                metrics.record(time.time() - start)
+                print(f"\n📧 Fetched email: {email.subject}")
+                self._put('fetch', out_queue, WorkItem(seq=seq, email=email))
+                seq += 1
+                start = time.time()
+        except Exception as e:
+            print(f"  ✗ Error fetching emails: {e}")
+            metrics.errors += 1
+            self.fetch_error = str(e)
+        finally:
+            for _ in range(self.download_workers):
+                out_queue.put(_DONE)
+
+    def _run_stage(
+        self,
+        stage: str,
+        in_queue: queue.Queue,
+        out_queue: queue.Queue,
+        process: Callable[[WorkItem], None]
+    ) -> None:
+        """Generic worker loop: process items until the upstream sentinel arrives."""
+        metrics = self.metrics[stage]
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+
+            start = time.time()
+            failed = False
+            if item.error is None:
+                try:
+                    process(item)
+                except Exception as e:
+                    # Errors ride along with the item so the email is never dropped
+                    item.error = f"{stage} failed: {e}"
+                    failed = True
+                    print(f"  ✗ Error in {stage} for '{item.email.subject}': {e}")
+            metrics.record(time.time() - start, error=failed)
+            self._put(stage, out_queue, item)
+
+    def _run_download_worker(self, in_queue: queue.Queue, out_queue: queue.Queue) -> None:
+        """Stage 2: download attachments. Each worker owns its own Gmail client."""
+        gmail = GmailClient()
+
+        def _download(item: WorkItem) -> None:
+            gmail.download_attachments([item.email])
+            for attachment in item.email.attachments:
+                print(f"  📎 Attachment: {attachment.filename} ({attachment.size} bytes)")
+
+        self._run_stage('download', in_queue, out_queue, _download)
+
+    def _run_transcription_worker(self, in_queue: queue.Queue, out_queue: queue.Queue) -> None:
+        """Stage 3: transcribe attachments with Gemini, then extract the email's events."""
+        def _transcribe(item: WorkItem) -> None:
+            item.transcribed = transcribe_email_attachments(
+                attachments=item.email.attachments, email_id=item.email.id
+            )
+            if config.INDEX_EVENTS_AT_INGESTION:
+                # A failed extraction only leaves the email out of the events index
+                try:
+                    item.events = extract_email_events(item.email.date, item.email.body_text, item.transcribed)
+                except Exception as e:
+                    print(f"  ⚠️  Could not extract events from '{item.email.subject}': {e}")
+
+        self._run_stage('transcribe', in_queue, out_queue, _transcribe)
+
+    def _write_item(self, item: WorkItem) -> None:
+        """Append one email to the master markdown and mark it processed."""
+        metrics = self.metrics['consolidate']
+        start = time.time()
+        email = item.email
+        try:
+            if item.error:
+                # Keep the email; record why its attachments are missing
+                item.transcribed.append(("(attachments)", f"[{item.error}]"))
+                self.stats['errors'] += 1
+            master_path = write_email_markdown(
+                email_date=email.date,
+                email_subject=email.subject,
+                email_sender=email.sender,
+                email_body=email.body_text,
+                email_id=email.id,
+                transcribed_attachments=item.transcribed
+            )
+            self.stats['emails'] += 1
+            self.stats['attachments'] += len(email.attachments)
+            print(f"  ✓ Consolidated '{email.subject}' into: {master_path.name}")
+            if item.events is not None:
+                indexed = add_email_events(
+                    email.id, email.subject, email.sender, email.date, item.events, str(master_path)
+                )
+                self.stats['events'] += indexed
+            metrics.record(time.time() - start)
+        except Exception as e:
+            print(f"  ✗ Error consolidating email: {e}")
+            self.stats['errors'] += 1
+            metrics.record(time.time() - start, error=True)
+        finally:
+            # Still mark as processed to avoid retrying
+            mark_email_processed(email.id)
+            for attachment in email.attachments:
+                attachment.discard()
+
+    def _run_writer(self, in_queue: queue.Queue) -> None:
+        """Stage 4: the single ordered writer. Buffers out-of-order items by seq."""
+        pending: Dict[int, WorkItem] = {}
+        next_seq = 0
+        remaining = self.transcription_workers
+
+        while remaining:
+            item = in_queue.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            pending[item.seq] = item
+            while next_seq in pending:
+                self._write_item(pending.pop(next_seq))
+                next_seq += 1
+
+        # Only reachable if an upstream stage lost an item; write what is left
+        for seq in sorted(pending):
+            self._write_item(pending[seq])
+
+    def run(self) -> Dict[str, object]:
+        """
+        Run the pipeline to completion and commit the sync cursor.
+
+        Returns:
+            Dict with email/attachment/error counts, elapsed seconds and per-stage metrics
+        """
+        start = time.time()
+        fetched = queue.Queue(maxsize=self.queue_size)
+        downloaded = queue.Queue(maxsize=self.queue_size)
+        transcribed = queue.Queue(maxsize=self.queue_size)
+
+        fetcher = threading.Thread(target=self._run_fetch, args=(fetched,), name="ingest-fetch")
+        downloaders = [
+            threading.Thread(target=self._run_download_worker, args=(fetched, downloaded), name=f"ingest-download-{i}")
+            for i in range(self.download_workers)
+        ]
+        transcribers = [
+            threading.Thread(target=self._run_transcription_worker, args=(downloaded, transcribed), name=f"ingest-transcribe-{i}")
+            for i in range(self.transcription_workers)
+        ]
+        writer = threading.Thread(target=self._run_writer, args=(transcribed,), name="ingest-writer")
+
+        threads = [fetcher] + downloaders + transcribers + [writer]
+        for thread in threads:
+            thread.start()
+
+        fetcher.join()
+        for thread in downloaders:
+            thread.join()
+        # Tell every transcriber its upstream is finished
+        for _ in transcribers:
+            downloaded.put(_DONE)
+        for thread in transcribers:
+            thread.join()
+        for _ in transcribers:
+            transcribed.put(_DONE)
+        writer.join()
+
+        # Only advance the sync cursor once every listed email has been handled.
+        # A cancelled or failed fetch keeps the old cursor; processed IDs are skipped next time.
+        cancelled = self.cancel_event.is_set()
+        sync_committed = False
+        if self.fetch_error:
+            print(f"  ⚠️  Fetch did not complete - keeping the {self.sync_key} sync cursor")
+        elif not cancelled:
+            sync_committed = self.gmail.commit_sync(self.sync_key)
+
+        # Cache lookups only update counters in memory
+        flush_transcription_cache()
+        flush_extraction_cache()
+        
+        self.elapsed = time.time() - start
+        return {
+            **self.stats,
+            'cancelled': cancelled,
+            'fetch_error': self.fetch_error,
+            'sync_committed': sync_committed,
+            'fetch_stats': dict(self.gmail.last_fetch_stats),
+            'elapsed_seconds': round(self.elapsed, 2),
+            'stages': {name: m.as_dict(self.elapsed) for name, m in self.metrics.items()},
+            'rate_limiter': gemini_rate_limiter.get_stats()
+        }
+
+
+def print_pipeline_metrics(result: Dict[str, object]) -> None:
+    """Print per-stage throughput and backpressure."""
+    print(f"\nPipeline finished in {result['elapsed_seconds']:.1f}s")
+    print(f"{'Stage':<14}{'Workers':>8}{'Items':>7}{'Errors':>8}{'Items/min':>11}{'Util':>7}{'Blocked':>10}{'Max queue':>11}")
+    for name, m in result['stages'].items():
+        print(f"{name:<14}{m['workers']:>8}{m['items']:>7}{m['errors']:>8}{m['items_per_minute']:>11.1f}"
+              f"{m['utilization']:>7.2f}{m['blocked_seconds']:>9.1f}s{m['max_queue_depth']:>11}")
+    limiter = result.get('rate_limiter')
+    if limiter:
+        print(f"Gemini rate limiter: {limiter['requests']} requests, {limiter['wait_seconds']:.1f}s waiting "
+              f"for quota, {limiter['throttled']} throttled (429)")
@@ -0,0 +1,245 @@
+"""In-process ingestion job: ingest, upload, reconcile, with timings and cancellation."""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import config
+from app.gemini_file_search import cleanup_old_files, upload_consolidated_markdown
+from app.ingest_pipeline import IngestionPipeline, print_pipeline_metrics
+from app.remote_file_gc import print_gc_report, reconcile_remote_files
+from app.retrieval import refresh_whole_file_uploads
+
+
+# How many finished jobs to keep for the status endpoint
+MAX_JOB_HISTORY = 20
+
+
+class IngestionCancelled(Exception):
+    """Raised between stages when a job has been cancelled."""
+
+
+@dataclass
+class IngestionJobResult:
+    """Structured outcome of one ingestion job."""
+    job_id: str
+    trigger: str
+    status: str = "pending"  # pending, running, succeeded, failed, cancelled
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    # Seconds spent in each stage (ingest, upload, refresh, gc, cleanup)
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    ingestion: Dict[str, Any] = field(default_factory=dict)
+    uploaded_files: List[str] = field(default_factory=list)
+    # Unchanged files re-uploaded because their remote copy was expiring
+    refreshed_files: List[str] = field(default_factory=list)
+    gc_report: Optional[Dict[str, Any]] = None
+    cleanup_stats: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable view of the result."""
+        return asdict(self)
+
+
+def _check_cancelled(cancel_event: threading.Event) -> None:
+    if cancel_event.is_set():
+        raise IngestionCancelled()
+
+
+def _upload_consolidated_files(cancel_event: threading.Event) -> List[str]:
+    """Upload every consolidated markdown file that changed. Returns uploaded file names."""
+    consolidated_dir = Path(config.CONSOLIDATED_DIR)
+    md_files = sorted(
+        consolidated_dir.glob("school-data-*.md"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True  # Upload newest first
+    ) if consolidated_dir.exists() else []
+
+    if not md_files:
+        print("⚠️  No consolidated markdown files found. Check ingestion step.")
+        return []
+
+    uploaded = []
+    for md_file in md_files:
+        _check_cancelled(cancel_event)
+        try:
+            print(f"\n📄 Uploading: {md_file.name}")
+            file_uri = upload_consolidated_markdown(
+                store_name=config.FILE_SEARCH_STORE_NAME,
+                markdown_path=str(md_file)
+            )
+            if file_uri:
+                uploaded.append(md_file.name)
+                print(f"  ✓ Successfully uploaded: {md_file.name}")
+            else:
+                print(f"  ⊘ Skipped (already uploaded): {md_file.name}")
+        except Exception as e:
+            print(f"  ✗ Error uploading {md_file.name}: {e}")
+    return uploaded
+
+
+def run_ingestion_job(
+    job: Optional[IngestionJobResult] = None,
+    cancel_event: Optional[threading.Event] = None,
+    cleanup: bool = False
+) -> IngestionJobResult:
+    """
+    Run a full ingestion job in the current process.
+
+    Stages: ingest emails into markdown, upload changed markdown, delete
+    superseded remote files, and (optionally) delete old raw local files.
+
+    Args:
+        job: Result record to fill in (a new one is created if omitted)
+        cancel_event: When set, the job stops at the next safe point
+        cleanup: Also delete old raw email/attachment files after upload
+
+    Returns:
+        The completed IngestionJobResult
+    """
+    job = job or IngestionJobResult(job_id=uuid.uuid4().hex[:12], trigger="manual")
+    cancel_event = cancel_event or threading.Event()
+    job.status = "running"
+    job.started_at = datetime.now().isoformat()
+
+    def _timed(stage: str, func, *args, **kwargs):
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            job.stage_timings[stage] = round(time.time() - start, 2)
+
+    try:
+        if not config.FILE_SEARCH_STORE_NAME:
+            raise RuntimeError("FILE_SEARCH_STORE_NAME not set in .env")
+        _check_cancelled(cancel_event)
+
+        # Stage 1: ingest emails and consolidate into markdown
+        pipeline = IngestionPipeline(cancel_event=cancel_event)
+        job.ingestion = _timed("ingest", pipeline.run)
+        print_pipeline_metrics(job.ingestion)
+        _check_cancelled(cancel_event)
+
+        # Stage 2: upload consolidated markdown file(s)
+        job.uploaded_files = _timed("upload", _upload_consolidated_files, cancel_event)
+
+        # Files API copies expire after 48h; the whole-file backend needs live ones
+        if config.RETRIEVAL_BACKEND == "whole_file":
+            _check_cancelled(cancel_event)
+            job.refreshed_files = _timed("refresh", refresh_whole_file_uploads)
+
+        # Stage 3: delete (or, by default, report) remote files superseded by this upload
+        if job.uploaded_files or job.refreshed_files:
+            _check_cancelled(cancel_event)
+            try:
+                job.gc_report = _timed("gc", reconcile_remote_files, dry_run=not config.REMOTE_GC_DELETE)
+                print_gc_report(job.gc_report)
+            except Exception as e:
+                print(f"  ⚠️  Remote file cleanup failed (will retry next run): {e}")
+
+        # Stage 4: optional local cleanup - never prompts, so it is safe unattended
+        if cleanup and job.uploaded_files:
+            _check_cancelled(cancel_event)
+            job.cleanup_stats = _timed("cleanup", cleanup_old_files, keep_markdown=True)
+
+        job.status = "succeeded"
+    except IngestionCancelled:
+        job.status = "cancelled"
+        print(f"⏹️  Ingestion job {job.job_id} cancelled")
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"❌ Ingestion job {job.job_id} failed: {e}")
+    finally:
+        if job.ingestion.get('cancelled'):
+            job.status = "cancelled"
+        job.finished_at = datetime.now().isoformat()
+
+    return job
+
+
+class IngestionJobRunner:
+    """
+    Runs ingestion jobs on a dedicated single worker thread, so at most one
+    job runs at a time and the caller (scheduler or API) never blocks.
+    """
+
+    def __init__(self, history_size: int = MAX_JOB_HISTORY):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion-job")
+        self.history_size = history_size
+        self.jobs: "OrderedDict[str, IngestionJobResult]" = OrderedDict()
+        self.cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def active_job(self) -> Optional[IngestionJobResult]:
+        """The pending or running job, if any."""
+        with self._lock:
+            for job in self.jobs.values():
+                if job.status in ("pending", "running"):
+                    return job
+        return None
+
+    def submit(self, trigger: str = "manual", cleanup: bool = False) -> IngestionJobResult:
+        """
+        Queue an ingestion job. If one is already pending or running, return it
+        instead of starting a second one.
+
+        Args:
+            trigger: What started the job (e.g., "scheduled", "api")
+            cleanup: Also delete old raw local files after upload
+
+        Returns:
+            The job's result record (filled in as the job runs)
+        """
+        with self._lock:
+            for existing in self.jobs.values():
+                if existing.status in ("pending", "running"):
+                    return existing
+
+            job = IngestionJobResult(job_id=uuid.uuid4().hex[:12], trigger=trigger)
+            cancel_event = threading.Event()
+            self.jobs[job.job_id] = job
+            self.cancel_events[job.job_id] = cancel_event
+            while len(self.jobs) > self.history_size:
+                old_id, _ = self.jobs.popitem(last=False)
+                self.cancel_events.pop(old_id, None)
+
+        self.executor.submit(run_ingestion_job, job, cancel_event, cleanup)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation of a pending or running job. Returns False if unknown or finished."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status not in ("pending", "running"):
+                return False
+            self.cancel_events[job_id].set()
+            return True
+
+    def get_job(self, job_id: str) -> Optional[IngestionJobResult]:
+        """Look up a job by ID."""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Recent jobs, newest first."""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    def shutdown(self) -> None:
+        """Cancel any active job and stop the worker thread."""
+        with self._lock:
+            for event in self.cancel_events.values():
+                event.set()
+        self.executor.shutdown(wait=False)
+
+
+# Global job runner instance
+job_runner = IngestionJobRunner()
@@ -0,0 +1,437 @@
+"""Rule-based date and time extraction (no API calls)."""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+
+MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+MONTH_PATTERN = (
+    r'(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+    r'|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+)
+ORDINAL = r'(?:st|nd|rd|th)?'
+
+WEEKDAYS = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+
+# "Dec 15th", "December 15, 2025", and lists like "Nov 18,20" or "Dec 2, 4 and 9"
+_DAY_ITEM = rf'\d{{1,2}}{ORDINAL}(?![\d:])'
+_MONTH_DAYS = re.compile(
+    rf'\b{MONTH_PATTERN}\.?\s+({_DAY_ITEM}(?:\s*(?:,|&|and)\s*{_DAY_ITEM})*)\b(?:,?\s+(\d{{4}}))?',
+    re.IGNORECASE
+)
+# "15th Dec", "15 of December 2025"
+_DAY_MONTH = re.compile(rf'\b(\d{{1,2}}){ORDINAL}\s+(?:of\s+)?{MONTH_PATTERN}\b\.?(?:,?\s+(\d{{4}}))?', re.IGNORECASE)
+# "12/15", "12/15/2025", "12/15/25"
+_NUMERIC_DATE = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b')
+# "2025-12-15"
+_ISO_DATE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+# "today", "tomorrow", "tonight"
+_RELATIVE_DAY = re.compile(r'\b(today|tonight|tomorrow)\b', re.IGNORECASE)
+# "Friday", "this Friday", "next Fri"
+_WEEKDAY_DATE = re.compile(
+    r'\b(?:(this|next|on)\s+)?(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|nesday|sday|urday|rsday)?\b',
+    re.IGNORECASE
+)
+# "the 15th" (no month)
+_ORDINAL_DAY = re.compile(r'\bthe\s+(\d{1,2})(st|nd|rd|th)\b', re.IGNORECASE)
+# "next week"
+_NEXT_WEEK = re.compile(r'\bnext\s+week\b', re.IGNORECASE)
+
+# "4pm", "4:00 p.m.", "10 AM"
+_TIME_12H = r'(\d{1,2})(?::([0-5]\d))?\s*([ap])\.?\s*m\b\.?'
+# "3:45-4:45 PM", "3:45 PM - 4:45 PM", "4-5pm"
+_TIME_RANGE_12H = re.compile(
+    rf'\b(\d{{1,2}})(?::([0-5]\d))?\s*(?:([ap])\.?\s*m\.?)?\s*(?:-|–|to)\s*{_TIME_12H}',
+    re.IGNORECASE
+)
+_TIME_SINGLE_12H = re.compile(rf'\b{_TIME_12H}', re.IGNORECASE)
+# "15:45", "15:45-16:45"
+_TIME_24H = re.compile(r'\b([01]?\d|2[0-3]):([0-5]\d)(?:\s*(?:-|–|to)\s*([01]?\d|2[0-3]):([0-5]\d))?\b')
+# "345-445", "1030-1130" (clock times written without a colon), not phone numbers
+_TIME_COMPACT_RANGE = re.compile(
+    r'(?<![\d/-])(\d{3,4})\s*-\s*(\d{3,4})(?![\d-])(?:\s*([ap])\.?\s*m\b\.?)?',
+    re.IGNORECASE
+)
+# What must come right before a compact range for it to be read as a time:
+# "at 345-445", "from 345-445", "Nov 18,20 - 345-445". Otherwise "Room 101-205" is a time.
+_COMPACT_TIME_CONTEXT = re.compile(r'(?:\bat|\bfrom|@|\btimes?:?|\d\s*[-–,])$', re.IGNORECASE)
+_TIME_NOON = re.compile(r'\b(noon|midday|midnight)\b', re.IGNORECASE)
+
+# Date expressions the rules do not resolve (recurrence, spans, vague references)
+_UNHANDLED_DATE_TEXT = re.compile(
+    r'\b(?:next\s+month|weekends?|every|weekly|daily|monthly|through|thru|until|'
+    r'in\s+\d+\s+(?:days?|weeks?)|end\s+of|beginning\s+of)\b',
+    re.IGNORECASE
+)
+# Multi-day spans: "Dec 22 - Jan 2", "Dec 22-23", "12/22 - 1/2" (the rules would give single days)
+_DATE_SPAN = re.compile(
+    rf'\b{MONTH_PATTERN}\.?\s+\d{{1,2}}{ORDINAL}\s*(?:-|–|to)\s*(?:{MONTH_PATTERN}\b|\d{{1,2}}{ORDINAL}\b(?!\s*(?:[ap]\.?m\b|:)))'
+    r'|\b\d{1,2}/\d{1,2}\s*(?:-|–|to)\s*\d{1,2}/\d{1,2}\b',
+    re.IGNORECASE
+)
+
+# Words dropped when turning the rest of a line into an event title
+_TITLE_FILLER = re.compile(
+    r'\b(?:please\s+)?(?:add|create|schedule|set|remind(?:er)?|to\s+(?:my\s+)?calendar|event|on|at|for|from|by)\b[:\s]*',
+    re.IGNORECASE
+)
+_WEEKDAY = re.compile(
+    r'\b(?:mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)(?:day|nesday|sday|urday|rsday)?\b,?',
+    re.IGNORECASE
+)
+
+# Base confidence by how a date was found
+DATE_KIND_CONFIDENCE = {
+    'iso': 0.95,
+    'month_name': 0.9,
+    'relative': 0.9,
+    'weekday': 0.85,
+    'numeric': 0.8,  # 12/3 is December 3 in the US but March 12 elsewhere
+    'next_weekday': 0.7,  # "next Friday" means this coming or the following Friday, depending on who says it
+    'ordinal': 0.6,
+    'next_week': 0.4
+}
+
+# Confidence cap when the text contains date expressions the rules don't handle
+# (recurrence, multi-day spans), or is long prose (newsletters) where events span lines the rules read one at a time
+UNHANDLED_TEXT_CONFIDENCE = 0.5
+LONG_TEXT_CHARS = 600
+
+
+@dataclass
+class LocalParseResult:
+    """Events found by the rules, and how much to trust them (the lowest event confidence)."""
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    confidence: float = 0.0
+
+
+def to_local_naive(value: datetime) -> datetime:
+    """
+    Convert an aware datetime (e.g. a parsed email Date header) to naive local time.
+
+    Dates built by the rules are naive, so the reference must be too.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def _to_24h(hour: int, minute: int, meridiem: Optional[str]) -> Tuple[int, int]:
+    """Convert a 12-hour clock time to 24-hour (meridiem is "a", "p" or None)."""
+    if meridiem:
+        meridiem = meridiem.lower()
+        if meridiem == 'p' and hour < 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+    return hour, minute
+
+
+def parse_time(text: str) -> Optional[str]:
+    """
+    Find the first time or time range in text.
+
+    Args:
+        text: Text such as "at 4pm", "3:45 PM - 4:45 PM" or "15:45-16:45"
+
+    Returns:
+        "HH:MM" or "HH:MM-HH:MM", or None if no time was found
+    """
+    match = _TIME_RANGE_12H.search(text)
+    if match:
+        start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = match.groups()
+        end = _to_24h(int(end_hour), int(end_minute or 0), end_meridiem)
+        # "4-5pm": the start shares the end's meridiem unless that would put it after the end
+        meridiem = start_meridiem or end_meridiem
+        start = _to_24h(int(start_hour), int(start_minute or 0), meridiem)
+        if not start_meridiem and start > end:
+            start = _to_24h(int(start_hour), int(start_minute or 0), 'a')
+        if start[0] < 24 and end[0] < 24:
+            return f"{start[0]:02d}:{start[1]:02d}-{end[0]:02d}:{end[1]:02d}"
+
+    compact = _parse_compact_range(text)
+    if compact:
+        return compact
+
+    match = _TIME_SINGLE_12H.search(text)
+    if match:
+        hour, minute = _to_24h(int(match.group(1)), int(match.group(2) or 0), match.group(3))
+        if hour < 24:
+            return f"{hour:02d}:{minute:02d}"
+
+    match = _TIME_24H.search(text)
+    if match:
+        start = f"{int(match.group(1)):02d}:{match.group(2)}"
+        if match.group(3):
+            return f"{start}-{int(match.group(3)):02d}:{match.group(4)}"
+        return start
+
+    match = _TIME_NOON.search(text)
+    if match:
+        return "00:00" if match.group(1).lower() == 'midnight' else "12:00"
+
+    return None
+
+
+def _split_compact(value: str) -> Optional[Tuple[int, int]]:
+    """"345" -> (3, 45), "1030" -> (10, 30); None if not a clock time."""
+    hour, minute = int(value[:-2]), int(value[-2:])
+    if minute >= 60 or not 1 <= hour <= 12:
+        return None
+    return hour, minute
+
+
+def _parse_compact_range(text: str) -> Optional[str]:
+    """
+    Parse colon-less ranges like "345-445" or "530-630pm".
+
+    Without am/pm, hours 1-7 are read as afternoon (after-school activities)
+    and 8-11 as morning; 12 is noon. Without am/pm, the range must also
+    follow "at", "from" or a date ("Nov 18,20 - 345-445"), so room numbers
+    and other number pairs are not read as times.
+    """
+    for match in _TIME_COMPACT_RANGE.finditer(text):
+        start, end = _split_compact(match.group(1)), _split_compact(match.group(2))
+        if not start or not end:
+            continue
+        meridiem = match.group(3)
+        if not meridiem and not _COMPACT_TIME_CONTEXT.search(text[:match.start()].rstrip()):
+            continue
+
+        def _clock(hour: int, minute: int) -> Tuple[int, int]:
+            if meridiem:
+                return _to_24h(hour, minute, meridiem)
+            return _to_24h(hour, minute, 'p' if hour <= 7 or hour == 12 else 'a')
+
+        start_24, end_24 = _clock(*start), _clock(*end)
+        if end_24 <= start_24:
+            end_24 = (end_24[0] + 12, end_24[1]) if end_24[0] + 12 < 24 else end_24
+        minutes = (end_24[0] * 60 + end_24[1]) - (start_24[0] * 60 + start_24[1])
+        if not 0 < minutes <= 6 * 60:
+            continue  # "555-1234" is a phone number, not a time range
+        return f"{start_24[0]:02d}:{start_24[1]:02d}-{end_24[0]:02d}:{end_24[1]:02d}"
+    return None
+
+
+def apply_time(date_obj: datetime, time_str: Optional[str]) -> datetime:
+    """Set a datetime's clock to the start of an "HH:MM" or "HH:MM-HH:MM" time string."""
+    if not time_str:
+        return date_obj
+    hour, minute = time_str.split('-')[0].split(':')
+    return date_obj.replace(hour=int(hour), minute=int(minute))
+
+
+def _infer_year(month: int, day: int, reference: datetime) -> int:
+    """Year for a date given without one: this year, or next year if it would be long past."""
+    try:
+        candidate = datetime(reference.year, month, day)
+    except ValueError:
+        return reference.year
+    if (reference - candidate).days > 180:
+        return reference.year + 1
+    return reference.year
+
+
+def _make_date(year: Optional[int], month: int, day: int, reference: datetime) -> Optional[datetime]:
+    """Build a date, inferring a missing year; None if the date is invalid."""
+    if year is not None and year < 100:
+        year += 2000
+    try:
+        return datetime(year or _infer_year(month, day, reference), month, day)
+    except ValueError:
+        return None
+
+
+def _weekday_date(qualifier: Optional[str], weekday: int, reference: datetime) -> Tuple[datetime, str]:
+    """Date of a named weekday: the coming one (today counts), or for "next", the one in the following week."""
+    today = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+    days_ahead = (weekday - today.weekday()) % 7
+    if qualifier and qualifier.lower() == 'next':
+        # "next Friday" said on a Monday means the Friday of next week
+        if days_ahead == 0 or today.weekday() + days_ahead <= 6:
+            days_ahead += 7
+        return today + timedelta(days=days_ahead), 'next_weekday'
+    return today + timedelta(days=days_ahead), 'weekday'
+
+
+def find_dates(text: str, reference: Optional[datetime] = None) -> List[Tuple[datetime, Tuple[int, int], str]]:
+    """
+    Find dates in text: explicit dates, date lists, relative days and weekdays.
+
+    Args:
+        text: Text to scan
+        reference: "Today", used for relative dates and missing years (defaults to now)
+
+    Returns:
+        (date, (start, end) span in text, kind) tuples in text order. Kind is
+        a key of DATE_KIND_CONFIDENCE.
+    """
+    reference = to_local_naive(reference or datetime.now())
+    today = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+    found = []
+    taken = []
+
+    def _overlaps(span: Tuple[int, int]) -> bool:
+        return any(start < span[1] and span[0] < end for start, end in taken)
+
+    def _add(date_obj: Optional[datetime], span: Tuple[int, int], kind: str) -> None:
+        if date_obj and not _overlaps(span):
+            found.append((date_obj, span, kind))
+
+    def _take(span: Tuple[int, int]) -> None:
+        taken.append(span)
+
+    for match in _ISO_DATE.finditer(text):
+        _add(_make_date(int(match.group(1)), int(match.group(2)), int(match.group(3)), reference),
+             match.span(), 'iso')
+        _take(match.span())
+
+    for match in _MONTH_DAYS.finditer(text):
+        if _overlaps(match.span()):
+            continue
+        month = MONTHS[match.group(1)[:3].lower()]
+        year = int(match.group(3)) if match.group(3) else None
+        for day in re.findall(r'\d{1,2}', match.group(2)):
+            found.append((_make_date(year, month, int(day), reference), match.span(), 'month_name'))
+        _take(match.span())
+
+    for match in _DAY_MONTH.finditer(text):
+        year = int(match.group(3)) if match.group(3) else None
+        _add(_make_date(year, MONTHS[match.group(2)[:3].lower()], int(match.group(1)), reference),
+             match.span(), 'month_name')
+        _take(match.span())
+
+    for match in _NUMERIC_DATE.finditer(text):
+        year = int(match.group(3)) if match.group(3) else None
+        _add(_make_date(year, int(match.group(1)), int(match.group(2)), reference), match.span(), 'numeric')
+        _take(match.span())
+
+    explicit = bool(found)
+
+    for match in _RELATIVE_DAY.finditer(text):
+        offset = 1 if match.group(1).lower() == 'tomorrow' else 0
+        _add(today + timedelta(days=offset), match.span(), 'relative')
+        _take(match.span())
+
+    for match in _WEEKDAY_DATE.finditer(text):
+        if explicit:
+            # "Friday, Oct 23": the weekday only labels the explicit date
+            _take(match.span())
+            continue
+        word = match.group(0).split()[-1]
+        if len(word) <= 4 and word.islower():
+            continue  # "sat", "sun", "wed" in running text are rarely weekdays
+        date_obj, kind = _weekday_date(match.group(1), WEEKDAYS[match.group(2)[:3].lower()], reference)
+        _add(date_obj, match.span(), kind)
+        _take(match.span())
+
+    if not found:
+        for match in _ORDINAL_DAY.finditer(text):
+            day = int(match.group(1))
+            month, year = today.month, today.year
+            if day < today.day:
+                month, year = (1, year + 1) if month == 12 else (month + 1, year)
+            _add(_make_date(year, month, day, reference), match.span(), 'ordinal')
+            _take(match.span())
+
+    if not found:
+        for match in _NEXT_WEEK.finditer(text):
+            _add(today + timedelta(days=7 - today.weekday()), match.span(), 'next_week')
+            _take(match.span())
+
+    found = [item for item in found if item[0] is not None]
+    found.sort(key=lambda item: item[1][0])
+    return found
+
+
+def _strip_time_text(text: str) -> str:
+    """Remove time expressions from text."""
+    for pattern in (_TIME_RANGE_12H, _TIME_COMPACT_RANGE, _TIME_SINGLE_12H, _TIME_24H, _TIME_NOON):
+        text = pattern.sub(' ', text)
+    return text
+
+
+def derive_title(line: str, spans: List[Tuple[int, int]]) -> str:
+    """Turn what is left of a line after removing dates, times and filler words into a title."""
+    for start, end in sorted(set(spans), reverse=True):
+        line = line[:start] + ' ' + line[end:]
+    line = _strip_time_text(line)
+    line = _WEEKDAY.sub(' ', line)
+    line = _TITLE_FILLER.sub(' ', line)
+    line = re.sub(r'[\s,;:\-–|]+', ' ', line).strip(' .!')
+    return line[:1].upper() + line[1:] if line else "Untitled Event"
+
+
+def _event_confidence(kind: str, title: str, compact_time: bool) -> float:
+    """Confidence of one event from how its date was found and how usable its title is."""
+    confidence = DATE_KIND_CONFIDENCE[kind]
+    if compact_time:
+        confidence -= 0.05  # am/pm was guessed
+    if title == "Untitled Event":
+        confidence -= 0.4
+    elif len(title.split()) > 10:
+        confidence -= 0.2  # prose, not a listing - the title is probably poor
+    return round(max(confidence, 0.0), 2)
+
+
+def parse_events_locally(text: str, reference: Optional[datetime] = None) -> LocalParseResult:
+    """
+    Extract events from text with rules only, and score the result.
+
+    Each line with a date becomes one event per date on it ("Nov 18,20"
+    gives two). The time on the same line (if any) applies to all of them.
+
+    Args:
+        text: Text to extract dates from
+        reference: "Today", used for relative dates and missing years (defaults to now)
+
+    Returns:
+        LocalParseResult. Confidence is 0 when nothing was found.
+    """
+    reference = to_local_naive(reference or datetime.now())
+    result = LocalParseResult()
+
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        dates = find_dates(line, reference)
+        if not dates:
+            continue
+
+        time_str = parse_time(line)
+        compact_time = bool(time_str and _parse_compact_range(line) == time_str)
+        title = derive_title(line, [span for _, span, _ in dates])
+        for date_obj, _, kind in dates:
+            result.events.append({
+                'title': title,
+                'date': apply_time(date_obj, time_str),
+                'time': time_str,
+                'description': line,
+                'confidence': _event_confidence(kind, title, compact_time)
+            })
+
+    if result.events:
+        result.confidence = min(event['confidence'] for event in result.events)
+        if len(text) > LONG_TEXT_CHARS or _UNHANDLED_DATE_TEXT.search(text) or _DATE_SPAN.search(text):
+            result.confidence = min(result.confidence, UNHANDLED_TEXT_CONFIDENCE)
+    return result
+
+
+def extract_dates_locally(text: str, reference: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Extract events from text with rules only (no confidence threshold).
+
+    Args:
+        text: Text to extract dates from
+        reference: "Today", used for relative dates and missing years (defaults to now)
+
+    Returns:
+        Events in the same shape as extract_dates_from_text
+    """
+    return parse_events_locally(text, reference).events
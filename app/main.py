@@ -1,25 +1,35 @@
 """FastAPI application for Denali School Copilot."""
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import os
-import tempfile
 from datetime import datetime
 import logging
+import time
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
 from functools import lru_cache
+from starlette.concurrency import run_in_threadpool
 
 from app.config import config
 from app.rag_chat import ask_school_question
 from app.calendar_client import CalendarClient
-from app.date_extractor import extract_dates_from_text
-from app.image_processor import extract_text_from_image
+from app.date_extractor import extract_dates_from_text, extract_events_from_image
+from app.image_processor import extract_text_from_image_data
+from app.image_preprocessing import get_image_metrics, record_upload_latency, shutdown_executor
 from app.scheduler import scheduler
+from app.ingestion_job import job_runner
 from app.notification_service import check_for_new_emails, get_notification_status
 from app.rag_cache import get_cache_stats
+from app.transcription_cache import flush_transcription_cache, get_transcription_cache_stats
+from app.extraction_cache import flush_extraction_cache, get_extraction_cache_stats
+from app.attachment_store import get_store_stats
+from app.events_index import add_upload_events, get_events_index_stats, load_events_view, query_events
+from app.ics_feed import get_calendar_feed
 from app.voice_calendar import detect_calendar_intent, create_calendar_from_voice
 
 # Configure logging
@@ -204,18 +214,25 @@ async def upload_image(file: UploadFile = File(...), debug: bool = False):
     if not file.content_type or not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    start = time.perf_counter()
+    content = await file.read()
     
     try:
-        # Extract text from image
-        extracted_text = extract_text_from_image(tmp_path)
-        
-        # Extract dates from text
-        events = extract_dates_from_text(extracted_text)
+        # Blocking work runs in the threadpool; preprocessing inside it uses the process pool
+        if config.FUSED_IMAGE_EXTRACTION:
+            # One multimodal call: image + extraction instructions + response schema
+            events, extracted_text = await run_in_threadpool(
+                extract_events_from_image, content, file.content_type, file.filename, debug
+            )
+        else:
+            # Extract text from image (uploaded straight from memory, no temp file)
+            extracted_text = await run_in_threadpool(
+                extract_text_from_image_data, content, file.content_type, file.filename
+            )
+            
+            # Extract dates from text
+            events = await run_in_threadpool(extract_dates_from_text, extracted_text)
+        record_upload_latency(time.perf_counter() - start)
         
         response_data = {
             "events": events,
@@ -223,16 +240,12 @@ async def upload_image(file: UploadFile = File(...), debug: bool = False):
         }
         
         # Include extracted text in debug mode
-        if debug:
+        if debug and extracted_text:
             response_data["extracted_text"] = extracted_text[:500]  # First 500 chars
         
         return DateExtractionResponse(**response_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
-    finally:
-        # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
 
 
 @app.post("/extract-dates", response_model=DateExtractionResponse)
@@ -425,6 +438,18 @@ async def process_conversation_image(
             "events": []
         }
     
+    if not config.CALENDAR_API_WRITES:
+        # Publish to the /calendar.ics feed instead of one Calendar API insert per event
+        key = "|".join(f"{e['title']}|{e['date'].isoformat()}" for e in events)
+        upload_id = "upload-" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        count = add_upload_events(upload_id, file.filename or "Uploaded image", events)
+        return {
+            "success": True,
+            "message": f"Added {count} event(s) to the calendar feed (/calendar.ics)",
+            "events": events,
+            "created_events": []
+        }
+    
     # Parse attendees
     attendee_list = []
     if attendees:
@@ -486,6 +511,40 @@ async def get_schedule_status():
     }
 
 
+@app.get("/ingestion/jobs")
+async def list_ingestion_jobs():
+    """List recent ingestion jobs with status, stage timings and results."""
+    active = job_runner.active_job()
+    return {
+        "active_job_id": active.job_id if active else None,
+        "jobs": job_runner.list_jobs()
+    }
+
+
+@app.post("/ingestion/run")
+async def run_ingestion_now():
+    """Start an ingestion job in the background (returns the running job if one exists)."""
+    job = job_runner.submit(trigger="api")
+    return job.to_dict()
+
+
+@app.get("/ingestion/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get one ingestion job."""
+    job = job_runner.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job: {job_id}")
+    return job.to_dict()
+
+
+@app.post("/ingestion/jobs/{job_id}/cancel")
+async def cancel_ingestion_job(job_id: str):
+    """Cancel a pending or running ingestion job at its next safe point."""
+    if not job_runner.cancel(job_id):
+        raise HTTPException(status_code=404, detail=f"No active ingestion job: {job_id}")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
 @app.post("/check-new-emails")
 async def check_new_emails_endpoint():
     """
@@ -505,8 +564,86 @@ async def get_notification_status_endpoint():
 
 @app.get("/cache/stats")
 async def get_cache_stats_endpoint():
-    """Get RAG cache statistics."""
-    return get_cache_stats()
+    """Get RAG cache, transcription cache, extraction cache and attachment store statistics."""
+    stats = get_cache_stats()
+    stats['transcription_cache'] = get_transcription_cache_stats()
+    stats['extraction_cache'] = get_extraction_cache_stats()
+    stats['attachment_store'] = get_store_stats()
+    return stats
+
+
+@app.get("/images/metrics")
+async def get_image_metrics_endpoint():
+    """Get image preprocessing byte savings and /upload-image latency."""
+    return get_image_metrics()
+
+
+@app.get("/events")
+async def get_events(
+    request: Request,
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    sender: Optional[str] = None,
+    keyword: Optional[str] = None
+):
+    """
+    List extracted events in a date range from the in-memory events index.
+
+    Args:
+        from: Range start, ISO date or datetime (default today)
+        to: Range end, ISO date or datetime (default 7 days after the start)
+        sender: Filter by sender address (substring)
+        keyword: Filter by words in the event title or description
+
+    Returns:
+        Matching events, with an ETag; If-None-Match gets a 304 until the index changes
+    """
+    try:
+        result = query_events(from_, to, sender, keyword)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'from' and 'to' must be ISO dates (YYYY-MM-DD) or datetimes")
+
+    # The response only changes when the index version or the query changes
+    key = f"{result['version']}|{result['from']}|{result['to']}|{sender}|{keyword}"
+    etag = f'"{hashlib.sha1(key.encode()).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=result, headers=headers)
+
+
+@app.get("/calendar.ics")
+async def get_calendar_ics(request: Request):
+    """
+    Subscribable iCalendar feed of every indexed event.
+
+    Served with ETag and Last-Modified; conditional GETs (If-None-Match or
+    If-Modified-Since) get a 304 until ingestion adds events.
+    """
+    feed = get_calendar_feed()
+    headers = {"ETag": feed['etag'], "Cache-Control": "no-cache"}
+    if feed['last_modified']:
+        headers["Last-Modified"] = format_datetime(feed['last_modified'], usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        if feed['etag'] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif feed['last_modified'] and request.headers.get("if-modified-since"):
+        try:
+            if feed['last_modified'] <= parsedate_to_datetime(request.headers["if-modified-since"]):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    return Response(content=feed['body'], media_type="text/calendar; charset=utf-8", headers=headers)
+
+
+@app.get("/events/stats")
+async def get_events_stats():
+    """Get the size and version of the events index."""
+    return get_events_index_stats()
 
 
 @app.get("/rag/metrics")
@@ -676,6 +813,20 @@ async def startup_event():
         scheduler.schedule_periodic_checks(interval_minutes=30)
     except Exception as e:
         print(f"⚠️  Could not schedule periodic email checks: {e}")
+    
+    # Serve /events from memory; ingestion updates it as emails are indexed
+    try:
+        load_events_view()
+    except Exception as e:
+        print(f"⚠️  Could not load events index: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the image preprocessing process pool and save cache hit counters."""
+    shutdown_executor()
+    flush_transcription_cache()
+    flush_extraction_cache()
 
 
 # Mount static files
@@ -1,11 +1,14 @@
 """Consolidate emails and attachments into a master markdown file."""
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 from app.config import config
-from app.attachment_transcriber import transcribe_attachment
+from app.attachment_store import store_attachment
+from app.attachment_transcriber import extract_attachment, extract_attachment_file
+from app.text_extractors import Transcription
 
 
 # Maximum file size before splitting (5MB)
@@ -87,7 +90,7 @@ def format_email_markdown(
     email_sender: str,
     email_body: str,
     email_id: str,
-    attachments: List[Tuple[str, str]] = None
+    attachments: List[tuple] = None
 ) -> str:
     """
     Format a single email as markdown section.
@@ -98,7 +101,7 @@ def format_email_markdown(
         email_sender: Sender email address
         email_body: Email body text
         email_id: Gmail message ID
-        attachments: List of (attachment_path, transcribed_text) tuples
+        attachments: List of (attachment_path_or_filename, transcribed_text[, method]) tuples
         
     Returns:
         Formatted markdown string
@@ -118,9 +121,11 @@ def format_email_markdown(
     # Add attachments if any
     if attachments and len(attachments) > 0:
         markdown += "\n### Attachments:\n\n"
-        for att_path, transcribed_text in attachments:
+        for att_path, transcribed_text, *method in attachments:
             filename = os.path.basename(att_path)
             markdown += f"#### {filename}\n\n"
+            if method:
+                markdown += f"*Extracted via: {method[0]}*\n\n"
             markdown += f"{transcribed_text}\n\n"
     
     markdown += "\n---\n\n"
@@ -165,16 +170,86 @@ def append_to_master_markdown(email_content: str, file_path: Path) -> Path:
     return file_path
 
 
-def consolidate_email_with_attachments(
+def transcribe_stored_attachment(attachment, email_id: Optional[str] = None) -> Transcription:
+    """
+    Transcribe an EmailAttachment, reusing the transcription of identical content.
+    
+    The attachment is recorded by SHA-256 in the attachment index, and that
+    hash keys the transcription cache: if the content was transcribed before
+    (e.g., the same flyer resent in another email), the cached text is
+    returned without calling Gemini or hashing the bytes again.
+    
+    Args:
+        attachment: EmailAttachment (in memory, or spooled to disk if large)
+        email_id: Gmail message ID referencing the attachment
+        
+    Returns:
+        Transcription (text and extraction method)
+    """
+    sha256 = store_attachment(attachment, email_id or "unknown")
+    
+    if attachment.path:
+        # Large attachment spooled to disk by the Gmail client
+        return extract_attachment_file(attachment.path, attachment.mime_type, content_hash=sha256)
+    return extract_attachment(attachment.data, attachment.filename, attachment.mime_type, content_hash=sha256)
+
+
+def transcribe_email_attachments(
+    attachment_paths: List[str] = None,
+    attachments: list = None,
+    email_id: Optional[str] = None
+) -> List[Tuple[str, str, str]]:
+    """
+    Transcribe an email's attachments in parallel. Failures become inline error notes.
+    
+    Args:
+        attachment_paths: List of paths to attachment files
+        attachments: List of EmailAttachment objects (in memory, or spooled to disk if large)
+        email_id: Gmail message ID, recorded as a reference on stored attachments
+        
+    Returns:
+        List of (attachment_path_or_filename, transcribed_text, method) tuples, in input order
+    """
+    # (label, transcribe function) per attachment, in attachment order
+    jobs = []
+    for att_path in attachment_paths or []:
+        if os.path.exists(att_path):
+            jobs.append((att_path, lambda p=att_path: extract_attachment_file(p)))
+        else:
+            print(f"  ⚠️  Attachment not found: {att_path}")
+    for attachment in attachments or []:
+        jobs.append((attachment.filename, lambda a=attachment: transcribe_stored_attachment(a, email_id)))
+    
+    def _run(job):
+        label, transcribe = job
+        try:
+            transcription = transcribe()
+            return (label, transcription.text, transcription.method)
+        except Exception as e:
+            print(f"  ✗ Error transcribing {os.path.basename(label)}: {e}")
+            return (label, f"[Error transcribing attachment: {str(e)}]", "error")
+    
+    if len(jobs) <= 1:
+        return [_run(job) for job in jobs]
+    
+    # Fan out across a bounded pool; the shared Gemini rate limiter keeps the
+    # combined request rate under quota. map() returns results in input order.
+    with ThreadPoolExecutor(max_workers=min(len(jobs), config.ATTACHMENT_TRANSCRIPTION_WORKERS)) as executor:
+        transcribed_attachments = list(executor.map(_run, jobs))
+    
+    return transcribed_attachments
+
+
+def write_email_markdown(
     email_date: datetime,
     email_subject: str,
     email_sender: str,
     email_body: str,
     email_id: str,
-    attachment_paths: List[str] = None
+    transcribed_attachments: List[tuple] = None
 ) -> Path:
     """
-    Consolidate a single email and its attachments into the master markdown file.
+    Append an already-transcribed email to the master markdown file.
     
     Args:
         email_date: Date of the email
@@ -182,7 +257,7 @@ def consolidate_email_with_attachments(
         email_sender: Sender email address
         email_body: Email body text
         email_id: Gmail message ID
-        attachment_paths: List of paths to attachment files
+        transcribed_attachments: List of (attachment_name, transcribed_text, method) tuples
         
     Returns:
         Path to the markdown file that was updated
@@ -190,20 +265,6 @@ def consolidate_email_with_attachments(
     # Get master markdown file path
     master_path = get_master_markdown_path()
     
-    # Transcribe attachments
-    transcribed_attachments = []
-    if attachment_paths:
-        for att_path in attachment_paths:
-            try:
-                if os.path.exists(att_path):
-                    transcribed_text = transcribe_attachment(att_path)
-                    transcribed_attachments.append((att_path, transcribed_text))
-                else:
-                    print(f"  ⚠️  Attachment not found: {att_path}")
-            except Exception as e:
-                print(f"  ✗ Error transcribing {os.path.basename(att_path)}: {e}")
-                transcribed_attachments.append((att_path, f"[Error transcribing attachment: {str(e)}]"))
-    
     # Format email as markdown
     email_markdown = format_email_markdown(
         email_date=email_date,
@@ -218,6 +279,42 @@ def consolidate_email_with_attachments(
     return append_to_master_markdown(email_markdown, master_path)
 
 
+def consolidate_email_with_attachments(
+    email_date: datetime,
+    email_subject: str,
+    email_sender: str,
+    email_body: str,
+    email_id: str,
+    attachment_paths: List[str] = None,
+    attachments: list = None
+) -> Path:
+    """
+    Consolidate a single email and its attachments into the master markdown file.
+    
+    Args:
+        email_date: Date of the email
+        email_subject: Subject line
+        email_sender: Sender email address
+        email_body: Email body text
+        email_id: Gmail message ID
+        attachment_paths: List of paths to attachment files
+        attachments: List of EmailAttachment objects (in memory, or spooled to disk if large)
+        
+    Returns:
+        Path to the markdown file that was updated
+    """
+    transcribed_attachments = transcribe_email_attachments(attachment_paths, attachments, email_id)
+    
+    return write_email_markdown(
+        email_date=email_date,
+        email_subject=email_subject,
+        email_sender=email_sender,
+        email_body=email_body,
+        email_id=email_id,
+        transcribed_attachments=transcribed_attachments
+    )
+
+
 def get_latest_markdown_file() -> Optional[Path]:
     """
     Get the latest consolidated markdown file.
@@ -0,0 +1,157 @@
+"""One-pass parsing of raw (RFC 822) Gmail messages with the standard library."""
+import base64
+import email
+import re
+from dataclasses import dataclass, field
+from email.header import decode_header, make_header
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+
+# Tags that start a new line of text when converted
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main',
+    'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'
+}
+# Tags whose content is never visible text
+SKIPPED_TAGS = {'head', 'script', 'style', 'title', 'noscript'}
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Streaming HTML-to-text converter: feed() chunks, then call get_text()."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._chunks: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._chunks.append("\n")
+        if tag == 'li':
+            self._chunks.append("- ")
+        elif tag in ('td', 'th'):
+            self._chunks.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._chunks.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in ('br', 'hr'):
+            self._chunks.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._chunks.append(data)
+
+    def get_text(self) -> str:
+        """Collapse whitespace and return the extracted text."""
+        self.close()
+        text = "".join(self._chunks)
+        lines = [re.sub(r"[ \t\r\f\v\xa0]+", " ", line).strip() for line in text.split("\n")]
+        return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def html_to_text(html: str) -> str:
+    """Convert an HTML document to readable plain text."""
+    extractor = HTMLTextExtractor()
+    extractor.feed(html)
+    return extractor.get_text()
+
+
+@dataclass
+class ParsedMessage:
+    """Headers, body text and attachment bytes from one raw message."""
+    subject: str
+    sender: str
+    date: str
+    body_text: str
+    # (filename, mime_type, data) in message order
+    attachments: List[Tuple[str, str, bytes]] = field(default_factory=list)
+
+
+def decode_raw_message(message: dict) -> bytes:
+    """Decode the base64url 'raw' field of a format='raw' Gmail message resource."""
+    return base64.urlsafe_b64decode(message['raw'])
+
+
+def _header(message, name: str, default: str) -> str:
+    """Get a header with RFC 2047 encoded words decoded."""
+    value = message.get(name)
+    if value is None:
+        return default
+    try:
+        return str(make_header(decode_header(value)))
+    except Exception:
+        return str(value)
+
+
+def _decode_text(part) -> str:
+    """Decode a text part's payload using its declared charset."""
+    payload = part.get_payload(decode=True) or b""
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return payload.decode(charset, errors='ignore')
+    except LookupError:
+        return payload.decode('utf-8', errors='ignore')
+
+
+def parse_raw_message(raw: bytes) -> ParsedMessage:
+    """
+    Parse a raw RFC 822 message in a single walk over its MIME tree.
+
+    Plain-text parts are preferred for the body; HTML parts are converted to
+    text only when no plain-text part exists. Attachment bytes come from the
+    same payload, so no separate attachment downloads are needed.
+
+    Args:
+        raw: Raw message bytes
+
+    Returns:
+        ParsedMessage
+    """
+    # The compat32 policy is about twice as fast as policy.default; only the
+    # three headers we use need decoding
+    message = email.message_from_bytes(raw)
+
+    plain_parts = []
+    html_parts = []
+    attachments = []
+
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+
+        filename = part.get_filename()
+        if filename:
+            try:
+                filename = str(make_header(decode_header(filename)))
+            except Exception:
+                pass
+            attachments.append((filename, part.get_content_type(), part.get_payload(decode=True) or b""))
+            continue
+
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            plain_parts.append(_decode_text(part))
+        elif content_type == 'text/html':
+            html_parts.append(_decode_text(part))
+
+    if plain_parts:
+        body_text = "".join(plain_parts)
+    else:
+        body_text = "\n\n".join(html_to_text(html) for html in html_parts)
+
+    return ParsedMessage(
+        subject=_header(message, 'Subject', '(No Subject)'),
+        sender=_header(message, 'From', 'Unknown'),
+        date=_header(message, 'Date', ''),
+        body_text=body_text,
+        attachments=attachments
+    )
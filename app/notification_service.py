@@ -5,7 +5,7 @@ from typing import Optional, Dict, Any
 import json
 
 from app.config import config
-from app.gmail_client import GmailClient, fetch_school_emails
+from app.gmail_client import GmailClient, fetch_school_emails, fetch_new_school_emails
 
 
 NOTIFICATION_FILE = "data/.last_check.json"
@@ -82,9 +82,25 @@ def check_for_new_emails(manual: bool = False) -> Dict[str, Any]:
     if manual:
         last_check = None
     
+    # Periodic checks sync incrementally: the history API only returns mail
+    # that arrived since the previous check, so there is nothing to re-filter
+    incremental = not manual and config.GMAIL_SYNC_MODE == "incremental"
+    if incremental:
+        last_check = None
+    
     # Fetch recent emails (only need to check a few)
     try:
-        emails = fetch_school_emails(max_results=20)  # Check more to catch all new ones
+        if incremental:
+            emails = fetch_new_school_emails(sync_key='notifications', max_results=20, download_attachments=False)
+        else:
+            # Check more to catch all new ones
+            emails = fetch_school_emails(max_results=20, download_attachments=False)
+        
+        # Only headers are used, so attachments are left pending - except with
+        # GMAIL_FETCH_FORMAT=raw, where large ones were already spooled to disk
+        for email in emails:
+            for attachment in email.attachments:
+                attachment.discard()
         
         if not emails:
             save_check_time()
@@ -120,8 +136,8 @@ def check_for_new_emails(manual: bool = False) -> Dict[str, Any]:
                             'id': email.id
                         })
         else:
-            # First check or manual refresh - count all recent emails
-            for email in emails[:10]:  # Check most recent 10
+            # First check, manual refresh, or incremental sync - count all recent emails
+            for email in (emails if incremental else emails[:10]):  # Check most recent 10
                 new_emails.append({
                     'subject': email.subject,
                     'sender': email.sender,
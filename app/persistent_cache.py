@@ -0,0 +1,111 @@
+"""In-memory JSON cache backed by a file, written only when entries change."""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+# Hit counters and last-used times are written with the next entry write,
+# or by flush() once they are at least this old
+FLUSH_INTERVAL_SECONDS = 60
+
+
+class PersistentJsonCache:
+    """
+    A {'entries': {...}, 'stats': {...}} document kept in memory.
+
+    Lookups never touch the disk (beyond an mtime check that picks up writes
+    from another process, e.g. CLI ingestion next to the API server). Writes
+    merge in entries another process added since the file was last read,
+    then replace the file atomically.
+    """
+
+    def __init__(self, path: str, empty: Callable[[], Dict[str, Any]]):
+        self.path = path
+        self._empty = empty
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[float] = None
+        # Unsaved hit counters / last-used times, and when they started piling up
+        self._dirty_since: Optional[float] = None
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return self._empty()
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            empty = self._empty()
+            data.setdefault('entries', {})
+            data['stats'] = {**empty['stats'], **data.get('stats', {})}
+            return data
+        except (json.JSONDecodeError, IOError):
+            return self._empty()
+
+    def _load_locked(self) -> Dict[str, Any]:
+        mtime = self._file_mtime()
+        # Reload after another process wrote, unless that would drop our unsaved counters
+        if self._data is None or (mtime != self._mtime and self._dirty_since is None):
+            self._data = self._read()
+            self._mtime = mtime
+        return self._data
+
+    def _merge_locked(self) -> None:
+        """Keep entries another process added since we last read the file."""
+        if self._file_mtime() != self._mtime:
+            for key, entry in self._read()['entries'].items():
+                self._data['entries'].setdefault(key, entry)
+
+    @contextmanager
+    def read(self) -> Iterator[Dict[str, Any]]:
+        """Hold the lock and get the in-memory document (changes are not saved)."""
+        with self._lock:
+            yield self._load_locked()
+
+    @contextmanager
+    def touch(self) -> Iterator[Dict[str, Any]]:
+        """
+        Like read(), for changes to counters only. They are saved with the
+        next write, or at most once per FLUSH_INTERVAL_SECONDS.
+        """
+        with self._lock:
+            yield self._load_locked()
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        self.flush()
+
+    @contextmanager
+    def write(self) -> Iterator[Dict[str, Any]]:
+        """Hold the lock, get the document, and save it to disk afterwards."""
+        with self._lock:
+            data = self._load_locked()
+            self._merge_locked()
+            yield data
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Per-writer name: another process saving at the same time can't tear our file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+        self._mtime = self._file_mtime()
+        self._dirty_since = None
+
+    def flush(self, force: bool = False) -> None:
+        """Save unsaved counters if they are older than FLUSH_INTERVAL_SECONDS (or always, with force)."""
+        with self._lock:
+            if self._dirty_since is None or self._data is None:
+                return
+            if force or time.monotonic() - self._dirty_since >= FLUSH_INTERVAL_SECONDS:
+                self._merge_locked()
+                self._save_locked()
@@ -3,40 +3,40 @@ import os
 import google.genai as genai
 from google.genai import types
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 
 from app.config import config
+from app.events_index import answer_from_events_index, get_question_events_context
 from app.rag_cache import get_cached_response, cache_response
 from app.rag_improvement import track_query, get_optimized_prompt_base, calculate_response_quality
 from app.response_formatter import format_response_for_action
+from app.retrieval import RetrievalBackend, get_retrieval_backend
 import time
 
 
-def ask_school_question(question: str, store_name: str, use_cache: bool = True) -> str:
+def run_rag_query(
+    question: str,
+    backend: Optional[RetrievalBackend] = None,
+    client: Optional[genai.Client] = None,
+    events_context: Optional[str] = None
+) -> Dict[str, Any]:
     """
-    Ask a question using Gemini File Search RAG.
+    Retrieve context with a backend and generate a raw (unformatted) answer.
     
     Args:
         question: The question to ask
-        store_name: Name of the File Search Store
-        use_cache: If True, check cache first and cache the response
+        backend: Retrieval backend (defaults to the one configured in Config)
+        client: Optional Gemini client to reuse
+        events_context: Indexed events in the question's date range, if any
         
     Returns:
-        Answer string
+        Dict with 'answer', 'backend', 'prompt_tokens' and 'final' (True when the
+        answer is a user-facing error message that should not be formatted or cached)
     """
-    if not config.GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not set in environment variables")
-    
-    if not store_name:
-        raise ValueError("FILE_SEARCH_STORE_NAME not set in environment variables")
-    
-    # Check cache first
-    if use_cache:
-        cached_answer = get_cached_response(question)
-        if cached_answer:
-            return cached_answer
-    
+    backend = backend or get_retrieval_backend()
     # Reuse client instance (connection pooling handled by SDK)
-    client = genai.Client(api_key=config.GOOGLE_API_KEY)
+    client = client or genai.Client(api_key=config.GOOGLE_API_KEY)
+    result = {'answer': None, 'backend': backend.name, 'prompt_tokens': None, 'final': False}
     
     # Get current date for context
     current_date = datetime.now()
@@ -62,80 +62,26 @@ Be concise and clear.
 Focus on actionable information like dates, events, and deadlines.
 When mentioning dates, always include the full date (e.g., "Thursday, October 24, 2025") for clarity."""
     
-    try:
-        # Use direct file references (more reliable than File Search Store tool)
-        # Files are uploaded via Files API and we reference them directly
-        from app.markdown_consolidator import get_latest_markdown_file
-        from pathlib import Path
-        
-        # Find latest consolidated markdown file
-        consolidated_dir = Path("data/consolidated")
-        
-        if not consolidated_dir.exists():
-            return "No consolidated data found. Please run email ingestion first."
-        
-        # Get all consolidated markdown files (sorted by modification time, newest first)
-        md_files = sorted(
-            consolidated_dir.glob("school-data-*.md"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
-        
-        if not md_files:
-            return "No consolidated markdown files found. Please run email ingestion first."
-        
-        # Use the most recent consolidated file(s)
-        files_to_use = []
-        total_size = 0
-        max_total_size = 10 * 1024 * 1024  # 10MB total limit
-        
-        for md_file in md_files:
-            file_size = md_file.stat().st_size
-            if total_size + file_size > max_total_size and files_to_use:
-                break
-            files_to_use.append(md_file)
-            total_size += file_size
-        
-        # Check if files have been uploaded to Gemini Files API
-        # Cache file list to avoid repeated API calls
-        try:
-            uploaded_files = list(client.files.list())
-        except Exception as e:
-            print(f"Error listing files: {e}")
-            return "Error accessing uploaded files. Please check your API configuration."
-        
-        if not uploaded_files:
-            return "No files have been uploaded to Gemini yet. Please run the upload script first."
-        
-        # Use the most recently uploaded file(s) - should be our consolidated markdown
-        # Filter for active files only
-        active_files = [f for f in uploaded_files if hasattr(f, 'state') and str(f.state).upper() == 'ACTIVE']
-        if not active_files:
-            active_files = uploaded_files  # Fallback if state not available
-        
-        sorted_files = sorted(
-            active_files,
-            key=lambda f: f.create_time if hasattr(f, 'create_time') else getattr(f, 'update_time', 0),
-            reverse=True
-        )[:len(files_to_use)]
-        
-        file_uris_to_use = [f.uri for f in sorted_files if hasattr(f, 'uri')]
-        
-        if not file_uris_to_use:
-            return "Files haven't been uploaded to Gemini yet. Please run the upload script first."
-        
-        # Get optimized prompt base based on learned patterns
-        optimized_base = get_optimized_prompt_base(question)
-        
-        # Create query text with explicit search instructions (enhanced with learning)
-        query_text = f"""You are searching through a consolidated file containing ALL school emails and announcements for Denali.
+    # Get optimized prompt base based on learned patterns
+    optimized_base = get_optimized_prompt_base(question)
+    
+    # Events already extracted from the emails give the dates; the emails give the details
+    events_section = ""
+    if events_context:
+        events_section = f"""
+EVENTS IN THE QUESTION'S DATE RANGE (extracted from the emails - use them to find the right emails):
+{events_context}
+"""
+    
+    # Create query text with explicit search instructions (enhanced with learning)
+    query_text = f"""You are searching through a consolidated file containing ALL school emails and announcements for Denali.
 
 IMPORTANT CONTEXT: Today is {current_date_str}.
 
 Question: {question}
 
 OPTIMIZED INSTRUCTIONS (based on learned patterns): {optimized_base}
-
+{events_section}
 SEARCH INSTRUCTIONS - READ CAREFULLY:
 1. This file contains MULTIPLE emails organized by date. You MUST search through ALL of them.
 2. The file structure is: "## Email: [DATE] - [SUBJECT]" followed by email content.
@@ -170,57 +116,105 @@ RESPONSE FORMATTING REQUIREMENTS:
 - Highlight requirements with ⚠️ and allowed items with ✅
 
 Now search the file and answer: {question}"""
+    
+    context = backend.prepare(client, question, query_text)
+    if context.error:
+        result.update(answer=context.error, final=True)
+        return result
+    
+    # Generate content with the backend's context
+    try:
+        response = client.models.generate_content(
+            model="gemini-2.0-flash-exp",
+            contents=context.parts,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction,
+                tools=context.tools
+            )
+        )
+    except Exception as api_error:
+        # If rate limited, provide helpful message
+        error_str = str(api_error)
+        if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
+            result.update(final=True, answer=(
+                "I'm currently experiencing rate limits from the Gemini API. "
+                "Please wait a few minutes and try again, or check your API usage at "
+                "https://ai.dev/usage?tab=rate-limit. "
+                "The files have been successfully uploaded to the File Search Store, so once the "
+                "rate limit resets, queries should work normally."))
+            return result
+        raise
+    
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        result['prompt_tokens'] = usage.prompt_token_count
+    
+    # Extract text from response
+    answer = None
+    if hasattr(response, 'text') and response.text:
+        answer = response.text
+    elif hasattr(response, 'candidates') and response.candidates:
+        # Try to extract from candidates
+        for candidate in response.candidates:
+            if hasattr(candidate, 'content') and candidate.content:
+                parts = candidate.content.parts if hasattr(candidate.content, 'parts') else []
+                for part in parts:
+                    if hasattr(part, 'text') and part.text:
+                        answer = part.text
+                        break
+            if answer:
+                break
+    
+    if not answer:
+        answer = "I couldn't generate a response. Please check your File Search Store configuration."
+    
+    result['answer'] = answer
+    return result
+
+
+def ask_school_question(question: str, store_name: str, use_cache: bool = True) -> str:
+    """
+    Ask a question using Gemini File Search RAG.
+    
+    Args:
+        question: The question to ask
+        store_name: Name of the File Search Store
+        use_cache: If True, check cache first and cache the response
         
-        # Create content parts with file references
-        parts = [types.Part.from_text(text=query_text)]
-        for file_uri in file_uris_to_use:
+    Returns:
+        Answer string
+    """
+    if not config.GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not set in environment variables")
+    
+    if not store_name:
+        raise ValueError("FILE_SEARCH_STORE_NAME not set in environment variables")
+    
+    # Check cache first
+    if use_cache:
+        cached_answer = get_cached_response(question)
+        if cached_answer:
+            return cached_answer
+    
+    # Pure date/schedule questions are answered from the events index when it has
+    # matches; other date questions get the matching events as context for RAG
+    events_context = None
+    if config.EVENTS_INDEX_ANSWERS:
+        start_index = time.time()
+        indexed_answer = answer_from_events_index(question)
+        if indexed_answer:
             try:
-                parts.append(types.Part(file_data=types.FileData(file_uri=file_uri)))
+                track_query(question, indexed_answer, response_time=time.time() - start_index, success=True)
             except Exception as e:
-                print(f"Warning: Could not add file reference {file_uri}: {e}")
-                continue
-        
-        if len(parts) == 1:  # Only query text, no files
-            return "Error: Could not create query with file references."
-        
-        # Generate content with direct file references
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=parts,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_instruction
-                )
-            )
-        except Exception as api_error:
-            # If rate limited, provide helpful message
-            error_str = str(api_error)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                return ("I'm currently experiencing rate limits from the Gemini API. "
-                       "Please wait a few minutes and try again, or check your API usage at "
-                       "https://ai.dev/usage?tab=rate-limit. "
-                       "The files have been successfully uploaded to the File Search Store, so once the "
-                       "rate limit resets, queries should work normally.")
-            raise
-        
-        # Extract text from response
-        answer = None
-        if hasattr(response, 'text') and response.text:
-            answer = response.text
-        elif hasattr(response, 'candidates') and response.candidates:
-            # Try to extract from candidates
-            for candidate in response.candidates:
-                if hasattr(candidate, 'content') and candidate.content:
-                    parts = candidate.content.parts if hasattr(candidate.content, 'parts') else []
-                    for part in parts:
-                        if hasattr(part, 'text') and part.text:
-                            answer = part.text
-                            break
-                if answer:
-                    break
-        
-        if not answer:
-            answer = "I couldn't generate a response. Please check your File Search Store configuration."
+                print(f"Warning: Failed to track query for self-improvement: {e}")
+            return indexed_answer
+        events_context = get_question_events_context(question)
+    
+    try:
+        result = run_rag_query(question, events_context=events_context)
+        answer = result['answer']
+        if result['final']:
+            return answer
         
         # Format response to be action-oriented and well-structured
         try:
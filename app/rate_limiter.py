@@ -0,0 +1,98 @@
+"""Process-wide rate limiter for Gemini API calls."""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+from google.genai import errors as genai_errors
+
+from app.config import config
+
+
+MAX_THROTTLE_RETRIES = 4
+THROTTLE_BACKOFF_SECONDS = 2.0
+
+
+class RateLimiter:
+    """
+    Token bucket (requests per minute) plus a cap on concurrent calls.
+
+    Every thread that talks to Gemini shares one instance, so fanning work out
+    across more threads cannot push the process over its quota.
+    """
+
+    def __init__(self, requests_per_minute: int, max_concurrent: int):
+        self.capacity = max(1, requests_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self.stats = {'requests': 0, 'wait_seconds': 0.0, 'throttled': 0}
+
+    def acquire(self) -> None:
+        """Block until a request token is available, then take it."""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.stats['requests'] += 1
+                    self.stats['wait_seconds'] += now - start
+                    return
+                wait = (1 - self.tokens) / self.refill_per_second
+            time.sleep(wait)
+
+    def _drain(self) -> None:
+        """Empty the bucket after a 429 so every thread backs off, not just the caller."""
+        with self._lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+            self.stats['throttled'] += 1
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the concurrent-call slots."""
+        with self._slots:
+            yield
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run one Gemini request under the limiter, retrying 429s with backoff.
+
+        Args:
+            func: The API call to make
+            *args, **kwargs: Passed to func
+
+        Returns:
+            Whatever func returns
+        """
+        for attempt in range(MAX_THROTTLE_RETRIES + 1):
+            with self.slot():
+                self.acquire()
+                try:
+                    return func(*args, **kwargs)
+                except genai_errors.APIError as e:
+                    if e.code != 429 or attempt == MAX_THROTTLE_RETRIES:
+                        raise
+                    self._drain()
+            delay = THROTTLE_BACKOFF_SECONDS * (2 ** attempt)
+            print(f"  ⏳ Gemini quota hit (429) - retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Requests made, total time spent waiting for tokens, and 429s seen."""
+        with self._lock:
+            return {
+                'requests_per_minute': self.capacity,
+                'requests': self.stats['requests'],
+                'wait_seconds': round(self.stats['wait_seconds'], 2),
+                'throttled': self.stats['throttled']
+            }
+
+
+# Global limiter shared by every Gemini caller in the process
+gemini_rate_limiter = RateLimiter(config.GEMINI_REQUESTS_PER_MINUTE, config.GEMINI_MAX_CONCURRENT)
@@ -0,0 +1,209 @@
+"""Garbage-collect superseded and orphaned files in the Gemini Files API."""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Set
+
+from app.gemini_file_search import initialize_client
+from app.upload_tracker import TRACKER_FILE, load_remote_manifest, load_tracker, update_remote_manifest
+
+
+# Files younger than this are never deleted - they may belong to an
+# in-flight upload or transcription that has not been recorded yet.
+DEFAULT_MIN_AGE_MINUTES = 60
+DEFAULT_BATCH_SIZE = 20
+
+# Display names of the documents this app uploads (weekly consolidated markdown).
+# Anything else - transcription uploads (which expire after 48h anyway), files
+# of other apps sharing the API key - is never deleted.
+MANAGED_DISPLAY_NAME = re.compile(r'^school-data-.+\.md$')
+
+
+def _tracked_local_paths() -> Set[str]:
+    """Local documents recorded as uploaded by the (path:mtime) upload tracker that still exist."""
+    paths = set()
+    for item in load_tracker(TRACKER_FILE):
+        path = item.rsplit(':', 1)[0]
+        if os.path.exists(path):
+            paths.add(os.path.normpath(path))
+    return paths
+
+
+def prune_remote_manifest() -> Dict[str, Dict[str, Any]]:
+    """
+    Drop manifest entries whose local document no longer exists.
+
+    Returns:
+        The pruned manifest (local path -> remote file entry)
+    """
+    missing = [path for path in load_remote_manifest() if not os.path.exists(path)]
+    if missing:
+        print(f"  🧹 Dropped {len(missing)} manifest entries for deleted local files")
+    return update_remote_manifest({path: None for path in missing})
+
+
+def _create_time(remote) -> datetime:
+    create_time = getattr(remote, 'create_time', None) or datetime.min.replace(tzinfo=timezone.utc)
+    if create_time.tzinfo is None:
+        create_time = create_time.replace(tzinfo=timezone.utc)
+    return create_time
+
+
+def backfill_remote_manifest(remote_files: list, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Add manifest entries for documents uploaded before the manifest existed.
+
+    For each tracked local document without an entry, the newest remote file
+    with the same display name becomes its current copy, so GC does not
+    treat it as superseded.
+
+    Returns:
+        The manifest, with backfilled entries saved
+    """
+    added = {}
+    for path in _tracked_local_paths():
+        if path in manifest:
+            continue
+        matches = [f for f in remote_files if getattr(f, 'display_name', None) == os.path.basename(path)]
+        if not matches:
+            continue
+        newest = max(matches, key=_create_time)
+        expiration_time = getattr(newest, 'expiration_time', None)
+        added[path] = {
+            'name': newest.name,
+            'uri': newest.uri,
+            'size_bytes': newest.size_bytes or 0,
+            # Naive local time, like record_remote_upload
+            'uploaded_at': _create_time(newest).astimezone().replace(tzinfo=None).isoformat(),
+            'expires_at': expiration_time.astimezone(timezone.utc).isoformat() if expiration_time else None,
+            'backfilled': True
+        }
+
+    if added:
+        print(f"  📇 Backfilled {len(added)} manifest entries from the upload tracker")
+        manifest = update_remote_manifest(added)
+    return manifest
+
+
+def _classify_remote_files(remote_files: list, manifest: Dict[str, Dict[str, Any]], min_age_minutes: int) -> Dict[str, list]:
+    """Split remote files into current, superseded, orphaned, too-recent and unmanaged buckets."""
+    current_names = {entry['name'] for entry in manifest.values()}
+    current_basenames = {os.path.basename(path) for path in manifest}
+    local_basenames = current_basenames | {os.path.basename(path) for path in _tracked_local_paths()}
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=min_age_minutes)
+
+    buckets = {'current': [], 'superseded': [], 'orphaned': [], 'recent': [], 'unmanaged': []}
+
+    for remote in remote_files:
+        display_name = getattr(remote, 'display_name', None) or ''
+        if remote.name in current_names:
+            buckets['current'].append(remote)
+        elif not MANAGED_DISPLAY_NAME.match(display_name):
+            buckets['unmanaged'].append(remote)
+        elif _create_time(remote) > cutoff:
+            buckets['recent'].append(remote)
+        elif display_name in current_basenames:
+            # An older upload of a document we still track
+            buckets['superseded'].append(remote)
+        elif display_name not in local_basenames:
+            # Upload of a consolidated document that was deleted locally
+            buckets['orphaned'].append(remote)
+        else:
+            # Tracked locally but with no manifest entry to compare against
+            buckets['unmanaged'].append(remote)
+
+    return buckets
+
+
+def _delete_batch(client, batch: list) -> List[tuple]:
+    """Delete a batch of remote files concurrently. Returns (file, error) pairs."""
+    def _delete(remote):
+        try:
+            client.files.delete(name=remote.name)
+            return remote, None
+        except Exception as e:
+            return remote, e
+
+    with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+        return list(executor.map(_delete, batch))
+
+
+def reconcile_remote_files(
+    dry_run: bool = True,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    min_age_minutes: int = DEFAULT_MIN_AGE_MINUTES
+) -> Dict[str, Any]:
+    """
+    Compare remote Gemini files against the local manifest and delete the
+    ones that no longer back a current document.
+
+    Only files named like the consolidated documents this app uploads are
+    ever candidates. The manifest is backfilled from the upload tracker
+    first, so documents uploaded before it existed are kept.
+
+    Args:
+        dry_run: If True (the default), only report what would be deleted
+        batch_size: Number of deletes issued concurrently per batch
+        min_age_minutes: Never delete files younger than this
+
+    Returns:
+        Report dict with remote counts, deletions and bytes reclaimed
+    """
+    client = initialize_client()
+    manifest = prune_remote_manifest()
+
+    remote_files = list(client.files.list())
+    manifest = backfill_remote_manifest(remote_files, manifest)
+    buckets = _classify_remote_files(remote_files, manifest, min_age_minutes)
+    candidates = buckets['superseded'] + buckets['orphaned']
+
+    report = {
+        'dry_run': dry_run,
+        'remote_count': len(remote_files),
+        'remote_bytes': sum(f.size_bytes or 0 for f in remote_files),
+        'current': len(buckets['current']),
+        'superseded': len(buckets['superseded']),
+        'orphaned': len(buckets['orphaned']),
+        'skipped_recent': len(buckets['recent']),
+        'unmanaged': len(buckets['unmanaged']),
+        'deleted': 0,
+        'failed': 0,
+        'bytes_reclaimed': 0
+    }
+
+    if dry_run:
+        report['bytes_reclaimed'] = sum(f.size_bytes or 0 for f in candidates)
+        for remote in candidates:
+            print(f"  [dry-run] would delete {remote.name} ({remote.display_name or 'no name'}, {remote.size_bytes or 0} bytes)")
+        return report
+
+    batch_size = max(1, batch_size)
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        for remote, error in _delete_batch(client, batch):
+            if error:
+                print(f"  ✗ Could not delete {remote.name}: {error}")
+                report['failed'] += 1
+            else:
+                report['deleted'] += 1
+                report['bytes_reclaimed'] += remote.size_bytes or 0
+        print(f"  🗑️  Deleted {report['deleted']}/{len(candidates)} remote files")
+
+    return report
+
+
+def print_gc_report(report: Dict[str, Any]) -> None:
+    """Print a human-readable summary of a reconciliation run."""
+    mode = "DRY RUN" if report['dry_run'] else "Deleted"
+    print(f"\nRemote files: {report['remote_count']} ({report['remote_bytes'] / 1024 / 1024:.2f}MB)")
+    print(f"  - Current: {report['current']}")
+    print(f"  - Superseded: {report['superseded']}")
+    print(f"  - Orphaned: {report['orphaned']}")
+    print(f"  - Skipped (too recent): {report['skipped_recent']}")
+    print(f"  - Not managed by this app (kept): {report['unmanaged']}")
+    if report['dry_run']:
+        print(f"{mode}: would reclaim {report['bytes_reclaimed'] / 1024 / 1024:.2f}MB")
+    else:
+        print(f"{mode} {report['deleted']} files, reclaimed {report['bytes_reclaimed'] / 1024 / 1024:.2f}MB"
+              + (f" ({report['failed']} failed)" if report['failed'] else ""))
@@ -0,0 +1,340 @@
+"""Pluggable retrieval backends that decide what context goes into a RAG query."""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from google.genai import types
+
+from app.config import config
+from app.gemini_file_search import upload_file_to_store
+from app.upload_tracker import get_remote_file_for, remote_copy_expires_within
+
+
+CONSOLIDATED_DIR = Path("data/consolidated")
+MAX_WHOLE_FILE_BYTES = 10 * 1024 * 1024  # 10MB total limit
+MAX_LEXICAL_CONTEXT_CHARS = 60_000
+
+# Files API uploads expire after 48 hours. Ingestion runs daily, so it re-uploads
+# the copies that would expire before the next run (plus some slack)
+REMOTE_REFRESH_MARGIN = timedelta(hours=26)
+
+# Very common words that carry no retrieval signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "has", "have", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our",
+    "that", "the", "their", "there", "this", "to", "was", "we", "what", "when",
+    "where", "which", "who", "will", "with", "you", "your"
+}
+
+
+@dataclass
+class RetrievalContext:
+    """Context prepared by a backend for a single generate_content call."""
+    parts: List[types.Part] = field(default_factory=list)
+    tools: Optional[List[types.Tool]] = None
+    error: Optional[str] = None
+
+
+def get_consolidated_files() -> List[Path]:
+    """Get all consolidated markdown files, newest first."""
+    if not CONSOLIDATED_DIR.exists():
+        return []
+    return sorted(
+        CONSOLIDATED_DIR.glob("school-data-*.md"),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True
+    )
+
+
+class RetrievalBackend:
+    """Base class for retrieval backends."""
+
+    name = "base"
+
+    def prepare(self, client, question: str, query_text: str) -> RetrievalContext:
+        """
+        Build the content parts (and tools) for a query.
+
+        Args:
+            client: Gemini client
+            question: The user's question
+            query_text: Fully rendered instruction prompt for the question
+
+        Returns:
+            RetrievalContext with parts/tools, or an error message for the user
+        """
+        raise NotImplementedError
+
+
+def select_whole_files() -> List[Path]:
+    """The newest consolidated files that fit in MAX_WHOLE_FILE_BYTES (what WholeFileBackend attaches)."""
+    files_to_use = []
+    total_size = 0
+    for md_file in get_consolidated_files():
+        file_size = md_file.stat().st_size
+        if total_size + file_size > MAX_WHOLE_FILE_BYTES and files_to_use:
+            break
+        files_to_use.append(md_file)
+        total_size += file_size
+    return files_to_use
+
+
+def refresh_whole_file_uploads(margin: timedelta = REMOTE_REFRESH_MARGIN) -> List[str]:
+    """
+    Re-upload the files WholeFileBackend attaches whose remote copy is missing
+    or expires within margin. Run from ingestion, never from a query.
+
+    Returns:
+        Names of the files re-uploaded
+    """
+    refreshed = []
+    for md_file in select_whole_files():
+        if not remote_copy_expires_within(get_remote_file_for(str(md_file)), margin):
+            continue
+        try:
+            print(f"🔄 Remote copy of {md_file.name} is missing or expiring - re-uploading")
+            upload_file_to_store(str(md_file), config.FILE_SEARCH_STORE_NAME, skip_if_exists=False)
+            refreshed.append(md_file.name)
+        except Exception as e:
+            print(f"  ✗ Error re-uploading {md_file.name}: {e}")
+    return refreshed
+
+
+class WholeFileBackend(RetrievalBackend):
+    """Attach the most recent consolidated markdown files in full (Files API references)."""
+
+    name = "whole_file"
+
+    def prepare(self, client, question: str, query_text: str) -> RetrievalContext:
+        if not CONSOLIDATED_DIR.exists():
+            return RetrievalContext(error="No consolidated data found. Please run email ingestion first.")
+
+        files_to_use = select_whole_files()
+        if not files_to_use:
+            return RetrievalContext(error="No consolidated markdown files found. Please run email ingestion first.")
+
+        # Resolve the current remote copy of each file from the upload manifest,
+        # so we never have to list (and guess among) every file ever uploaded
+        remote_listing = []
+        file_uris_to_use = []
+        for md_file in files_to_use:
+            uri = self._resolve_uri(client, md_file, remote_listing)
+            if uri:
+                file_uris_to_use.append(uri)
+            else:
+                print(f"Warning: No remote copy of {md_file.name} - leaving it out of the query")
+
+        if not file_uris_to_use:
+            return RetrievalContext(error="Files haven't been uploaded to Gemini yet. Please run the upload script first.")
+
+        parts = [types.Part.from_text(text=query_text)]
+        for file_uri in file_uris_to_use:
+            try:
+                parts.append(types.Part(file_data=types.FileData(file_uri=file_uri)))
+            except Exception as e:
+                print(f"Warning: Could not add file reference {file_uri}: {e}")
+                continue
+
+        if len(parts) == 1:  # Only query text, no files
+            return RetrievalContext(error="Error: Could not create query with file references.")
+
+        return RetrievalContext(parts=parts)
+
+    @staticmethod
+    def _resolve_uri(client, md_file: Path, remote_listing: list) -> Optional[str]:
+        """
+        URI of a live remote copy of a consolidated file.
+
+        The manifest entry is used until its recorded expiration_time. After
+        that, the newest active, unexpired remote file with the same display
+        name is used. Nothing is uploaded here: expiring copies are refreshed
+        by ingestion (refresh_whole_file_uploads), not on the query path.
+
+        Args:
+            client: Gemini client
+            md_file: Local consolidated markdown file
+            remote_listing: Shared cache of files.list() for this query (filled on first use)
+
+        Returns:
+            File URI, or None if no live remote copy could be found
+        """
+        remote = get_remote_file_for(str(md_file))
+        if not remote_copy_expires_within(remote):
+            return remote['uri']
+
+        # Per-file fallback: look for an existing upload with the same name
+        if not remote_listing:
+            try:
+                remote_listing.extend(client.files.list())
+            except Exception as e:
+                print(f"Error listing files: {e}")
+                return None
+        now = datetime.now(timezone.utc)
+        matches = [
+            f for f in remote_listing
+            if getattr(f, 'display_name', None) == md_file.name
+            and 'ACTIVE' in str(getattr(f, 'state', 'ACTIVE')).upper()
+            and (getattr(f, 'expiration_time', None) is None or f.expiration_time > now)
+        ]
+        if not matches:
+            return None
+        newest = max(matches, key=lambda f: str(getattr(f, 'create_time', '')))
+        return getattr(newest, 'uri', None)
+
+
+class FileSearchStoreBackend(RetrievalBackend):
+    """Let the model retrieve chunks itself through the File Search Store tool."""
+
+    name = "file_search_store"
+
+    def __init__(self, store_name: Optional[str] = None, top_k: Optional[int] = None):
+        self.store_name = store_name or config.FILE_SEARCH_STORE_NAME
+        self.top_k = top_k or config.RETRIEVAL_TOP_K
+
+    def prepare(self, client, question: str, query_text: str) -> RetrievalContext:
+        if not self.store_name:
+            return RetrievalContext(error="FILE_SEARCH_STORE_NAME not set in environment variables")
+
+        tool = types.Tool(file_search=types.FileSearch(
+            file_search_store_names=[self.store_name],
+            top_k=self.top_k
+        ))
+        return RetrievalContext(parts=[types.Part.from_text(text=query_text)], tools=[tool])
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords."""
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+_SECTION_DATE = re.compile(r"^## Email: (\d{4}-\d{2}-\d{2})")
+
+
+def _section_date(section: str) -> str:
+    """ISO date from a section's "## Email: YYYY-MM-DD - subject" heading ('' if missing)."""
+    match = _SECTION_DATE.match(section)
+    return match.group(1) if match else ""
+
+
+def split_markdown_sections(content: str) -> List[str]:
+    """Split a consolidated markdown file into one section per email."""
+    sections = re.split(r"\n(?=## Email: )", content)
+    return [s.strip() for s in sections if s.strip().startswith("## Email: ")]
+
+
+class LexicalIndex:
+    """In-memory BM25 index over consolidated email sections."""
+
+    def __init__(self, sections: List[str], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(_tokenize(s)) for s in sections]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(sections)
+        self.idf = {t: math.log(1 + (n - df + 0.5) / (df + 0.5)) for t, df in doc_freq.items()}
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, int]]:
+        """
+        Score all sections against a query.
+
+        Returns:
+            Up to top_k (score, section_index) pairs, best first
+        """
+        terms = _tokenize(query)
+        scores = []
+        for i, tf in enumerate(self.term_freqs):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores.append((score, i))
+        scores.sort(reverse=True)
+        return scores[:top_k]
+
+
+_lexical_index_cache: Dict[str, object] = {"key": None, "index": None}
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Get the lexical index, rebuilding it only when consolidated files change."""
+    md_files = get_consolidated_files()
+    key = tuple((str(p), p.stat().st_mtime) for p in md_files)
+
+    if _lexical_index_cache["key"] != key:
+        sections = []
+        for md_file in md_files:
+            with open(md_file, 'r', encoding='utf-8') as f:
+                sections.extend(split_markdown_sections(f.read()))
+        _lexical_index_cache["index"] = LexicalIndex(sections)
+        _lexical_index_cache["key"] = key
+
+    return _lexical_index_cache["index"]
+
+
+class LexicalIndexBackend(RetrievalBackend):
+    """Rank email sections locally (BM25) and send only the top-k sections inline."""
+
+    name = "lexical"
+
+    def __init__(self, top_k: Optional[int] = None):
+        self.top_k = top_k or config.RETRIEVAL_TOP_K
+
+    def prepare(self, client, question: str, query_text: str) -> RetrievalContext:
+        index = get_lexical_index()
+        if not index.sections:
+            return RetrievalContext(error="No consolidated markdown files found. Please run email ingestion first.")
+
+        hits = index.search(question, self.top_k)
+        if not hits:
+            # Nothing matched lexically - fall back to the newest sections. Sections are
+            # appended in date order within a file, so sort by their heading date.
+            newest = sorted(
+                range(len(index.sections)),
+                key=lambda i: (_section_date(index.sections[i]), i),
+                reverse=True
+            )
+            hits = [(0.0, i) for i in newest[:self.top_k]]
+
+        context = ""
+        for _, i in hits:
+            section = index.sections[i]
+            if context and len(context) + len(section) > MAX_LEXICAL_CONTEXT_CHARS:
+                break
+            context += section + "\n\n---\n\n"
+
+        prompt = f"{query_text}\n\nRELEVANT EMAIL SECTIONS (the file contents to search):\n\n{context}"
+        return RetrievalContext(parts=[types.Part.from_text(text=prompt)])
+
+
+RETRIEVAL_BACKENDS = {
+    WholeFileBackend.name: WholeFileBackend,
+    FileSearchStoreBackend.name: FileSearchStoreBackend,
+    LexicalIndexBackend.name: LexicalIndexBackend,
+}
+
+
+def get_retrieval_backend(name: Optional[str] = None) -> RetrievalBackend:
+    """
+    Get a retrieval backend by name (defaults to config.RETRIEVAL_BACKEND).
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = name or config.RETRIEVAL_BACKEND
+    if name not in RETRIEVAL_BACKENDS:
+        raise ValueError(
+            f"Unknown retrieval backend '{name}'. Choose one of: {', '.join(RETRIEVAL_BACKENDS)}"
+        )
+    return RETRIEVAL_BACKENDS[name]()
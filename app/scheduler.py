@@ -3,11 +3,9 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 import atexit
-import subprocess
-import sys
-from pathlib import Path
 
 from app.config import config
+from app.ingestion_job import job_runner
 from app.notification_service import check_for_new_emails
 
 
@@ -18,6 +16,7 @@ class EmailScheduler:
         self.scheduler = BackgroundScheduler()
         self.scheduler.start()
         atexit.register(lambda: self.scheduler.shutdown())
+        atexit.register(job_runner.shutdown)
     
     def schedule_periodic_checks(self, interval_minutes: int = 30):
         """
@@ -57,30 +56,14 @@ class EmailScheduler:
             minute: Minute of hour (0-59), default 0
         """
         def run_ingestion():
-            """Run email ingestion and upload."""
+            """Queue an in-process ingestion job on the job runner's worker thread."""
             print(f"\n{'='*80}")
             print(f"Scheduled email ingestion started at {hour:02d}:{minute:02d}")
             print(f"{'='*80}\n")
             
             try:
-                # Run ingestion script
-                project_root = Path(__file__).parent.parent
-                script_path = project_root / "scripts" / "backfill_emails.py"
-                
-                result = subprocess.run(
-                    [sys.executable, str(script_path)],
-                    cwd=str(project_root),
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    print(f"\n✅ Scheduled ingestion completed successfully")
-                    print(result.stdout)
-                else:
-                    print(f"\n❌ Scheduled ingestion failed:")
-                    print(result.stderr)
-            
+                job = job_runner.submit(trigger="scheduled")
+                print(f"✅ Ingestion job {job.job_id} queued (status: {job.status})")
             except Exception as e:
                 print(f"\n❌ Error in scheduled ingestion: {e}")
         
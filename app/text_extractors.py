@@ -0,0 +1,129 @@
+"""Local, CPU-only text extraction for common attachment formats."""
+import csv
+import io
+import zipfile
+from dataclasses import dataclass
+from typing import List, Optional
+from xml.etree import ElementTree
+
+from app.mime_parser import html_to_text
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf is optional - PDFs then always go to Gemini vision
+    PdfReader = None
+    PdfWriter = None
+
+
+# A page with less extractable text than this is treated as a scanned image
+MIN_PAGE_TEXT_CHARS = 40
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+@dataclass
+class Transcription:
+    """Extracted text plus the path that produced it (e.g., "pdf-text-layer", "pdf-vision")."""
+    text: str
+    method: str
+
+
+def read_all(data) -> bytes:
+    """Get the bytes of a bytes-like object or a seekable binary stream."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    data.seek(0)
+    return data.read()
+
+
+def _as_stream(data):
+    """Wrap bytes in a stream; rewind streams."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    data.seek(0)
+    return data
+
+
+def extract_pdf_pages(data) -> Optional[List[str]]:
+    """
+    Extract the embedded text layer of each PDF page.
+
+    Returns:
+        One string per page (empty for scanned pages), or None if pypdf is
+        not installed or the PDF cannot be read locally
+    """
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(_as_stream(data))
+        if reader.is_encrypted:
+            reader.decrypt("")
+        return [(page.extract_text() or "") for page in reader.pages]
+    except Exception as e:
+        print(f"  ⚠️  Could not read PDF text layer: {e}")
+        return None
+
+
+def page_needs_vision(page_text: str) -> bool:
+    """True if a page has too little text to be anything but a scanned image."""
+    return len(page_text.strip()) < MIN_PAGE_TEXT_CHARS
+
+
+def extract_pdf_page(data, page_index: int) -> bytes:
+    """Copy a single page into a new one-page PDF (for sending to the vision model)."""
+    reader = PdfReader(_as_stream(data))
+    writer = PdfWriter()
+    writer.add_page(reader.pages[page_index])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def extract_docx_text(data) -> str:
+    """Extract paragraphs and table rows from a .docx file's document XML."""
+    with zipfile.ZipFile(_as_stream(data)) as docx:
+        root = ElementTree.fromstring(docx.read('word/document.xml'))
+
+    body = root.find(f'{WORD_NAMESPACE}body')
+    lines = []
+
+    def _paragraph_text(paragraph) -> str:
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == f'{WORD_NAMESPACE}t' and node.text:
+                parts.append(node.text)
+            elif node.tag == f'{WORD_NAMESPACE}tab':
+                parts.append("\t")
+            elif node.tag in (f'{WORD_NAMESPACE}br', f'{WORD_NAMESPACE}cr'):
+                parts.append("\n")
+        return "".join(parts)
+
+    for block in (body if body is not None else []):
+        if block.tag == f'{WORD_NAMESPACE}p':
+            lines.append(_paragraph_text(block))
+        elif block.tag == f'{WORD_NAMESPACE}tbl':
+            for row in block.iter(f'{WORD_NAMESPACE}tr'):
+                cells = [
+                    " ".join(_paragraph_text(p) for p in cell.iter(f'{WORD_NAMESPACE}p')).strip()
+                    for cell in row.iter(f'{WORD_NAMESPACE}tc')
+                ]
+                lines.append("| " + " | ".join(cells) + " |")
+
+    return "\n".join(lines).strip()
+
+
+def extract_html_text(data) -> str:
+    """Convert an HTML attachment to plain text."""
+    return html_to_text(read_all(data).decode('utf-8', errors='ignore'))
+
+
+def extract_csv_text(data) -> str:
+    """Render a CSV attachment as a markdown-style table."""
+    text = read_all(data).decode('utf-8-sig', errors='ignore')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096])
+    except csv.Error:
+        dialect = csv.excel
+    rows = [row for row in csv.reader(io.StringIO(text), dialect) if any(cell.strip() for cell in row)]
+    return "\n".join("| " + " | ".join(cell.strip() for cell in row) + " |" for row in rows)
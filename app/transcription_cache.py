@@ -0,0 +1,157 @@
+"""Persistent cache of attachment/image transcriptions keyed by content hash."""
+import hashlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.config import config
+from app.persistent_cache import PersistentJsonCache
+
+
+TRANSCRIPTION_CACHE_FILE = "data/.transcription_cache.json"
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def compute_content_hash(data) -> str:
+    """
+    SHA-256 of bytes or a seekable binary stream.
+
+    A stream is hashed from its start, whatever its current position (a PDF
+    may already have been read by pypdf), and left where it was.
+
+    Args:
+        data: bytes/bytearray/memoryview or a seekable binary stream
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(data)
+        return digest.hexdigest()
+
+    start = data.tell()
+    data.seek(0)
+    for chunk in iter(lambda: data.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    data.seek(start)
+    return digest.hexdigest()
+
+
+def get_transcription_cache_key(content_hash: str, model: str, prompt_version: str) -> str:
+    """Cache key: the same content transcribed by another model or prompt is a different entry."""
+    return f"{content_hash}:{model}:{prompt_version}"
+
+
+def _empty_cache() -> Dict[str, Any]:
+    return {'entries': {}, 'stats': {'hits': 0, 'misses': 0, 'evictions': 0}}
+
+
+# Kept in memory; ingestion workers and API requests share it. Lookups don't
+# rewrite the file - only new transcriptions (and periodic counter flushes) do.
+_cache = PersistentJsonCache(TRANSCRIPTION_CACHE_FILE, _empty_cache)
+
+
+def flush_transcription_cache() -> None:
+    """Save pending hit counters (call at shutdown and after ingestion)."""
+    _cache.flush(force=True)
+
+
+def _evict(cache: Dict[str, Any], max_bytes: int) -> None:
+    """Drop least-recently-used entries until the cached text fits in max_bytes."""
+    entries = cache['entries']
+    total = sum(e['size'] for e in entries.values())
+    if total <= max_bytes:
+        return
+
+    for key in sorted(entries, key=lambda k: entries[k]['last_used']):
+        total -= entries[key]['size']
+        del entries[key]
+        cache['stats']['evictions'] += 1
+        if total <= max_bytes:
+            break
+
+
+def get_cached_transcription(content_hash: str, model: str, prompt_version: str) -> Optional[str]:
+    """
+    Look up a transcription and record a hit or miss.
+
+    Returns:
+        Cached text, or None
+    """
+    key = get_transcription_cache_key(content_hash, model, prompt_version)
+    with _cache.touch() as cache:
+        entry = cache['entries'].get(key)
+        if entry is None:
+            cache['stats']['misses'] += 1
+        else:
+            cache['stats']['hits'] += 1
+            entry['hits'] = entry.get('hits', 0) + 1
+            entry['last_used'] = datetime.now().isoformat()
+    return entry['text'] if entry else None
+
+
+def cache_transcription(content_hash: str, model: str, prompt_version: str, text: str) -> None:
+    """Store a transcription, evicting least-recently-used entries past the size bound."""
+    key = get_transcription_cache_key(content_hash, model, prompt_version)
+    now = datetime.now().isoformat()
+    with _cache.write() as cache:
+        cache['entries'][key] = {
+            'text': text,
+            'size': len(text.encode('utf-8')),
+            'created_at': now,
+            'last_used': now,
+            'hits': 0
+        }
+        _evict(cache, config.TRANSCRIPTION_CACHE_MAX_BYTES)
+
+
+def transcribe_with_cache(
+    data,
+    prompt_version: str,
+    transcribe: Callable[[], str],
+    content_hash: Optional[str] = None,
+    model: Optional[str] = None
+) -> str:
+    """
+    Return the cached transcription of some content, or run `transcribe` and cache it.
+
+    Args:
+        data: The content being transcribed (bytes or seekable stream), used for hashing
+        prompt_version: Version tag of the prompt used by `transcribe`
+        transcribe: Produces the transcription on a miss
+        content_hash: Precomputed SHA-256 of data (skips hashing)
+        model: Model name (defaults to config.TRANSCRIPTION_MODEL)
+
+    Returns:
+        Transcribed text
+    """
+    model = model or config.TRANSCRIPTION_MODEL
+    content_hash = content_hash or compute_content_hash(data)
+
+    cached = get_cached_transcription(content_hash, model, prompt_version)
+    if cached is not None:
+        print(f"  ♻️  Transcription cache hit ({content_hash[:12]})")
+        return cached
+
+    text = transcribe()
+    cache_transcription(content_hash, model, prompt_version, text)
+    return text
+
+
+def get_transcription_cache_stats() -> Dict[str, Any]:
+    """Entry count, size, and hit rate of the transcription cache."""
+    with _cache.read() as cache:
+        stats = dict(cache['stats'])
+        entries = len(cache['entries'])
+        size_bytes = sum(e['size'] for e in cache['entries'].values())
+    lookups = stats['hits'] + stats['misses']
+    return {
+        'entries': entries,
+        'size_bytes': size_bytes,
+        'max_bytes': config.TRANSCRIPTION_CACHE_MAX_BYTES,
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'evictions': stats['evictions'],
+        'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+        'cache_file': TRANSCRIPTION_CACHE_FILE
+    }
@@ -2,8 +2,10 @@
 import os
 import json
 import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Set
+from typing import Any, Dict, Optional, Set
 
 
 TRACKER_FILE = "data/.upload_tracker.json"
@@ -82,6 +84,11 @@ def is_email_processed(email_id: str) -> bool:
     return email_id in tracker
 
 
+def get_processed_email_ids() -> Set[str]:
+    """Get the set of all processed email IDs (single tracker load)."""
+    return load_tracker(EMAIL_TRACKER_FILE)
+
+
 def mark_email_processed(email_id: str) -> None:
     """Mark an email as processed."""
     tracker = load_tracker(EMAIL_TRACKER_FILE)
@@ -99,3 +106,106 @@ def get_tracker_stats() -> dict:
         'processed_emails': len(email_tracker)
     }
 
+
+
+REMOTE_MANIFEST_FILE = "data/.remote_files.json"
+
+# Uploads, the GC job and the upload scripts all rewrite the manifest
+_remote_manifest_lock = threading.Lock()
+
+
+def load_remote_manifest() -> Dict[str, Dict[str, Any]]:
+    """
+    Load the manifest of current remote (Gemini Files API) documents.
+    
+    Returns:
+        Dict mapping local file path -> {'name', 'uri', 'size_bytes', 'uploaded_at', 'expires_at'}
+    """
+    if not os.path.exists(REMOTE_MANIFEST_FILE):
+        return {}
+    
+    try:
+        with open(REMOTE_MANIFEST_FILE, 'r') as f:
+            return json.load(f).get('current', {})
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def _save_remote_manifest(manifest: Dict[str, Dict[str, Any]]) -> None:
+    """Save the manifest atomically. Caller holds _remote_manifest_lock."""
+    os.makedirs(os.path.dirname(REMOTE_MANIFEST_FILE), exist_ok=True)
+    tmp_path = f"{REMOTE_MANIFEST_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'current': manifest, 'count': len(manifest)}, f, indent=2)
+    os.replace(tmp_path, REMOTE_MANIFEST_FILE)
+
+
+def update_remote_manifest(changes: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Set (or, with None, remove) manifest entries in one locked read-modify-write.
+    
+    Args:
+        changes: Local file path -> new entry, or None to drop the entry
+        
+    Returns:
+        The updated manifest
+    """
+    with _remote_manifest_lock:
+        manifest = load_remote_manifest()
+        for path, entry in changes.items():
+            path = os.path.normpath(path)
+            if entry is None:
+                manifest.pop(path, None)
+            else:
+                manifest[path] = entry
+        if changes:
+            _save_remote_manifest(manifest)
+        return manifest
+
+
+def record_remote_upload(filepath: str, name: str, uri: Optional[str], size_bytes: Optional[int],
+                         expiration_time: Optional[datetime] = None) -> None:
+    """
+    Record the remote file that currently backs a local document.
+    Any previous remote file for the same path becomes superseded.
+    
+    Args:
+        filepath: Local document path
+        name: Remote file name (files/...)
+        uri: Remote file URI
+        size_bytes: Remote file size
+        expiration_time: When the Files API deletes the upload (as it reported it)
+    """
+    update_remote_manifest({filepath: {
+        'name': name,
+        'uri': uri,
+        'size_bytes': size_bytes or 0,
+        'uploaded_at': datetime.now().isoformat(),
+        'expires_at': _utc_isoformat(expiration_time)
+    }})
+
+
+def _utc_isoformat(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def remote_copy_expires_within(entry: Optional[Dict[str, Any]], margin: timedelta = timedelta(0)) -> bool:
+    """
+    True if a manifest entry's remote copy has expired (or will within margin).
+    
+    Entries without a recorded expiration_time (written before it was
+    recorded) count as expired, so the next refresh replaces them.
+    """
+    if not entry or not entry.get('uri') or not entry.get('expires_at'):
+        return True
+    expires_at = datetime.fromisoformat(entry['expires_at'])
+    return expires_at - margin <= datetime.now(timezone.utc)
+
+
+def get_remote_file_for(filepath: str) -> Optional[Dict[str, Any]]:
+    """Get the manifest entry for a local document, if it has been uploaded."""
+    return load_remote_manifest().get(os.path.normpath(filepath))
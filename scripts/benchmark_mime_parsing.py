@@ -0,0 +1,165 @@
+"""Micro-benchmark: full-format payload walking vs raw-format MIME parsing."""
+import sys
+import json
+import time
+import base64
+import argparse
+from email.message import EmailMessage
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.gmail_client import GmailClient
+from app.mime_parser import decode_raw_message, parse_raw_message
+
+
+FIXTURES_DIR = Path("data/fixtures/gmail")
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def _to_gmail_payload(part, attachments: dict) -> dict:
+    """
+    Convert an email.message part into a Gmail format='full' payload dict.
+    Like Gmail, attachment bodies are replaced by an attachmentId whose data
+    goes into `attachments` (the attachments().get response).
+    """
+    payload = {
+        'mimeType': part.get_content_type(),
+        'filename': part.get_filename() or '',
+        'headers': [{'name': k, 'value': str(v)} for k, v in part.items()],
+        'body': {'size': 0}
+    }
+    if part.is_multipart():
+        payload['parts'] = [_to_gmail_payload(p, attachments) for p in part.iter_parts()]
+    elif part.get_filename():
+        data = part.get_payload(decode=True) or b""
+        attachment_id = f"att{len(attachments)}"
+        attachments[attachment_id] = {'size': len(data), 'data': _b64(data)}
+        payload['body'] = {'size': len(data), 'attachmentId': attachment_id}
+    else:
+        data = part.get_payload(decode=True) or b""
+        payload['body'] = {'size': len(data), 'data': _b64(data)}
+    return payload
+
+
+def build_synthetic_fixtures(count: int = 20) -> list:
+    """Generate (full, raw) message pairs resembling school newsletters."""
+    fixtures = []
+    for i in range(count):
+        msg = EmailMessage()
+        msg['Subject'] = f"Weekly Newsletter #{i}"
+        msg['From'] = "Office <office@school.example.org>"
+        msg['Date'] = "Mon, 06 Oct 2025 08:30:00 -0700"
+        msg.set_content("Dear families,\n\nPicture day is Friday, October 10.\n" * 20)
+        msg.add_alternative(
+            "<html><head><style>p{color:red}</style></head><body>"
+            + "<p>Dear families,</p><ul><li>Picture day is <b>Friday, October 10</b></li></ul>" * 20
+            + "</body></html>",
+            subtype='html'
+        )
+        for j in range(i % 3):
+            msg.add_attachment(bytes(range(256)) * 400, maintype='application', subtype='pdf',
+                               filename=f"flyer-{i}-{j}.pdf")
+        attachments = {}
+        fixtures.append({
+            'full': {'id': f"synthetic{i}", 'payload': _to_gmail_payload(msg, attachments)},
+            'attachments': attachments,
+            'raw': {'id': f"synthetic{i}", 'raw': _b64(msg.as_bytes())}
+        })
+    return fixtures
+
+
+def record_fixtures(count: int) -> None:
+    """Record real school messages in both formats to data/fixtures/gmail/."""
+    gmail = GmailClient()
+    gmail.authenticate()
+    FIXTURES_DIR.mkdir(parents=True, exist_ok=True)
+    messages = gmail.service.users().messages()
+    for message_id in gmail.list_school_message_ids(max_results=count):
+        full = messages.get(userId='me', id=message_id, format='full').execute()
+        raw = messages.get(userId='me', id=message_id, format='raw').execute()
+        attachments = {
+            attachment_id: messages.attachments().get(userId='me', messageId=message_id, id=attachment_id).execute()
+            for _, _, attachment_id, _ in gmail._find_attachment_parts(full) if attachment_id
+        }
+        with open(FIXTURES_DIR / f"{message_id}.json", 'w') as f:
+            json.dump({'full': full, 'attachments': attachments, 'raw': raw}, f)
+    print(f"Recorded {count} messages to {FIXTURES_DIR}")
+
+
+def load_fixtures() -> list:
+    """Load recorded fixtures, or synthetic ones if none were recorded."""
+    files = sorted(FIXTURES_DIR.glob("*.json")) if FIXTURES_DIR.exists() else []
+    if not files:
+        print("No recorded fixtures found - using synthetic messages (record real ones with --record N)")
+        return build_synthetic_fixtures()
+    fixtures = []
+    for path in files:
+        with open(path, 'r') as f:
+            fixtures.append(json.load(f))
+    print(f"Loaded {len(fixtures)} recorded fixtures from {FIXTURES_DIR}")
+    return fixtures
+
+
+def parse_full(client: GmailClient, fixture: dict) -> int:
+    """
+    Full-format path: walk the payload, decode the body, and decode each
+    attachment from its recorded attachments().get response (the network
+    round trip itself is not timed). Returns API calls needed.
+    """
+    message = fixture['full']
+    client._extract_email_body(message)
+    calls = 1
+    for _, _, attachment_id, inline_data in client._find_attachment_parts(message):
+        if inline_data:
+            base64.urlsafe_b64decode(inline_data)
+        elif attachment_id:
+            calls += 1
+            base64.urlsafe_b64decode(fixture['attachments'][attachment_id]['data'])
+    return calls
+
+
+def parse_raw(message: dict) -> int:
+    """Raw-format path: decode and parse the whole message in one pass. Returns API calls needed."""
+    parse_raw_message(decode_raw_message(message))
+    return 1
+
+
+def main():
+    """Compare CPU time and API calls per message for the two fetch formats."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--record", type=int, metavar="N", help="Record N real messages as fixtures first")
+    parser.add_argument("--iterations", type=int, default=20, help="Passes over the fixture set")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.record)
+
+    fixtures = load_fixtures()
+    client = GmailClient()
+
+    results = {}
+    for name, run in (('full', lambda fx: parse_full(client, fx)),
+                      ('raw', lambda fx: parse_raw(fx['raw']))):
+        calls = sum(run(fx) for fx in fixtures)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for fx in fixtures:
+                run(fx)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            'ms_per_message': elapsed / (args.iterations * len(fixtures)) * 1000,
+            'api_calls_per_message': calls / len(fixtures)
+        }
+
+    print(f"\n{'Format':<8}{'CPU ms/message':>16}{'API calls/message':>20}")
+    for name, r in results.items():
+        print(f"{name:<8}{r['ms_per_message']:>16.3f}{r['api_calls_per_message']:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
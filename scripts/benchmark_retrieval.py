@@ -0,0 +1,106 @@
+"""Benchmark retrieval backends head-to-head on the same question set."""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import google.genai as genai
+
+from app.config import config
+from app.gemini_file_search import list_files_in_store
+from app.rag_chat import run_rag_query
+from app.rag_improvement import calculate_response_quality
+from app.retrieval import RETRIEVAL_BACKENDS, get_retrieval_backend
+from test_rag_queries import TEST_QUERIES
+
+
+def benchmark_backend(name: str, questions: list, client) -> dict:
+    """Run every question through one backend and collect latency, tokens and quality."""
+    backend = get_retrieval_backend(name)
+    rows = []
+
+    for question in questions:
+        start_time = time.time()
+        try:
+            result = run_rag_query(question, backend=backend, client=client)
+            answer = result['answer']
+            error = answer if result['final'] else None
+        except Exception as e:
+            result, answer, error = {'prompt_tokens': None}, "", str(e)
+        latency = time.time() - start_time
+
+        quality = 0.0 if error else calculate_response_quality(answer, question)[0]
+        rows.append({
+            'question': question,
+            'latency': latency,
+            'prompt_tokens': result.get('prompt_tokens'),
+            'quality': quality,
+            'error': error
+        })
+        print(f"  [{name}] {latency:6.2f}s  tokens={result.get('prompt_tokens') or '-':>7}  "
+              f"quality={quality:.2f}  {question[:50]}")
+
+    ok = [r for r in rows if not r['error']]
+    tokens = [r['prompt_tokens'] for r in ok if r['prompt_tokens'] is not None]
+    return {
+        'backend': name,
+        'questions': len(rows),
+        'errors': len(rows) - len(ok),
+        'avg_latency': sum(r['latency'] for r in ok) / len(ok) if ok else 0,
+        'avg_prompt_tokens': sum(tokens) / len(tokens) if tokens else 0,
+        'avg_quality': sum(r['quality'] for r in ok) / len(ok) if ok else 0,
+        'rows': rows
+    }
+
+
+def main():
+    """Compare retrieval backends on latency, prompt tokens and answer quality."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", default=",".join(RETRIEVAL_BACKENDS),
+                        help="Comma-separated backends to compare")
+    parser.add_argument("--questions", help="Optional file with one question per line (default: TEST_QUERIES)")
+    parser.add_argument("--output", help="Optional path to write full JSON results")
+    args = parser.parse_args()
+
+    if not config.GOOGLE_API_KEY:
+        print("❌ ERROR: GOOGLE_API_KEY not set in .env")
+        sys.exit(1)
+
+    questions = TEST_QUERIES
+    if args.questions:
+        with open(args.questions, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "file_search_store" in backends:
+        docs = list_files_in_store(config.FILE_SEARCH_STORE_NAME) if config.FILE_SEARCH_STORE_NAME else []
+        print(f"File Search Store: {config.FILE_SEARCH_STORE_NAME or '(not set)'} ({len(docs)} documents)")
+        if not docs:
+            print("  ⚠️  Store is empty - upload with RETRIEVAL_BACKEND=file_search_store to index documents")
+
+    client = genai.Client(api_key=config.GOOGLE_API_KEY)
+    summaries = []
+    for name in backends:
+        print(f"\n🧪 Benchmarking backend: {name}")
+        print("-" * 80)
+        summaries.append(benchmark_backend(name, questions, client))
+
+    print("\n" + "=" * 80)
+    print(f"{'Backend':<20}{'Avg latency':>14}{'Avg prompt tokens':>20}{'Avg quality':>14}{'Errors':>8}")
+    print("=" * 80)
+    for s in summaries:
+        print(f"{s['backend']:<20}{s['avg_latency']:>13.2f}s{s['avg_prompt_tokens']:>20.0f}"
+              f"{s['avg_quality']:>14.2f}{s['errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summaries, f, indent=2)
+        print(f"\nFull results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Script to build the events index from already-consolidated markdown files."""
+import re
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import config
+from app.date_extractor import extract_dates_from_text
+from app.events_index import add_email_events, get_events_index_stats, load_events_index
+from app.retrieval import get_consolidated_files
+
+
+SECTION_HEADING = re.compile(r'^## Email: \d{4}-\d{2}-\d{2} - (.*)$', re.MULTILINE)
+# Section metadata lines (the Date line would otherwise be extracted as an event)
+HEADER_LINE = re.compile(r'^\*\*(?:From|Date|Email ID):\*\*.*$\n?', re.MULTILINE)
+
+
+def parse_sections(path: Path) -> list:
+    """Split a consolidated markdown file into email sections."""
+    text = path.read_text(encoding='utf-8', errors='ignore')
+    headings = list(SECTION_HEADING.finditer(text))
+    sections = []
+    for i, heading in enumerate(headings):
+        body = text[heading.end():headings[i + 1].start() if i + 1 < len(headings) else len(text)]
+        email_id = re.search(r'^\*\*Email ID:\*\* (\S+)', body, re.MULTILINE)
+        date = re.search(r'^\*\*Date:\*\* (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})', body, re.MULTILINE)
+        sender = re.search(r'^\*\*From:\*\* (.*?)\s*$', body, re.MULTILINE)
+        if not email_id or not date:
+            continue
+        sections.append({
+            'email_id': email_id.group(1),
+            'subject': heading.group(1).strip(),
+            'sender': sender.group(1) if sender else '',
+            'date': datetime.strptime(date.group(1), "%Y-%m-%d %H:%M:%S"),
+            'text': HEADER_LINE.sub('', body).strip(),
+            'source_file': str(path)
+        })
+    return sections
+
+
+def main():
+    """Extract events from every consolidated email section not yet in the index."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reindex", action="store_true", help="Re-extract emails that are already indexed")
+    args = parser.parse_args()
+
+    indexed = set() if args.reindex else set(load_events_index()['emails'])
+    sections = [
+        section
+        for path in get_consolidated_files()
+        for section in parse_sections(path)
+        if section['email_id'] not in indexed
+    ]
+    print(f"Extracting events from {len(sections)} email sections...")
+
+    def _extract(section: dict) -> list:
+        try:
+            return extract_dates_from_text(section['text'], reference=section['date'])
+        except Exception as e:
+            print(f"  ✗ {section['subject']}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, config.EXTRACTION_WORKERS)) as executor:
+        results = list(executor.map(_extract, sections))
+
+    total = 0
+    for section, events in zip(sections, results):
+        if events is None:
+            continue
+        total += add_email_events(
+            section['email_id'], section['subject'], section['sender'], section['date'],
+            events, section['source_file']
+        )
+
+    stats = get_events_index_stats()
+    print(f"\n✅ Indexed {total} events; index now has {stats['events']} events from {stats['emails']} emails")
+
+
+if __name__ == "__main__":
+    main()
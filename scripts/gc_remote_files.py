@@ -0,0 +1,43 @@
+"""Script to delete superseded and orphaned files from the Gemini Files API."""
+import sys
+import argparse
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.remote_file_gc import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MIN_AGE_MINUTES,
+    print_gc_report,
+    reconcile_remote_files,
+)
+
+
+def main():
+    """Reconcile remote Gemini files against the local manifest."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delete", action="store_true",
+                        help="Delete the files (default: only report what would be deleted)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Concurrent deletes per batch")
+    parser.add_argument("--min-age", type=int, default=DEFAULT_MIN_AGE_MINUTES,
+                        help="Never delete files younger than this many minutes")
+    args = parser.parse_args()
+
+    print("Reconciling Gemini Files API against local manifest...")
+
+    try:
+        report = reconcile_remote_files(
+            dry_run=not args.delete,
+            batch_size=args.batch_size,
+            min_age_minutes=args.min_age
+        )
+    except Exception as e:
+        print(f"\n✗ Error reconciling remote files: {e}")
+        sys.exit(1)
+
+    print_gc_report(report)
+
+
+if __name__ == "__main__":
+    main()
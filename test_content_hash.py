@@ -0,0 +1,25 @@
+"""Regression check: content hashes of streams cover the whole stream."""
+import hashlib
+import io
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.transcription_cache import compute_content_hash
+
+
+def test_content_hash_after_partial_read():
+    """A stream that was partly read (e.g. by pypdf) hashes like the whole file."""
+    data = b"%PDF-1.4 " + bytes(range(256)) * 5000
+    stream = io.BytesIO(data)
+    stream.read(1000)
+
+    assert compute_content_hash(stream) == hashlib.sha256(data).hexdigest()
+    assert compute_content_hash(stream) == compute_content_hash(data)
+    # The caller's position is kept
+    assert stream.tell() == 1000
+
+
+if __name__ == "__main__":
+    test_content_hash_after_partial_read()
+    print("✅ Content hash covers the whole stream")